@@ -1,95 +1,102 @@
-from flask import Flask, render_template, request, send_file, redirect, url_for, session
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.enum.text import PP_ALIGN
-from pptx.enum.dml import MSO_THEME_COLOR
-from pptx.dml.color import RGBColor
-from pptx.enum.shapes import MSO_SHAPE
+from flask import (Blueprint, Flask, Response, g, render_template, request, send_file, redirect, url_for, jsonify,
+                   stream_with_context)
+from werkzeug.datastructures import ContentRange
+from werkzeug.http import is_resource_modified
+from urllib.parse import quote
+import contextlib
+import functools
 import io
 import os
 import re
 import json
+import multiprocessing
 import tempfile
+import threading
+import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
+# 各モジュールは読み込み時に環境変数を読むので、先に .env を反映する
 load_dotenv()
-app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-here')
+
+# python-pptx（deck_builder・deck_merge）と openai は読み込みが重いため、最初に使うときに読み込む
+from jobs import JobQueue, QueueFullError, STATUS_DONE, STATUS_ERROR
+from parse_cache import ParseCache, PARSE_CACHE_ENABLED, make_key
+from chunking import (CHUNKED_PARSE_ENABLED, CHUNK_THRESHOLD_CHARS, CHUNK_CONCURRENCY,
+                      split_minutes, merge_parsed)
+from partial_json import StreamingJSONParser
+from template_pool import TemplatePool
+from storage import ArtifactEvictor, create_storage
+from batch import get_render_pool as get_batch_render_pool, new_render_pool, read_batch_items, run_batch
+from singleflight import SingleFlight
+from llm_client import create_azure_llm_client
+from preprocess import PREPROCESS_ENABLED, PREPROCESS_VERSION, preprocess_minutes
+import compact_schema
+from incremental import SIDECAR_VERSION, assemble_deck, changed_sections, plan_keys, reuse_slides
+from layout_plan import PLAN_VERSION, PlanCache, normalize_text
+from preview import PreviewCache
+from metrics import (REGISTRY, REQUEST_LOG_JSON, HTTP_SECONDS, JOBS, JOB_SECONDS,
+                     span, trace, record_usage, record_input_tokens, submit_with_context)
+
+# gunicorn --preload では、マスタープロセスで描画系を読み込んでからワーカーをフォークする
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "0") == "1"
 
 # 生成されたファイルを一時保存するディレクトリ
 TEMP_DIR = os.path.join(os.path.dirname(__file__), 'temp_files')
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-# ===== Azure OpenAI 設定 =====
-try:
-    from openai import AzureOpenAI
-    api_key = os.getenv("AZURE_OPENAI_API_KEY")
-    endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-    api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
-    deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")  # デプロイ名を環境変数で
-
-    if not api_key or not endpoint:
-        raise ValueError("Azure OpenAI credentials are required. Please set AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT environment variables.")
-    
-    client = AzureOpenAI(
-        api_key=api_key,
-        azure_endpoint=endpoint,
-        api_version=api_version
-    )
-    print("[INFO] Azure OpenAI enabled.")
-except Exception as e:
-    print(f"[ERROR] Azure OpenAI initialization failed: {e}")
-    raise
+# 生成物の保存先（ローカルディスク or S3 互換）。TTL・容量上限で古いものから削除する
+artifact_storage = create_storage(os.path.join(TEMP_DIR, 'artifacts'))
+artifact_evictor = ArtifactEvictor(artifact_storage)
 
-# ===== ユーティリティ =====
-# カラールール: background / text / main / accent
-BACKGROUND_RGB = RGBColor(255, 255, 255)  # 背景は白を前提
-PRIMARY_RGB = RGBColor(32, 89, 167)     # メインカラー（見出し・アクセント）
-ACCENT_RGB = RGBColor(237, 242, 248)    # アクセント（淡い塗り）
-TEXT_RGB   = RGBColor(25, 25, 25)
-SUBTEXT_RGB= RGBColor(90, 98, 110)
+ARTIFACT_MIMETYPES = {
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".zip": "application/zip",
+    ".json": "application/json",
+}
 
-JP_FONTS = ["Yu Gothic UI", "Yu Gothic", "Meiryo", "MS PGothic", "Segoe UI"]
+# PPTX テンプレート（プロセスごとに1回だけ読み込み、デッキごとにコピーを渡す）
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "image", "tempppt.pptx")
+template_pool = TemplatePool(TEMPLATE_PATH)
 
-# 設計ポリシー（okunote の 9つのコツを反映）
-MAX_BULLETS_PER_SLIDE = 6     # 1スライドあたりの箇条は極力6件以下
-MAX_CHARS_PER_BULLET = 45     # 箇条は短く
-ONE_MESSAGE_POLICY = True     # ワンスライド・ワンメッセージ
+# 解析・生成ジョブの実行キュー（Web ワーカーをブロックしない）
+jobs = JobQueue()
 
+# LLM 解析結果のキャッシュ（ワーカー間で共有）
+parse_cache = ParseCache(os.getenv("PARSE_CACHE_PATH", os.path.join(TEMP_DIR, "parse_cache.sqlite3"))) if PARSE_CACHE_ENABLED else None
+
+# 同じ議事録の解析はワーカー間でも1つだけ実行し、他は終わるのを待って解析キャッシュを使う
+parse_flights = SingleFlight(os.path.join(TEMP_DIR, "inflight"))
+
+# ===== Azure OpenAI 設定 =====
+# クライアントは最初の解析時に作る（認証情報がなくても描画・バッチ・ベンチマークは動く）
+llm = None
+client = None
+_llm_lock = threading.Lock()
 
-def set_font(run, size_pt=24, bold=False, color=TEXT_RGB, align_left=True):
-    if run is None:
-        return
-    run.font.size = Pt(size_pt)
-    run.font.bold = bold
-    run.font.color.rgb = color
-    # 日本語フォント優先
-    for f in JP_FONTS:
-        run.font.name = f
-        break
-
-
-def normalize_text(s: str) -> str:
-    s = s or ""
-    s = s.replace('\u3000', ' ').strip()  # 全角スペース→半角
-    s = re.sub(r'[ \t]+', ' ', s)
-    return s
-
-
-def shorten_bullet(text: str, max_chars: int = MAX_CHARS_PER_BULLET) -> str:
-    t = normalize_text(text)
-    if len(t) <= max_chars:
-        return t
-    # 句点や読点、ダッシュで上手に省略
-    for token in ['。', '、', ' - ', ' – ', ' — ', ';', '：', ':']:
-        idx = t.find(token)
-        if 0 < idx <= max_chars:
-            return t[:idx].strip() + '…'
-    return t[:max_chars].rstrip() + '…'
 
+def get_llm():
+    """接続プール・レート制限・再試行・サーキットブレーカー付きのクライアント"""
+    global llm, client
+    if llm is None:
+        with _llm_lock:
+            if llm is None:
+                api_key = os.getenv("AZURE_OPENAI_API_KEY")
+                endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+                api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
+                if not api_key or not endpoint:
+                    print("[ERROR] Azure OpenAI credentials are missing (AZURE_OPENAI_API_KEY / AZURE_OPENAI_ENDPOINT)")
+                    raise ValueError("Azure OpenAI の認証情報（AZURE_OPENAI_API_KEY / AZURE_OPENAI_ENDPOINT）が設定されていません。")
+                created = create_azure_llm_client(api_key, endpoint, api_version)
+                client = created.client
+                llm = created
+                print("[INFO] Azure OpenAI enabled.")
+    return llm
 
+# ===== ユーティリティ =====
 def safe_ascii_filename(name: str, default="meeting"):
     s = re.sub(r'[^\w\-.]+', '_', name, flags=re.UNICODE)
     return s or default
@@ -99,458 +106,1078 @@ def strip_code_fence(s: str) -> str:
     return re.sub(r"^```(?:json)?|```$", "", s.strip(), flags=re.MULTILINE)
 
 # ====== AI 解析 ======
-def parse_meeting_minutes(minutes_text: str) -> dict:
-    """
-    議事録テキスト→構造化データ（スライド設計用）
-    生成AIのみを使用して解析を行います。生成には5分ほど時間がかかります。
-    """
-    minutes_text = minutes_text or ""
-    
-    if not minutes_text.strip():
-        raise ValueError("議事録テキストが入力されていません。")
-    
-    try:
-        system = (
-            "あなたは上級のB2Bプリセールスです。"
-            "入力の議事録を、ビジネスプレゼンの分かりやすい流れに適したJSONへ構造化してください。"
-            "箇条書きは短く簡潔に（1行・名詞止めや体言止めを優先）。"
-            "可能なら冗長表現を圧縮してください。"
-        )
-        user_prompt = f"""
-以下の議事録から、スライド用の構造化JSONを返してください。
-スキーマ:
-{{
+# プロンプト（スキーマ・要件）を変更したら上げる。古いキャッシュは参照されなくなる
+PROMPT_VERSION = "1"
+
+# LLM の応答をストリームで受け取り、届いたセクションから順にスライドを作る
+STREAMING_PARSE_ENABLED = os.getenv("STREAMING_PARSE_ENABLED", "1") != "0"
+LLM_STREAM_INCLUDE_USAGE = os.getenv("LLM_STREAM_INCLUDE_USAGE", "0") == "1"
+
+# 応答モード: verbose は従来のキーで json_object、compact は短縮キーで json_schema（構造化出力）
+LLM_RESPONSE_MODE = os.getenv("LLM_RESPONSE_MODE", "verbose")
+COMPACT_RESPONSE = LLM_RESPONSE_MODE == "compact"
+# 未設定なら verbose は従来どおり 1.0、compact は 0.2（o 系の推論モデルは 1.0 のみ対応）
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE") or ("0.2" if COMPACT_RESPONSE else "1.0"))
+
+PARSE_SCHEMA_PROMPT = """{
   "company_name": "string",
   "meeting_date": "string",
   "title": "string",
   "agenda": ["string"],
   "sections": [
-    {{
+    {
       "title": "string",
       "bullets": ["string"],
       "notes": ["string"]
-    }}
+    }
   ],
   "challenges": ["string"],
   "needs": ["string"],
   "next_actions": ["string"],
-  "bant": {{"budget":"string", "authority":"string", "need":"string", "timeline":"string"}},
+  "bant": {"budget":"string", "authority":"string", "need":"string", "timeline":"string"},
   "summary": ["string"]
-}}
+}"""
+
+
+def parse_cache_key(minutes_text: str) -> str:
+    normalized = normalize_text((minutes_text or "").replace('\r\n', '\n'))
+    mode = ["compact-" + compact_schema.SCHEMA_VERSION] if COMPACT_RESPONSE else []
+    return make_key(normalized, os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini"), PROMPT_VERSION,
+                    PREPROCESS_VERSION if PREPROCESS_ENABLED else "", *mode)
+
+
+def parse_meeting_minutes(minutes_text: str, check_cache: bool = True) -> dict:
+    """
+    議事録テキスト→構造化データ（スライド設計用）
+    生成AIのみを使用して解析を行います。生成には5分ほど時間がかかります。
+    同じ議事録の解析結果はキャッシュから返します（呼び出し側ですでに引いて外れていれば check_cache=False）。
+    """
+    minutes_text = minutes_text or ""
+    
+    if not minutes_text.strip():
+        raise ValueError("議事録テキストが入力されていません。")
+
+    cached = lookup_parse_cache(minutes_text) if check_cache else None
+    if cached is not None:
+        return cached
+
+    with span("parse"):
+        data = _parse_with_llm(compact_minutes(minutes_text))
+    store_parse_cache(minutes_text, data)
+    return data
+
+
+def compact_minutes(minutes_text: str) -> str:
+    """プロンプトに入れる前の前処理（タイムスタンプ・言いよどみ・重複などを除く）"""
+    if not PREPROCESS_ENABLED:
+        return minutes_text
+    with span("preprocess"):
+        compact, report = preprocess_minutes(minutes_text)
+    record_input_tokens(report["tokens_before"], report["tokens_after"])
+    removed = ", ".join(f"{k}={v}" for k, v in report["removed"].items() if v)
+    print(f"[INFO] Preprocess: {report['tokens_before']} -> {report['tokens_after']} tokens "
+          f"({report['tokenizer']}; {report['chars_before']} -> {report['chars_after']} chars"
+          f"{'; ' + removed if removed else ''})")
+    return compact
+
+
+def lookup_parse_cache(minutes_text: str):
+    if parse_cache is None:
+        return None
+    try:
+        with span("cache_lookup"):
+            return parse_cache.get(parse_cache_key(minutes_text))
+    except Exception as e:
+        print(f"[WARNING] Parse cache read failed: {e}")
+        return None
+
+
+def store_parse_cache(minutes_text: str, data: dict):
+    if parse_cache is None:
+        return
+    try:
+        parse_cache.put(parse_cache_key(minutes_text), data)
+    except Exception as e:
+        print(f"[WARNING] Parse cache write failed: {e}")
+
+
+def hold_parse_flight(minutes_text: str):
+    """同じ議事録の解析のロック（解析キャッシュが無効なら、待っても結果を使えないので何もしない）"""
+    if parse_cache is None:
+        return contextlib.nullcontext(False)
+    return parse_flights.hold(parse_cache_key(minutes_text))
+
+
+def use_chunked_parse(minutes_text: str) -> bool:
+    return CHUNKED_PARSE_ENABLED and len(minutes_text) > CHUNK_THRESHOLD_CHARS
+
+
+def _parse_with_llm(minutes_text: str) -> dict:
+    if use_chunked_parse(minutes_text):
+        return _parse_chunked(minutes_text)
+    return _request_structured_json(minutes_text)
+
+
+def _parse_chunked(minutes_text: str) -> dict:
+    """
+    長い議事録はチャンクに分けて並列に解析し、結果を統合する（map-reduce）
+    全体の待ち時間は最も遅いチャンク程度に収まる
+    """
+    with span("chunk_split"):
+        chunks = split_minutes(minutes_text)
+    print(f"[INFO] Chunked parse: {len(minutes_text)} chars -> {len(chunks)} chunks")
+    if len(chunks) <= 1:
+        return _request_structured_json(minutes_text)
+    with ThreadPoolExecutor(max_workers=max(1, CHUNK_CONCURRENCY), thread_name_prefix="chunk") as pool:
+        futures = [submit_with_context(pool, _request_structured_json, c, (i + 1, len(chunks)))
+                   for i, c in enumerate(chunks)]
+        parts = [f.result() for f in futures]
+    with span("chunk_merge"):
+        return merge_parsed(parts)
+
+
+def build_parse_messages(minutes_text: str, part: tuple = None) -> list:
+    """
+    構造化 JSON を要求するプロンプト
+    part=(i, n) のときは議事録の一部であることをプロンプトで伝える
+    """
+    part_note = ""
+    if part:
+        part_note = (
+            f"- この議事録は長い議事録の一部（{part[0]}/{part[1]}）です。この部分に含まれる内容だけを抽出してください。\n"
+            "- 前後の部分と重なる箇所があります。会社名・日付・タイトルは分かる場合のみ記入してください。\n"
+        )
+    system = (
+        "あなたは上級のB2Bプリセールスです。"
+        "入力の議事録を、ビジネスプレゼンの分かりやすい流れに適したJSONへ構造化してください。"
+        "箇条書きは短く簡潔に（1行・名詞止めや体言止めを優先）。"
+        "可能なら冗長表現を圧縮してください。"
+    )
+    user_prompt = f"""
+以下の議事録から、スライド用の構造化JSONを返してください。
+スキーマ{"（キーは短縮形。値の意味を示す）" if COMPACT_RESPONSE else ""}:
+{compact_schema.SCHEMA_PROMPT if COMPACT_RESPONSE else PARSE_SCHEMA_PROMPT}
 要件:
 - 箇条書きは45文字程度で簡潔に。
 - 無い要素は空配列/空文字でOK。
 - 日本語で返す。
-議事録:
+{part_note}議事録:
 {minutes_text}
 """
-        resp = client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini"),
-            temperature=1.0,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
-        content = resp.choices[0].message.content
-        content = strip_code_fence(content)
-        data = json.loads(content)
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def response_format() -> dict:
+    return compact_schema.RESPONSE_FORMAT if COMPACT_RESPONSE else {"type": "json_object"}
+
+
+def expand_response(data) -> dict:
+    """compact モードの応答をスキーマで検査し、従来の形に戻す（verbose はそのまま）"""
+    if not COMPACT_RESPONSE:
         return data
+    errors = compact_schema.validate(data)
+    if errors:
+        # 欠けた項目は空で補い、型の違う値は捨てて続行する
+        print(f"[WARNING] Compact response does not match the schema ({len(errors)}): {'; '.join(errors[:3])}")
+    return compact_schema.expand(data)
+
+
+def _request_structured_json(minutes_text: str, part: tuple = None) -> dict:
+    """LLM に構造化 JSON を1回要求する"""
+    try:
+        with span("llm_call"):
+            resp = get_llm().create(
+                model=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini"),
+                temperature=LLM_TEMPERATURE,
+                response_format=response_format(),
+                messages=build_parse_messages(minutes_text, part),
+            )
+        record_usage(getattr(resp, "usage", None))
+        with span("json_parse"):
+            content = resp.choices[0].message.content
+            content = strip_code_fence(content)
+            data = json.loads(content)
+        return expand_response(data)
     except Exception as e:
         print(f"[ERROR] AI parse error: {e}")
         raise ValueError(f"議事録の解析に失敗しました: {str(e)}")
 
 
+def stream_structured_json(minutes_text: str):
+    """LLM の応答をストリームで受け取り、本文の断片を順に返す"""
+    extra = {}
+    if LLM_STREAM_INCLUDE_USAGE:
+        # 対応する API バージョンでは最後のチャンクにトークン使用量が付く
+        extra["stream_options"] = {"include_usage": True}
+    try:
+        with span("llm_connect"):
+            stream = get_llm().create(
+                model=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini"),
+                temperature=LLM_TEMPERATURE,
+                response_format=response_format(),
+                messages=build_parse_messages(minutes_text),
+                stream=True,
+                **extra,
+            )
+        # 読み終わる（途中でやめる）と、LLMClient の同時実行枠が返る
+        with stream:
+            for chunk in stream:
+                record_usage(getattr(chunk, "usage", None))
+                # Azure はコンテンツフィルタ結果だけの（choices が空の）チャンクを返すことがある
+                if not chunk.choices:
+                    continue
+                if getattr(chunk.choices[0], "finish_reason", None) == "length":
+                    raise ValueError("AIの応答が出力トークンの上限で途中で切れました。")
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+    except Exception as e:
+        print(f"[ERROR] AI parse error: {e}")
+        raise ValueError(f"議事録の解析に失敗しました: {str(e)}")
 
 
 # ====== PPT 生成 ======
-def create_meeting_summary_ppt(parsed: dict) -> io.BytesIO:
+class DeckResult:
     """
-    構造化データ→PPTX生成
+    create_meeting_summary_ppt の戻り値
+    スライド数などのメタデータを持ち、PPTX は write_to で保存先へ直接書き出す
+    plan は描画したスライド仕様（テンプレート由来のスライドは含まない）
+    """
+
+    reused_slides = 0  # 前回のデッキから再利用したスライド数（編集後の再生成のみ）
+
+    def __init__(self, prs, parsed: dict, plan: list):
+        self.presentation = prs
+        self.plan = plan
+        self.slide_count = len(prs.slides)
+        self.section_count = len(parsed.get("sections", []))
+        self.company_name = parsed.get("company_name", "meeting") or "meeting"
+
+    def write_to(self, target):
+        """ファイルパスまたは書き込み可能なファイルオブジェクトへ PPTX を書き出す"""
+        self.presentation.save(target)
+
+    def to_bytesio(self) -> io.BytesIO:
+        # 出力
+        out = io.BytesIO()
+        self.write_to(out)
+        out.seek(0)
+        return out
+
+
+class MergedDeckResult(DeckResult):
+    """シャードを結合したデッキ（Presentation は持たず、書き出し時にパッケージを組み立てる）"""
+
+    def __init__(self, merger, parsed: dict, plan: list):
+        self.presentation = None
+        self.plan = plan
+        self.merger = merger
+        self.slide_count = merger.slide_count
+        self.section_count = len(parsed.get("sections", []))
+        self.company_name = parsed.get("company_name", "meeting") or "meeting"
 
-    変更点（okunote の 9つのコツを反映）:
-    - ワンスライド・ワンメッセージ原則の適用
-    - 箇条は最大6件に制限、長い箇条は短縮して別スライド化
-    - 視線を意識して重要な要素を上へ配置
-    - 色の役割（背景・文字・メイン・アクセント）を厳格化
-    - 左揃えの徹底、行間・余白の調整
+    def write_to(self, target):
+        self.merger.write(target)
+
+
+class StreamedDeckResult(DeckResult):
+    """
+    スライド計画を少しずつ描画しながら書き出すデッキ
+    chunk_slides 枚ずつ小さな Presentation に描画し、スライドのパートを出力へ書いたら捨てるので、
+    メモリ使用量はデッキの大きさによらない。write_to のたびに描画し直す。
     """
-    template_path = os.path.join(os.path.dirname(__file__), "image", "tempppt.pptx")
-    try:
-        if os.path.exists(template_path):
-            prs = Presentation(template_path)
-            print("[INFO] Using template:", template_path)
-        else:
-            prs = Presentation()
-            print("[WARNING] Template not found, using default presentation")
-    except Exception as e:
-        print(f"[ERROR] Failed to load template: {e}")
-        prs = Presentation()
-        print("[INFO] Using default presentation as fallback")
 
-    def get_layout(index_fallback=1):
-        try:
-            return prs.slide_layouts[index_fallback]
-        except Exception:
-            return prs.slide_layouts[0]
+    def __init__(self, plan: list, parsed: dict, chunk_slides: int = None):
+        self.presentation = None
+        self.plan = plan
+        self.chunk_slides = max(1, chunk_slides or STREAM_WRITE_CHUNK_SLIDES)
+        # テンプレートだけのパッケージ（マスター・レイアウト・テンプレート由来のスライド）
+        self._base, self.template_slides = render_plan_shard([], pooled=False)
+        self.slide_count = self.template_slides + len(plan)
+        self.section_count = len(parsed.get("sections", []))
+        self.company_name = parsed.get("company_name", "meeting") or "meeting"
 
-    def add_title_slide(title: str, subtitle: str = ""):
-        slide = prs.slides.add_slide(get_layout(0))
-        # タイトルの背景に淡いアクセント矩形を置き、タイトルを上部に寄せる（視線を上へ）
-        try:
-            # タイトル背景
-            slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, Inches(0), Inches(0), prs.slide_width, Inches(1.2)).fill.solid()
-            rect = slide.shapes[-1]
-            rect.fill.fore_color.rgb = ACCENT_RGB
-            rect.line.fill.background()
-            # 透明度はpptxで直接制御しにくいため薄い色を使う
-        except Exception:
-            pass
-
-        if slide.shapes.title:
-            slide.shapes.title.text = title
-            t = slide.shapes.title.text_frame.paragraphs[0]
-            if t.runs:
-                set_font(t.runs[0], 40, True, PRIMARY_RGB)
-            t.alignment = PP_ALIGN.LEFT
-
-        # 副題
+    def write_to(self, target):
+        from deck_merge import DeckMerger
+        merger = DeckMerger(self._base, out=target)
+        for start in range(0, len(self.plan), self.chunk_slides):
+            # テンプレートのコピーはこのスレッドで作る（事前用意分を使うより RSS が増えにくい）
+            blob, template_slides = render_plan_shard(self.plan[start:start + self.chunk_slides], pooled=False)
+            merger.append(blob, skip=template_slides)
+        merger.close()
+
+
+# 解析結果ごとのスライド計画（同じ解析結果の再生成・プレビューで再利用する）
+plan_cache = PlanCache()
+# 解析結果ごとのスライドのプレビュー（SVG）
+preview_cache = PreviewCache()
+
+
+# 大きなデッキはスライド計画を分割してプロセスプールで並列に描画し、パッケージ単位で結合する
+PARALLEL_RENDER_PROCESSES = int(os.getenv("PARALLEL_RENDER_PROCESSES", "0"))  # 0 / 1 は無効
+PARALLEL_RENDER_MIN_SLIDES = int(os.getenv("PARALLEL_RENDER_MIN_SLIDES", "200"))
+# 大きなデッキは少しずつ描画しながら書き出し、リクエストあたりのメモリを抑える
+STREAM_WRITE_MIN_SLIDES = int(os.getenv("STREAM_WRITE_MIN_SLIDES", "300"))  # 0 は無効
+STREAM_WRITE_CHUNK_SLIDES = int(os.getenv("STREAM_WRITE_CHUNK_SLIDES", "50"))
+_render_pools = {}  # プロセス数 → 並列描画のプール
+_render_pool_lock = threading.Lock()
+
+
+def plan_deck_cached(parsed: dict) -> list:
+    """構造化データ→スライド仕様のリスト（PPTX は作らない）"""
+    with span("plan"):
+        return plan_cache.get_plan(parsed)
+
+
+def preview_deck_cached(parsed: dict) -> tuple:
+    """構造化データ→(キー, スライドごとのプレビュー)（PPTX は作らない）"""
+    with span("preview"):
+        return preview_cache.get(parsed, plan_deck_cached)
+
+
+def create_meeting_summary_ppt(parsed: dict, processes: int = None) -> DeckResult:
+    """構造化データ→PPTX生成（processes は並列描画のプロセス数。None は環境変数の設定）"""
+    plan = plan_deck_cached(parsed)
+    processes = PARALLEL_RENDER_PROCESSES if processes is None else processes
+    if processes > 1 and len(plan) >= PARALLEL_RENDER_MIN_SLIDES:
+        from deck_merge import MergeError
         try:
-            if len(slide.placeholders) > 1:
-                ph = slide.placeholders[1]
-                ph.text = subtitle
-                p = ph.text_frame.paragraphs[0]
-                if p.runs:
-                    set_font(p.runs[0], 18, False, SUBTEXT_RGB)
-                p.alignment = PP_ALIGN.LEFT
-        except (KeyError, IndexError):
-            if subtitle:
-                textbox = slide.shapes.add_textbox(Inches(0.6), Inches(1.1), Inches(9), Inches(0.6))
-                textbox.text = subtitle
-                p = textbox.text_frame.paragraphs[0]
-                if p.runs:
-                    set_font(p.runs[0], 18, False, SUBTEXT_RGB)
-                p.alignment = PP_ALIGN.LEFT
-
-    def add_section_divider(title: str):
-        slide = prs.slides.add_slide(get_layout(5 if len(prs.slide_layouts) > 5 else 1))
-        if slide.shapes.title:
-            slide.shapes.title.text = title
-            t = slide.shapes.title.text_frame.paragraphs[0]
-            if t.runs:
-                set_font(t.runs[0], 36, True, PRIMARY_RGB)
-            t.alignment = PP_ALIGN.LEFT
-
-    def ensure_textbox(slide, left, top, width, height):
-        return slide.shapes.add_textbox(Inches(left), Inches(top), Inches(width), Inches(height))
-
-    def add_bullets_block(shape, items, font_size=20, bullet_char="•"):
-        tf = shape.text_frame
-        tf.clear()
-        if not items:
-            return
-        # 最初の段落は見出し扱いにしない（箇条のみにする）
-        for i, it in enumerate(items):
-            if i == 0:
-                tf.text = f"{bullet_char} {it}"
-                p = tf.paragraphs[0]
-            else:
-                p = tf.add_paragraph()
-                p.text = f"{bullet_char} {it}"
-            p.level = 0
-            # 左揃え
-            p.alignment = PP_ALIGN.LEFT
-            if p.runs:
-                # フォントサイズを内容の長さで少し調整
-                sz = font_size - 2 if len(it) > 40 else font_size
-                set_font(p.runs[0], sz, False, TEXT_RGB)
-            p.line_spacing = 1.2
-            p.space_after = Pt(6)
-
-    def promote_key_message(slide, message: str):
-        """重要メッセージをスライド上部に大きく表示する（ワンスライド・ワンメッセージ）"""
-        box = ensure_textbox(slide, 0.6, 1.6, 9.0, 1.0)
-        tf = box.text_frame
-        tf.clear()
-        tf.text = message
-        p = tf.paragraphs[0]
-        if p.runs:
-            set_font(p.runs[0], 22, True, PRIMARY_RGB)
-        p.alignment = PP_ALIGN.LEFT
-
-    def add_content_slide(title: str, bullets: list, notes: list):
-        # ワンスライド・ワンメッセージの適用:
-        # - bullets が 1 件で十分に要約されている場合はタイトル＋1行で完結
-        # - bullets が複数だが各々が短くて関連性が高い場合は 1 スライドに最大 MAX_BULLETS_PER_SLIDE
-        # - 長い箇条や1件ごとにメッセージ性が高い箇条は個別スライドへ分割
-        items = bullets or []
-        # 重要な要素をスライド上部へ
-        if len(items) == 1:
-            slide = prs.slides.add_slide(get_layout(1))
-            if slide.shapes.title:
-                slide.shapes.title.text = title
-                t = slide.shapes.title.text_frame.paragraphs[0]
-                if t.runs:
-                    set_font(t.runs[0], 30, True, PRIMARY_RGB)
-                t.alignment = PP_ALIGN.LEFT
-            # 1つのメッセージを大きめに表示
-            promote_key_message(slide, shorten_bullet(items[0], max_chars=80))
-            # 補足ノート
-            if notes:
-                box = ensure_textbox(slide, 0.6, 3.0, 9.0, 2.5)
-                add_bullets_block(box, [shorten_bullet(n, max_chars=80) for n in notes], 16)
-            return
+            return create_meeting_summary_ppt_parallel(parsed, plan, processes)
+        except (MergeError, BrokenProcessPool) as e:
+            print(f"[WARNING] Parallel render failed, falling back to serial: {e}")
+    if 0 < STREAM_WRITE_MIN_SLIDES <= len(plan):
+        # 描画は保存時（write_to）に少しずつ行う
+        return StreamedDeckResult(plan, parsed)
+    from deck_builder import DeckBuilder
+    with span("build_slides"):
+        builder = DeckBuilder(template_pool)
+        builder.emit_all(plan)
+        return DeckResult(builder.prs, parsed, builder.specs)
 
-        # 分割対象（各箇条がそれぞれメッセージ）
-        # 判定: 箇条が短いが個別に伝える価値がある（例：箇条ごとに句点含む or 長さ>max）
-        separate_slides = []
-        remaining = []
-        for it in items:
-            clean = normalize_text(it)
-            # 個々の箇条が独立したメッセージと判断する条件
-            if len(clean) > MAX_CHARS_PER_BULLET * 0.9 or '\n' in clean:
-                separate_slides.append(clean)
-            else:
-                remaining.append(clean)
-
-        # まず残りを1スライドにまとめる（ただし件数が多ければ分割）
-        if remaining:
-            # chunking
-            chunks = [remaining[i:i+MAX_BULLETS_PER_SLIDE] for i in range(0, len(remaining), MAX_BULLETS_PER_SLIDE)]
-            for idx, chunk in enumerate(chunks):
-                slide = prs.slides.add_slide(get_layout(1))
-                slide_title = title if idx == 0 else f"{title}（続き）"
-                if slide.shapes.title:
-                    slide.shapes.title.text = slide_title
-                    t = slide.shapes.title.text_frame.paragraphs[0]
-                    if t.runs:
-                        set_font(t.runs[0], 30, True, PRIMARY_RGB)
-                    t.alignment = PP_ALIGN.LEFT
-                # 2カラムを検討（chunk 数が多ければ2カラム）
-                if len(chunk) >= 5:
-                    half = (len(chunk) + 1) // 2
-                    add_bullets_block(ensure_textbox(slide, 0.6, 1.9, 4.4, 4.8), [shorten_bullet(i) for i in chunk[:half]])
-                    add_bullets_block(ensure_textbox(slide, 5.2, 1.9, 4.4, 4.8), [shorten_bullet(i) for i in chunk[half:]])
-                else:
-                    add_bullets_block(ensure_textbox(slide, 0.6, 1.9, 9.0, 4.8), [shorten_bullet(i) for i in chunk])
-                if notes and idx == 0:
-                    box = ensure_textbox(slide, 0.6, 6.8, 9.0, 1.0)
-                    add_bullets_block(box, [shorten_bullet(n, max_chars=80) for n in notes[:2]], 16)
-
-        # separate_slides は1件ずつ強調
-        for msg in separate_slides:
-            slide = prs.slides.add_slide(get_layout(1))
-            if slide.shapes.title:
-                slide.shapes.title.text = title
-                t = slide.shapes.title.text_frame.paragraphs[0]
-                if t.runs:
-                    set_font(t.runs[0], 30, True, PRIMARY_RGB)
-                t.alignment = PP_ALIGN.LEFT
-            promote_key_message(slide, shorten_bullet(msg, max_chars=120))
-
-    def add_agenda_slide(items: list):
-        if not items:
-            return
-        slide = prs.slides.add_slide(get_layout(1))
-        if slide.shapes.title:
-            slide.shapes.title.text = "アジェンダ"
-            t = slide.shapes.title.text_frame.paragraphs[0]
-            if t.runs:
-                set_font(t.runs[0], 30, True, PRIMARY_RGB)
-            t.alignment = PP_ALIGN.LEFT
-        add_bullets_block(ensure_textbox(slide, 0.6, 1.9, 9.0, 4.8), [shorten_bullet(i) for i in items], 20, "■")
-
-    def add_bant_slide(bant: dict):
-        if not bant:
-            return
-        if not any([bant.get(k) for k in ("budget", "authority", "need", "timeline")]):
-            return
-        slide = prs.slides.add_slide(get_layout(1))
-        if slide.shapes.title:
-            slide.shapes.title.text = "BANT（商談情報）"
-            t = slide.shapes.title.text_frame.paragraphs[0]
-            if t.runs:
-                set_font(t.runs[0], 30, True, PRIMARY_RGB)
-            t.alignment = PP_ALIGN.LEFT
-        box = ensure_textbox(slide, 0.6, 1.9, 9.0, 5.0)
-        tf = box.text_frame
-        tf.clear()
-        rows = [
-            ("Budget（予算）", bant.get("budget", "")),
-            ("Authority（決裁）", bant.get("authority", "")),
-            ("Need（ニーズ）", bant.get("need", "")),
-            ("Timeline（時期）", bant.get("timeline", "")),
-        ]
-        for i, (k, v) in enumerate(rows):
-            p = tf.add_paragraph() if i > 0 else tf.paragraphs[0]
-            p.text = k
-            if p.runs: set_font(p.runs[0], 18, True, PRIMARY_RGB)
-            p.alignment = PP_ALIGN.LEFT
-            p.line_spacing = 1.1
-            p2 = tf.add_paragraph()
-            p2.text = f"{v or '—'}"
-            if p2.runs: set_font(p2.runs[0], 18, False, TEXT_RGB)
-            p2.space_after = Pt(8)
-
-    def add_next_actions_slide(items: list):
-        if not items:
-            return
-        # ネクストアクションはワンスライド・ワンメッセージに沿って可能なら個別スライド化
-        for it in items:
-            slide = prs.slides.add_slide(get_layout(1))
-            if slide.shapes.title:
-                slide.shapes.title.text = "ネクストアクション"
-                t = slide.shapes.title.text_frame.paragraphs[0]
-                if t.runs:
-                    set_font(t.runs[0], 30, True, PRIMARY_RGB)
-                t.alignment = PP_ALIGN.LEFT
-            promote_key_message(slide, shorten_bullet(it, max_chars=100))
-
-    def add_summary_slide(items: list):
-        if not items:
-            return
-        slide = prs.slides.add_slide(get_layout(1))
-        if slide.shapes.title:
-            slide.shapes.title.text = "まとめ"
-            t = slide.shapes.title.text_frame.paragraphs[0]
-            if t.runs:
-                set_font(t.runs[0], 30, True, PRIMARY_RGB)
-            t.alignment = PP_ALIGN.LEFT
-        add_bullets_block(ensure_textbox(slide, 0.6, 1.9, 9.0, 4.8), [shorten_bullet(i) for i in items], 20, "●")
-
-    # ===== 実装：スライド生成フロー =====
-    title = parsed.get("title") or "打ち合わせ要約"
-    company = parsed.get("company_name") or ""
-    date = parsed.get("meeting_date") or ""
-    subtitle = " / ".join([s for s in [company, f"{date} 実施" if date else ""] if s])
-
-    add_title_slide(title, subtitle)
-    add_agenda_slide(parsed.get("agenda", []))
-
-    # セクションごと
-    sections = parsed.get("sections", [])
-    for s in sections:
-        stitle = s.get("title") or ""
-        bullets = [shorten_bullet(b) for b in (s.get("bullets") or [])]
-        notes = s.get("notes") or []
-        # セクション見出しスライド（大見出しに見える場合のみ）
-        if stitle and (len(bullets) == 0 and len(notes) == 0):
-            add_section_divider(stitle)
-        # 通常コンテンツ
-        if bullets:
-            add_content_slide(stitle or "セクション", bullets, notes)
-        elif notes:
-            add_content_slide(stitle or "セクション", [], notes)
-
-    # BANT／課題・ニーズ／ネクストアクション／まとめ
-    add_bant_slide(parsed.get("bant", {}))
-
-    challenges = [shorten_bullet(x) for x in parsed.get("challenges", [])]
-    needs = [shorten_bullet(x) for x in parsed.get("needs", [])]
-    if challenges or needs:
-        slide = prs.slides.add_slide(get_layout(1))
-        if slide.shapes.title:
-            slide.shapes.title.text = "課題とニーズ"
-            t = slide.shapes.title.text_frame.paragraphs[0]
-            if t.runs:
-                set_font(t.runs[0], 30, True, PRIMARY_RGB)
-            t.alignment = PP_ALIGN.LEFT
-        add_bullets_block(ensure_textbox(slide, 0.6, 1.9, 4.4, 4.8), [shorten_bullet(i) for i in challenges], 20)
-        add_bullets_block(ensure_textbox(slide, 5.2, 1.9, 4.4, 4.8), [shorten_bullet(i) for i in needs], 20)
-
-    add_next_actions_slide(parsed.get("next_actions", []))
-    add_summary_slide(parsed.get("summary", []))
-
-    # 末尾に Thanks スライド
-    slide = prs.slides.add_slide(get_layout(1))
-    if slide.shapes.title:
-        slide.shapes.title.text = "ご清聴ありがとうございました"
-        t = slide.shapes.title.text_frame.paragraphs[0]
-        if t.runs:
-            set_font(t.runs[0], 32, True, PRIMARY_RGB)
-        t.alignment = PP_ALIGN.LEFT
-
-    # 出力
+
+def render_deck_bytes(parsed: dict) -> tuple:
+    """プロセスプール用: 構造化データ→(PPTX のバイト列, スライド数)"""
+    deck = create_meeting_summary_ppt(parsed, processes=1)
+    return deck.to_bytesio().getvalue(), deck.slide_count
+
+
+def render_plan_shard(plan: list, pooled: bool = True) -> tuple:
+    """プロセスプール用: スライド仕様の一部→(PPTX のバイト列, テンプレート由来の先頭スライド数)"""
+    from deck_builder import DeckBuilder
+    builder = DeckBuilder(template_pool, pooled)
+    template_slides = builder.slide_count
+    builder.emit_all(plan)
     out = io.BytesIO()
-    prs.save(out)
-    out.seek(0)
+    builder.prs.save(out)
+    return out.getvalue(), template_slides
+
+
+def split_plan(plan: list, shards: int) -> list:
+    """スライド仕様を枚数がほぼ均等な連続した区間に分ける"""
+    shards = max(1, min(shards, len(plan)))
+    size, extra = divmod(len(plan), shards)
+    out, start = [], 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        out.append(plan[start:end])
+        start = end
     return out
 
+
+def get_render_pool(processes: int):
+    """
+    並列描画のプロセスプール（プロセス数ごとに1つ作って使い続ける）
+    gunicorn のスレッドから作るので fork ではなく spawn で起動する（batch.new_render_pool）。
+    使用中かもしれないプールは閉じない
+    """
+    with _render_pool_lock:
+        pool = _render_pools.get(processes)
+        if pool is None:
+            pool = _render_pools[processes] = new_render_pool(processes)
+        return pool
+
+
+def discard_render_pool(processes: int, pool):
+    """壊れたプールを捨て、次の並列描画で作り直させる（他のスレッドが作り直したプールは残す）"""
+    with _render_pool_lock:
+        if _render_pools.get(processes) is pool:
+            del _render_pools[processes]
+    pool.shutdown(wait=False)
+
+
+def create_meeting_summary_ppt_parallel(parsed: dict, plan: list, processes: int) -> "MergedDeckResult":
+    """スライド計画をシャードに分けて並列に描画し、1つのパッケージに結合する"""
+    pool = get_render_pool(processes)
+    with span("build_slides"):
+        try:
+            results = list(pool.map(render_plan_shard, split_plan(plan, processes)))
+        except BrokenProcessPool:
+            discard_render_pool(processes, pool)
+            raise
+    from deck_merge import DeckMerger
+    with span("merge"):
+        merger = DeckMerger(results[0][0])
+        for blob, template_slides in results[1:]:
+            merger.append(blob, skip=template_slides)
+    return MergedDeckResult(merger, parsed, plan)
+
+
+# ===== 編集後の再生成 =====
+# スライドの描画（DeckBuilder の出力）を変えたら上げる。古いデッキのスライドは再利用しなくなる
+RENDER_VERSION = "1"
+
+_template_package = None
+_template_package_key = None
+_template_package_lock = threading.Lock()
+
+
+def template_package() -> tuple:
+    """
+    テンプレートだけのパッケージ (PPTX のバイト列, テンプレート由来のスライド数)
+    テンプレートのパスと mtime ごとに1回作る（template_pool と同じく、テンプレートの更新で作り直す）
+    """
+    global _template_package, _template_package_key
+    try:
+        key = (template_pool.path, os.stat(template_pool.path).st_mtime_ns)
+    except OSError:
+        key = (template_pool.path, None)
+    with _template_package_lock:
+        if _template_package is None or _template_package_key != key:
+            _template_package = render_plan_shard([], pooled=False)
+            _template_package_key = key
+        return _template_package
+
+
+def sidecar_name(deck_name: str) -> str:
+    return os.path.splitext(deck_name)[0] + ".json"
+
+
+def save_deck_sidecar(deck_name: str, parsed: dict, deck: DeckResult):
+    """デッキの横に解析結果とスライドごとのキーを保存する（編集・再生成に使う）"""
+    blob = json.dumps({
+        "version": SIDECAR_VERSION,
+        "plan_version": PLAN_VERSION,
+        "render_version": RENDER_VERSION,
+        "deck": deck_name,
+        "template_slides": deck.slide_count - len(deck.plan),
+        "slide_keys": plan_keys(deck.plan),
+        "parsed": parsed,
+    }, ensure_ascii=False).encode("utf-8")
+    try:
+        artifact_storage.save(sidecar_name(deck_name), lambda f: f.write(blob))
+    except Exception as e:
+        print(f"[WARNING] Deck sidecar write failed: {e}")
+
+
+def load_deck_sidecar(deck_name: str):
+    """save_deck_sidecar で保存した内容（なければ None）"""
+    try:
+        data = json.loads(artifact_storage.read(sidecar_name(deck_name)))
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("version") != SIDECAR_VERSION or data.get("deck") != deck_name:
+        return None
+    return data
+
+
+def create_incremental_ppt(parsed: dict, sidecar: dict, previous) -> "MergedDeckResult":
+    """
+    前回のデッキ（previous）のスライドを再利用し、仕様が変わったスライドだけを描画する
+    出力は create_meeting_summary_ppt(parsed) と同じパッケージになる
+    """
+    plan = plan_deck_cached(parsed)
+    reuse = reuse_slides(sidecar["slide_keys"], plan)
+    base, _ = template_package()
+    with span("build_slides"):
+        merger = assemble_deck(base, previous, sidecar["template_slides"], plan, reuse, render_plan_shard)
+    deck = MergedDeckResult(merger, parsed, plan)
+    deck.reused_slides = sum(r is not None for r in reuse)
+    return deck
+
+
+# ストリーミング生成でスライドを作り始める前にそろっている必要があるキー（タイトルスライド・アジェンダ）
+STREAM_HEADER_KEYS = ("title", "company_name", "meeting_date", "agenda")
+
+
+def create_meeting_summary_ppt_streaming(minutes_text: str, on_progress=None):
+    """
+    議事録テキスト→(構造化データ, PPTX) をストリーミングで生成する
+
+    LLM の応答をストリームで受け取りながら JSON を逐次解析し、
+    タイトル・アジェンダ・各セクションのスライドを届いた順に作る。
+    PPTX の組み立てがトークン生成と重なるため、全体の待ち時間が短くなる。
+    json_object / json_schema はキーの順序を保証しないので、ヘッダー（タイトル・会社名・日付・アジェンダ）が
+    そろうまでセクションは描画せずに待ち、スライドの並びを plan_deck と同じにする。
+    on_progress(stage, **data) で進捗を通知する。
+    """
+    from deck_builder import DeckBuilder
+    notify = on_progress or (lambda stage, **data: None)
+    builder = DeckBuilder(template_pool)
+    parser = StreamingJSONParser()
+    partial = {}
+    sections = []
+    pending = []  # ヘッダーがそろうまで描画を待つセクション (index, section)
+
+    def flush():
+        if not all(k in partial for k in STREAM_HEADER_KEYS):
+            return
+        if not builder.title_done:
+            builder.add_header(partial)
+            notify("slide", slide_count=builder.slide_count, part="header")
+        while pending:
+            index, section = pending.pop(0)
+            builder.add_section(section)
+            sections.append(section)
+            notify("slide", slide_count=builder.slide_count, part="section",
+                   index=index, title=section.get("title") or "")
+
+    for delta in stream_structured_json(compact_minutes(minutes_text)):
+        for ev in parser.feed(delta):
+            if ev[0] == "value":
+                _, key, value = ev
+                if COMPACT_RESPONSE:
+                    key, value = compact_schema.expand_field(key, value)
+                partial[key] = value
+                flush()
+            elif ev[1] == ("se" if COMPACT_RESPONSE else "sections"):
+                _, _, index, section = ev
+                if not isinstance(section, dict):
+                    continue
+                if COMPACT_RESPONSE:
+                    section = compact_schema.expand_section(section)
+                pending.append((index, section))
+                flush()
+
+    try:
+        parsed = json.loads(strip_code_fence(parser.buf))
+    except ValueError:
+        # 途中で切れた応答は一括の解析と同じく失敗にする（欠けた結果をキャッシュ・保存しない）
+        print("[ERROR] Streaming response was incomplete")
+        raise ValueError("議事録の解析に失敗しました: AIの応答をJSONとして解釈できませんでした。")
+    parsed = expand_response(parsed)
+
+    # ストリーム中に組み立てなかった部分を補う（待たせていたセクションは確定した結果から描画する）
+    builder.add_header(parsed)
+    for s in parsed.get("sections", [])[len(sections):]:
+        builder.add_section(s)
+    builder.add_footer(parsed)
+    notify("slide", slide_count=builder.slide_count, part="footer")
+    return parsed, DeckResult(builder.prs, parsed, builder.specs)
+
 # ===== Flask ルーティング =====
-@app.route("/")
+# ルートは Blueprint に登録し、create_app でアプリに組み込む
+bp = Blueprint("slides", __name__)
+
+
+@bp.route("/")
 def index():
     return render_template("index.html")
 
-@app.route("/generate", methods=["POST"])
-def generate():
+def traced_job(fn):
+    """ジョブ本体を1件のトレースとして計測する（所要時間と成否をメトリクスに記録）"""
+    @functools.wraps(fn)
+    def wrapper(job, *args, **kwargs):
+        t0 = time.perf_counter()
+        status = "error"
+        try:
+            with trace(event_kind="job", job_id=job.id, kind=job.kind):
+                result = fn(job, *args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            JOBS.inc(kind=job.kind, status=status)
+            JOB_SECONDS.observe(time.perf_counter() - t0, kind=job.kind)
+    return wrapper
+
+
+@traced_job
+def run_generation(job, minutes_text: str) -> dict:
+    """
+    ジョブ本体: 議事録解析 → PPTX 生成 → 一時保存
+    戻り値は成功画面の表示に使う情報
+    """
     try:
-        minutes_text = request.form.get("minutes_text", "")
-        
+        job.publish("parse")
         if not minutes_text.strip():
-            return render_template("index.html", error="議事録テキストを入力してください。")
-        
-        # 議事録を解析
-        parsed = parse_meeting_minutes(minutes_text)
-        
-        # PowerPointファイルを生成
-        ppt_file = create_meeting_summary_ppt(parsed)
+            raise ValueError("議事録テキストが入力されていません。")
+        parsed, deck = lookup_parse_cache(minutes_text), None
+        if parsed is None:
+            # 他のワーカーが同じ議事録を解析中なら、終わるのを待って解析キャッシュを使う
+            with hold_parse_flight(minutes_text) as waited:
+                if waited:
+                    parsed = lookup_parse_cache(minutes_text)
+                if parsed is None and STREAMING_PARSE_ENABLED and not use_chunked_parse(minutes_text):
+                    # 解析とスライド組み立てを並行して進める
+                    parsed, deck = create_meeting_summary_ppt_streaming(minutes_text, on_progress=job.publish)
+                    store_parse_cache(minutes_text, parsed)
+                elif parsed is None:
+                    # 議事録を解析（キャッシュはここまでで引いているので、もう一度は引かない）
+                    parsed = parse_meeting_minutes(minutes_text, check_cache=False)
+        # 解析が終われば、PPTX の完成を待たずにプレビューできる（/jobs/<id>/preview）
+        job.parsed = parsed
+
+        if deck is None:
+            # PowerPointファイルを生成
+            job.publish("render", slide_total=len(plan_deck_cached(parsed)))
+            deck = create_meeting_summary_ppt(parsed)
 
         # ファイル名を生成
-        company_name = parsed.get("company_name", "meeting") or "meeting"
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        fname = f"{safe_ascii_filename(company_name)}_summary_{timestamp}.pptx"
-        
-        # 一時ファイルとして保存
-        file_path = os.path.join(TEMP_DIR, fname)
-        with open(file_path, 'wb') as f:
-            f.write(ppt_file.getvalue())
-        
-        # セッションに情報を保存
-        session['last_generated'] = {
+        company_name = deck.company_name
+        fname = deck_filename(company_name, job)
+
+        # 保存先へ直接書き出す（編集・再生成用に解析結果も保存）
+        job.publish("save")
+        with span("save"):
+            artifact_storage.save(fname, deck.write_to)
+        save_deck_sidecar(fname, parsed, deck)
+        artifact_evictor.ensure_running()
+
+        return {
             'filename': fname,
             'company_name': company_name,
-            'slide_count': len(Presentation(file_path).slides),
-            'analysis_summary': f"{company_name}様の議事録を解析し、{len(parsed.get('sections', []))}セクションのスライドを生成"
+            'slide_count': deck.slide_count,
+            'analysis_summary': f"{company_name}様の議事録を解析し、{deck.section_count}セクションのスライドを生成"
         }
-        
-        # 成功画面にリダイレクト
-        return redirect(url_for('success'))
-        
-    except ValueError as e:
-        return render_template("index.html", error=str(e))
+    except ValueError:
+        raise
     except Exception as e:
         print(f"[ERROR] Generation failed: {e}")
-        return render_template("index.html", error="PowerPoint生成中にエラーが発生しました。Azure OpenAIの設定を確認してください。")
+        raise ValueError("PowerPoint生成中にエラーが発生しました。Azure OpenAIの設定を確認してください。")
 
-@app.route("/success")
-def success():
-    if 'last_generated' not in session:
-        return redirect(url_for('index'))
-    
-    info = session['last_generated']
-    return render_template("success.html", 
-                         filename=info['filename'],
-                         slide_count=info['slide_count'],
-                         analysis_summary=info['analysis_summary'])
 
-@app.route("/download/<filename>")
-def download_file(filename):
+@traced_job
+def run_regeneration(job, source: str, parsed: dict) -> dict:
+    """
+    ジョブ本体: 編集した解析結果 → PPTX
+    前回のデッキ（source）とスライド仕様を比べ、変わったスライドだけを描き直す
+    """
     try:
-        file_path = os.path.join(TEMP_DIR, filename)
-        if not os.path.exists(file_path):
-            return render_template("index.html", error="ファイルが見つかりません。")
-        
+        job.parsed = parsed
+        plan = plan_deck_cached(parsed)
+        job.publish("render", slide_total=len(plan))
+        sidecar = load_deck_sidecar(source)
+        deck = None
+        if sidecar and sidecar.get("plan_version") == PLAN_VERSION and sidecar.get("render_version") == RENDER_VERSION:
+            try:
+                deck = create_incremental_ppt(parsed, sidecar, artifact_storage.read(source))
+            except Exception as e:  # 前回のデッキが削除済み・結合できない構成など
+                print(f"[WARNING] Incremental render failed, rendering the whole deck: {e}")
+        if deck is None:
+            deck = create_meeting_summary_ppt(parsed)
+
+        company_name = deck.company_name
+        fname = deck_filename(company_name, job)
+        job.publish("save")
+        with span("save"):
+            artifact_storage.save(fname, deck.write_to)
+        save_deck_sidecar(fname, parsed, deck)
+        artifact_evictor.ensure_running()
+
+        rendered = len(plan) - deck.reused_slides
+        changed = f"{len(changed_sections(sidecar['parsed'], parsed))}セクションの変更を反映し、" if sidecar else ""
+        return {
+            'filename': fname,
+            'company_name': company_name,
+            'slide_count': deck.slide_count,
+            'reused_slides': deck.reused_slides,
+            'rendered_slides': rendered,
+            'analysis_summary': f"{changed}{rendered}枚を作成（{deck.reused_slides}枚は前回のスライドを再利用）",
+        }
+    except ValueError:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Regeneration failed: {e}")
+        raise ValueError("PowerPoint の再生成中にエラーが発生しました。")
+
+
+def generation_key(minutes_text: str) -> str:
+    """同時に送られた同じ生成リクエストを1つのジョブにまとめるキー（議事録と解析条件のハッシュ）"""
+    return "generate:" + parse_cache_key(minutes_text)
+
+
+def regeneration_key(source: str, parsed: dict) -> str:
+    return "regenerate:" + make_key(source, json.dumps(parsed, ensure_ascii=False, sort_keys=True))
+
+
+def deck_filename(company_name: str, job) -> str:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{safe_ascii_filename(company_name)}_summary_{timestamp}_{job.id[:6]}.pptx"
+
+
+@traced_job
+def run_batch_generation(job, items: list) -> dict:
+    """ジョブ本体: 複数の議事録 → デッキ一式の ZIP"""
+    done = {"parsed": 0, "rendered": 0}
+
+    def on_progress(stage, **data):
+        done[stage] += 1
+        job.publish(stage, total=len(items), parsed=done["parsed"], rendered=done["rendered"])
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    fname = f"batch_{timestamp}_{job.id[:6]}.zip"
+    holder = {}
+
+    def write(f):
+        holder["manifest"] = run_batch(items, parse_meeting_minutes, render_deck_bytes, f, on_progress=on_progress,
+                                       render_pool=get_batch_render_pool())
+
+    job.publish("parse", total=len(items), parsed=0, rendered=0)
+    with span("save"):
+        artifact_storage.save(fname, write)
+    artifact_evictor.ensure_running()
+
+    manifest = holder["manifest"]
+    ok = [m for m in manifest if m["status"] == "ok"]
+    return {
+        'filename': fname,
+        'company_name': "",
+        'slide_count': sum(m["slide_count"] for m in ok),
+        'analysis_summary': f"{len(manifest)}件中{len(ok)}件の議事録からスライドを生成",
+        'manifest': manifest,
+    }
+
+
+def wants_json() -> bool:
+    best = request.accept_mimetypes.best_match(["application/json", "text/html"])
+    return best == "application/json" and request.accept_mimetypes[best] > request.accept_mimetypes["text/html"]
+
+
+@bp.route("/generate", methods=["POST"])
+def generate():
+    minutes_text = request.form.get("minutes_text", "")
+
+    if not minutes_text.strip():
+        if wants_json():
+            return jsonify(error="議事録テキストを入力してください。"), 400
+        return render_template("index.html", error="議事録テキストを入力してください。")
+
+    # 解析・生成はジョブとして投入し、すぐにジョブIDを返す
+    try:
+        job = jobs.submit(run_generation, minutes_text, key=generation_key(minutes_text))
+    except QueueFullError as e:
+        if wants_json():
+            return jsonify(error=str(e)), 503
+        return render_template("index.html", error=str(e)), 503
+
+    if wants_json():
+        return jsonify(job_id=job.id, status_url=url_for('.job_status', job_id=job.id)), 202
+    return redirect(url_for('.success', job_id=job.id))
+
+@bp.route("/batch", methods=["POST"])
+def batch():
+    upload = request.files.get("file")
+    try:
+        if upload is None or not upload.filename:
+            raise ValueError("議事録の ZIP または JSONL ファイルを選択してください。")
+        items = read_batch_items(upload.filename, upload.read())
+        job = jobs.submit(run_batch_generation, items, kind="batch")
+    except (ValueError, QueueFullError) as e:
+        status = 503 if isinstance(e, QueueFullError) else 400
+        if wants_json():
+            return jsonify(error=str(e)), status
+        return render_template("index.html", error=str(e)), status
+
+    if wants_json():
+        return jsonify(job_id=job.id, items=len(items), status_url=url_for('.job_status', job_id=job.id)), 202
+    return redirect(url_for('.success', job_id=job.id))
+
+def posted_parsed():
+    """
+    POST された構造化データ（解析結果の形の JSON）を取り出す → (parsed, エラー応答)
+    欠けたキーは空として扱うが、型の違う値（文字列のはずの数値、null のセクションなど）は 400 にする
+    """
+    parsed = request.get_json(silent=True)
+    if not isinstance(parsed, dict):
+        return None, (jsonify(error="構造化データ（JSON オブジェクト）を送信してください。"), 400)
+    errors = compact_schema.validate(parsed, compact_schema.VERBOSE_SCHEMA, partial=True)
+    if errors:
+        return None, (jsonify(error="構造化データの形式が正しくありません。", details=errors[:20]), 400)
+    return parsed, None
+
+@bp.route("/plan", methods=["POST"])
+def plan():
+    """構造化データ（JSON）からスライド構成だけを返す（PPTX は作らない）"""
+    parsed, error = posted_parsed()
+    if error:
+        return error
+    slides = plan_deck_cached(parsed)
+    return jsonify(slide_count=len(slides), slides=slides)
+
+def preview_response(parsed: dict):
+    """
+    プレビューの JSON。GET で ETag（解析結果とプレビューの版から決まる）が一致すれば 304
+    解析結果が VERBOSE_SCHEMA の型に合わなければ 400（POST された JSON も保存済みの解析結果も同じ）
+    """
+    errors = compact_schema.validate(parsed, compact_schema.VERBOSE_SCHEMA, partial=True)
+    if errors:
+        return jsonify(error="構造化データの形式が正しくありません。", details=errors[:20]), 400
+    key, slides = preview_deck_cached(parsed)
+    if request.method == "GET" and not is_resource_modified(request.environ, etag=key):
+        resp = Response(status=304)
+    else:
+        resp = jsonify(slide_count=len(slides), slides=slides)
+    resp.set_etag(key)
+    return resp
+
+@bp.route("/preview", methods=["POST"])
+def preview():
+    """構造化データ（JSON）からスライドごとのプレビュー（SVG）を返す（PPTX は作らない）"""
+    parsed = request.get_json(silent=True)
+    if not isinstance(parsed, dict):
+        return jsonify(error="構造化データ（JSON オブジェクト）を送信してください。"), 400
+    return preview_response(parsed)
+
+@bp.route("/preview/<filename>")
+def preview_deck(filename):
+    """生成済みのデッキのプレビュー（保存した解析結果から描く）"""
+    sidecar = load_deck_sidecar(filename)
+    if sidecar is None:
+        return jsonify(error="プレビューできるデータが見つかりません。"), 404
+    return preview_response(sidecar["parsed"])
+
+@bp.route("/jobs/<job_id>/preview")
+def job_preview(job_id):
+    """ジョブのプレビュー。解析が終われば PPTX の完成前でも返す（まだなら 202）"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify(error="ジョブが見つかりません。"), 404
+    if job.parsed is None:
+        return jsonify(status=job.status, stage=job.stage), 202
+    return preview_response(job.parsed)
+
+@bp.route("/edit/<filename>")
+def edit(filename):
+    """保存した解析結果を編集して再生成する画面"""
+    sidecar = load_deck_sidecar(filename)
+    if sidecar is None:
+        return render_template("index.html", error="編集できるデータが見つかりません。"), 404
+    return render_template("edit.html", source=filename,
+                           parsed_json=json.dumps(sidecar["parsed"], ensure_ascii=False, indent=2))
+
+@bp.route("/regenerate", methods=["POST"])
+def regenerate():
+    """編集した解析結果（JSON）から、変わったスライドだけ描き直して再生成する"""
+    if request.is_json:
+        body = request.get_json(silent=True) or {}
+        source, parsed, text = body.get("source") or "", body.get("parsed"), None
+    else:
+        source, text = request.form.get("source", ""), request.form.get("parsed_json", "")
+        try:
+            parsed = json.loads(text)
+        except ValueError:
+            parsed = None
+
+    error, status = None, 400
+    if not isinstance(parsed, dict):
+        error = "構造化データ（JSON オブジェクト）を送信してください。"
+    else:
+        try:
+            job = jobs.submit(run_regeneration, source, parsed, kind="regenerate",
+                              key=regeneration_key(source, parsed))
+        except QueueFullError as e:
+            error, status = str(e), 503
+    if error:
+        if wants_json():
+            return jsonify(error=error), status
+        return render_template("edit.html", source=source, parsed_json=text or "", error=error), status
+
+    if wants_json():
+        return jsonify(job_id=job.id, status_url=url_for('.job_status', job_id=job.id)), 202
+    return redirect(url_for('.success', job_id=job.id))
+
+@bp.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify(error="ジョブが見つかりません。"), 404
+    since = request.args.get("since", 0, type=int)
+    return jsonify(job.to_dict(since=max(since, 0)))
+
+@bp.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify(error="ジョブが見つかりません。"), 404
+    if job.status == STATUS_ERROR:
+        return jsonify(status=job.status, error=job.error), 500
+    if job.status != STATUS_DONE:
+        return jsonify(status=job.status, stage=job.stage), 202
+    return jsonify(status=job.status, **job.result)
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@bp.after_app_request
+def observe_request(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = (request.endpoint or "unknown").rpartition(".")[2]
+    HTTP_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=str(response.status_code))
+    if REQUEST_LOG_JSON and endpoint not in ("metrics", "static"):
+        print(json.dumps({
+            "event": "http",
+            "method": request.method,
+            "path": request.path,
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "duration_ms": round(elapsed * 1000, 1),
+        }, ensure_ascii=False))
+    return response
+
+def collect_app_metrics():
+    """ジョブキュー・LLM クライアント・解析キャッシュの統計値"""
+    samples = [("slides_jobs_pending", "gauge", "Jobs queued or running", {}, jobs.pending_count()),
+               ("slides_jobs_coalesced_total", "counter", "Submissions attached to an identical in-flight job",
+                {}, jobs.coalesced)]
+    for key, value in parse_flights.stats.items():
+        samples.append(("slides_parse_flights_total", "counter", "Cross-worker parse locks by outcome",
+                        {"result": key}, value))
+    for key, value in (llm.stats.items() if llm is not None else ()):
+        samples.append(("slides_llm_requests_total", "counter", "LLM client request counters",
+                        {"result": key}, value))
+    if parse_cache is not None:
+        stats = parse_cache.stats()
+        for key in ("hits", "misses"):
+            if key in stats:
+                samples.append(("slides_parse_cache_lookups_total", "counter", "Parse cache lookups",
+                                {"result": key}, stats[key]))
+        if "entries" in stats:
+            samples.append(("slides_parse_cache_entries", "gauge", "Parse cache entries", {}, stats["entries"]))
+    return samples
+
+REGISTRY.add_collector(collect_app_metrics)
+
+@bp.route("/metrics")
+def metrics():
+    """Prometheus 形式のメトリクス（値はワーカープロセスごと）"""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@bp.route("/cache/stats")
+def cache_stats():
+    if parse_cache is None:
+        return jsonify(enabled=False)
+    return jsonify(enabled=True, **parse_cache.stats())
+
+@bp.route("/success")
+def success():
+    job = jobs.get(request.args.get("job_id", ""))
+    if job is None:
+        return redirect(url_for('.index'))
+    if job.status == STATUS_ERROR:
+        return render_template("index.html", error=job.error)
+
+    info = job.result or {}
+    return render_template("success.html",
+                         job_id=job.id,
+                         done=job.status == STATUS_DONE,
+                         filename=info.get('filename', ''),
+                         slide_count=info.get('slide_count', ''),
+                         analysis_summary=info.get('analysis_summary', ''),
+                         editable=job.kind in ("generate", "regenerate"))
+
+def send_artifact(filename: str):
+    """
+    生成物をダウンロードさせる
+    ETag / Last-Modified による条件付き GET（304）と Range リクエスト（206）に対応
+    """
+    info = artifact_storage.stat(filename)
+    if info is None:
+        return render_template("index.html", error="ファイルが見つかりません。"), 404
+    mimetype = ARTIFACT_MIMETYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
+
+    local_path = artifact_storage.local_path(filename)
+    if local_path is not None:
         return send_file(
-            file_path,
+            local_path,
             as_attachment=True,
             download_name=filename,
-            mimetype="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+            mimetype=mimetype,
+            etag=info.etag,
+            last_modified=info.mtime,
+            conditional=True,
+            max_age=0,
         )
+
+    # S3 等: 範囲指定はストレージ側の Range 読み出しで処理する
+    last_modified = datetime.fromtimestamp(int(info.mtime), timezone.utc)
+    resp = Response(mimetype=mimetype)
+    resp.set_etag(info.etag)
+    resp.last_modified = last_modified
+    resp.accept_ranges = "bytes"
+    try:
+        filename.encode("ascii")
+        resp.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        resp.headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    if not is_resource_modified(request.environ, etag=info.etag, last_modified=last_modified):
+        resp.status_code = 304
+        return resp
+
+    start, end = 0, info.size
+    rng = request.range
+    if_range = request.if_range
+    if rng is not None and (if_range.etag is None or if_range.etag == info.etag) \
+            and (if_range.date is None or last_modified <= if_range.date):
+        r = rng.range_for_length(info.size)
+        if r is None:
+            resp.status_code = 416
+            resp.content_range = ContentRange("bytes", None, None, info.size)
+            return resp
+        start, end = r
+        resp.status_code = 206
+        resp.content_range = ContentRange("bytes", start, end, info.size)
+    # 全体を返すときは範囲を付けずに読む
+    partial = resp.status_code == 206
+    resp.response = stream_with_context(artifact_storage.iter_bytes(filename, start, end if partial else None))
+    resp.content_length = end - start
+    return resp
+
+@bp.route("/download/<filename>")
+def download_file(filename):
+    try:
+        return send_artifact(filename)
     except Exception as e:
         print(f"[ERROR] Download failed: {e}")
         return render_template("index.html", error="ファイルのダウンロードに失敗しました。")
 
+def warm_up():
+    """
+    python-pptx・テンプレート・文字幅表・openai を読み込んでおく
+    gunicorn --preload ではマスタープロセスで1回だけ行い、ワーカーはフォーク時に引き継ぐ
+    """
+    t0 = time.perf_counter()
+    import deck_builder  # noqa: F401
+    import deck_merge  # noqa: F401
+    import openai  # noqa: F401（クライアントは接続を持つのでフォーク後に作る）
+    from layout_plan import plan_deck
+    template_pool.warmup()
+    # 文字幅・禁則のテーブルを作る（キャッシュには残さない）
+    plan_deck({"title": "warmup", "sections": [{"title": "warmup", "bullets": ["あA"]}]})
+    print(f"[INFO] Warmup done in {time.perf_counter() - t0:.2f}s")
+
+
+def create_app(warmup: bool = None) -> Flask:
+    """
+    Flask アプリを作る（warmup=None は環境変数 WARMUP_ON_START に従う）
+    描画プールの子プロセス（spawn）もこのモジュールを読み込むが、そこでは事前読み込みをしない
+    """
+    flask_app = Flask(__name__)
+    flask_app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-here')
+    flask_app.register_blueprint(bp)
+    if (WARMUP_ON_START if warmup is None else warmup) and multiprocessing.parent_process() is None:
+        warm_up()
+    return flask_app
+
+
+# gunicorn は "app:app" でこのアプリを使う（本番は WARMUP_ON_START=1 と --preload）
+app = create_app()
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5001))
     app.run(debug=False, host="0.0.0.0", port=port)
@@ -0,0 +1,201 @@
+"""
+複数の議事録からまとめてスライドを生成するバッチ処理
+
+入力は ZIP（.txt / .md を1ファイル1議事録）または JSONL（1行1件、minutes_text キー）。
+LLM 解析はスレッドで並行実行し、python-pptx による描画は CPU 処理なのでプロセスプールで並列化する。
+Web から実行するときはプロセス内で1つの描画プール（get_render_pool）を全バッチで共有する。
+プールは spawn で起動し、スレッドを抱えた Web ワーカーを fork しない。
+出力は各デッキと manifest.json を含む1つの ZIP。
+
+CLI:
+  python batch.py minutes.zip -o decks.zip
+  python batch.py minutes.jsonl -o decks.zip --parse-concurrency 8 --processes 4
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+BATCH_PARSE_CONCURRENCY = int(os.getenv("BATCH_PARSE_CONCURRENCY", "4"))
+BATCH_RENDER_PROCESSES = int(os.getenv("BATCH_RENDER_PROCESSES", "0")) or (os.cpu_count() or 1)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+
+TEXT_EXTENSIONS = (".txt", ".md", ".markdown")
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def new_render_pool(processes: int = BATCH_RENDER_PROCESSES) -> ProcessPoolExecutor:
+    """描画用のプロセスプール（spawn で起動する）"""
+    return ProcessPoolExecutor(max_workers=max(1, processes), mp_context=multiprocessing.get_context("spawn"))
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """プロセス内で共有する描画プール（初回に作る。同時に複数のバッチが来てもプロセス数は増えない）"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = new_render_pool()
+        return _render_pool
+
+
+def discard_render_pool(pool):
+    """壊れた共有プールを捨て、次のバッチで作り直させる"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False)
+
+
+def read_batch_items(filename: str, data: bytes) -> list:
+    """アップロードされた ZIP / JSONL を [{"id", "minutes_text"}] に変換する"""
+    name = (filename or "").lower()
+    items = []
+    if name.endswith(".zip") or data[:4] == b"PK\x03\x04":
+        try:
+            zf = zipfile.ZipFile(io.BytesIO(data))
+        except zipfile.BadZipFile:
+            raise ValueError("ZIP ファイルを読み込めませんでした。")
+        for info in sorted(zf.infolist(), key=lambda i: i.filename):
+            base = os.path.basename(info.filename)
+            if info.is_dir() or base.startswith(".") or "__MACOSX" in info.filename:
+                continue
+            if not base.lower().endswith(TEXT_EXTENSIONS):
+                continue
+            raw = zf.read(info)
+            try:
+                text = raw.decode("utf-8-sig")
+            except UnicodeDecodeError:
+                text = raw.decode("cp932", errors="replace")
+            items.append({"id": os.path.splitext(base)[0], "minutes_text": text})
+    elif name.endswith((".jsonl", ".ndjson", ".json")):
+        for lineno, line in enumerate(data.decode("utf-8-sig").splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                raise ValueError(f"JSONL の {lineno} 行目を解釈できませんでした。")
+            if not isinstance(obj, dict):
+                raise ValueError(f"JSONL の {lineno} 行目がオブジェクトではありません。")
+            text = obj.get("minutes_text") or obj.get("text") or ""
+            items.append({"id": str(obj.get("id") or lineno), "minutes_text": text})
+    else:
+        raise ValueError("ZIP または JSONL ファイルをアップロードしてください。")
+
+    if not items:
+        raise ValueError("議事録が1件も含まれていません。")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"一度に処理できる議事録は {BATCH_MAX_ITEMS} 件までです。")
+    return items
+
+
+def _entry_name(index: int, item_id: str) -> str:
+    safe = re.sub(r'[^\w\-.]+', '_', item_id, flags=re.UNICODE) or "meeting"
+    return f"{index + 1:03d}_{safe}.pptx"
+
+
+@contextmanager
+def _pool_or_new(pool, processes: int):
+    """pool があればそのまま使い、なければ processes 個のプールを作って最後に閉じる"""
+    if pool is not None:
+        yield pool
+        return
+    with new_render_pool(processes) as own:
+        yield own
+
+
+def run_batch(items: list, parse_fn, render_fn, out, parse_concurrency: int = BATCH_PARSE_CONCURRENCY,
+              processes: int = BATCH_RENDER_PROCESSES, on_progress=None, render_pool=None) -> list:
+    """
+    items を解析・描画して out（書き込み可能なファイル）へ ZIP を書き出し、マニフェストを返す
+
+    parse_fn(minutes_text) -> dict はスレッドで、render_fn(parsed) -> (bytes, slide_count) は
+    プロセスプールで実行する（render_fn はモジュールのトップレベル関数であること）。
+    render_pool を渡せばそのプールを使い（processes は無視）、省略時は processes 個のプールを作って閉じる。
+    解析が終わったものから順に描画へ回すので、LLM 待ちと描画が重なる。
+    """
+    notify = on_progress or (lambda stage, **data: None)
+    manifest = [{"id": it["id"], "status": "pending"} for it in items]
+
+    def parse_one(index):
+        t0 = time.perf_counter()
+        parsed = parse_fn(items[index]["minutes_text"])
+        return parsed, time.perf_counter() - t0
+
+    def render_failed(i, e):
+        if isinstance(e, BrokenProcessPool):
+            discard_render_pool(render_pool)
+        manifest[i].update(status="error", stage="render", error=str(e) or type(e).__name__)
+
+    with ThreadPoolExecutor(max_workers=max(1, parse_concurrency), thread_name_prefix="batch-parse") as parse_pool, \
+            _pool_or_new(render_pool, processes) as render_pool, \
+            zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        parse_futures = {parse_pool.submit(parse_one, i): i for i in range(len(items))}
+        render_futures = {}
+        for fut in as_completed(parse_futures):
+            i = parse_futures[fut]
+            try:
+                parsed, elapsed = fut.result()
+            except Exception as e:
+                manifest[i].update(status="error", stage="parse", error=str(e))
+                notify("parsed", index=i, ok=False)
+                continue
+            manifest[i].update(parse_seconds=round(elapsed, 3), company_name=parsed.get("company_name") or "")
+            try:
+                render_futures[render_pool.submit(render_fn, parsed)] = (i, time.perf_counter())
+            except BrokenProcessPool as e:
+                render_failed(i, e)
+            notify("parsed", index=i, ok=True)
+
+        for fut in as_completed(render_futures):
+            i, submitted = render_futures[fut]
+            try:
+                blob, slide_count = fut.result()
+            except Exception as e:
+                render_failed(i, e)
+                continue
+            name = _entry_name(i, items[i]["id"])
+            zf.writestr(name, blob)
+            manifest[i].update(status="ok", filename=name, slide_count=slide_count,
+                               render_seconds=round(time.perf_counter() - submitted, 3))
+            notify("rendered", index=i)
+
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+
+def main():
+    ap = argparse.ArgumentParser(description="議事録をまとめて PowerPoint に変換する")
+    ap.add_argument("input", help="議事録の ZIP または JSONL")
+    ap.add_argument("-o", "--output", default="decks.zip")
+    ap.add_argument("--parse-concurrency", type=int, default=BATCH_PARSE_CONCURRENCY)
+    ap.add_argument("--processes", type=int, default=BATCH_RENDER_PROCESSES)
+    args = ap.parse_args()
+
+    import app
+    with open(args.input, "rb") as f:
+        items = read_batch_items(args.input, f.read())
+    t0 = time.perf_counter()
+    with open(args.output, "wb") as out:
+        manifest = run_batch(items, app.parse_meeting_minutes, app.render_deck_bytes, out,
+                             args.parse_concurrency, args.processes)
+    ok = sum(1 for m in manifest if m["status"] == "ok")
+    print(f"[INFO] {ok}/{len(manifest)} decks -> {args.output} ({time.perf_counter() - t0:.1f}s)")
+    for m in manifest:
+        if m["status"] != "ok":
+            print(f"[ERROR] {m['id']}: {m.get('error')}")
+
+
+if __name__ == "__main__":
+    main()
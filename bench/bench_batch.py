@@ -0,0 +1,48 @@
+"""
+バッチ生成のベンチマーク（スタブ LLM）
+
+  serial: /generate を1件ずつ処理するのと同じく、解析→描画を順番に実行
+  batch : run_batch（解析はスレッド並行、描画はプロセスプール）
+
+使い方:
+  python bench/bench_batch.py --items 24 --sections 20 --llm-delay 0.5 --processes 4
+"""
+import argparse
+import io
+import os
+import time
+
+from common import SAMPLE_MINUTES, load_app, synthetic_parsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=24)
+    ap.add_argument("--sections", type=int, default=20)
+    ap.add_argument("--llm-delay", type=float, default=0.5)
+    ap.add_argument("--parse-concurrency", type=int, default=8)
+    ap.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    app_module, fake = load_app(delay=args.llm_delay, payload=synthetic_parsed(args.sections))
+    from batch import run_batch
+    items = [{"id": f"m{i}", "minutes_text": f"{SAMPLE_MINUTES}\n{i}"} for i in range(args.items)]
+
+    t0 = time.perf_counter()
+    for it in items:
+        app_module.render_deck_bytes(app_module.parse_meeting_minutes(it["minutes_text"]))
+    serial = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    manifest = run_batch(items, app_module.parse_meeting_minutes, app_module.render_deck_bytes, io.BytesIO(),
+                         args.parse_concurrency, args.processes)
+    batch = time.perf_counter() - t0
+    assert all(m["status"] == "ok" for m in manifest)
+
+    print(f"items={args.items} sections={args.sections} processes={args.processes} llm_delay={args.llm_delay}s")
+    print(f"serial: {serial:6.2f}s ({args.items / serial:5.2f} decks/s)")
+    print(f" batch: {batch:6.2f}s ({args.items / batch:5.2f} decks/s)")
+
+
+if __name__ == "__main__":
+    main()
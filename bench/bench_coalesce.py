@@ -0,0 +1,126 @@
+"""
+同じ生成リクエストの合流（single-flight）のチェック
+
+  process: 1プロセスに同じ /generate を N 件同時に送り、ジョブが1つにまとまって LLM 呼び出しが1回になるか
+  workers: gunicorn のワーカーを模した子プロセス W 個が同じ議事録を同時に生成し、LLM 呼び出しの合計が1回になるか
+           （子プロセスは解析キャッシュとロックファイルのディレクトリを共有する）
+
+比較のため、まとめない場合（key なしで投入・SINGLE_FLIGHT_ENABLED=0）の呼び出し回数も表示する。
+まとめた場合に LLM 呼び出しが1回でなければ終了コード 1。
+
+使い方:
+  python bench/bench_coalesce.py --requests 20 --workers 4 --llm-delay 0.5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from common import SAMPLE_MINUTES
+
+
+def unique_minutes() -> str:
+    # 以前の実行の解析キャッシュに当たらないよう、実行ごとに変える
+    return SAMPLE_MINUTES + f"\n- 打ち合わせID：{uuid.uuid4().hex[:8]}\n"
+
+
+def fire(n: int, send) -> list:
+    """n 件を同時に送る"""
+    barrier = threading.Barrier(n)
+    out = [None] * n
+
+    def worker(i):
+        barrier.wait()
+        out[i] = send()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+
+def run_process(n: int, delay: float, coalesce: bool) -> dict:
+    from common import load_app
+    app_module, fake = load_app(delay)
+    client = app_module.app.test_client()
+    minutes = unique_minutes()
+
+    def send():
+        if not coalesce:
+            return app_module.jobs.submit(app_module.run_generation, minutes).id
+        res = client.post("/generate", data={"minutes_text": minutes}, headers={"Accept": "application/json"})
+        assert res.status_code == 202, res.status_code
+        return res.get_json()["job_id"]
+
+    calls = fake.calls
+    t0 = time.perf_counter()
+    job_ids = fire(n, send)
+    for job_id in set(job_ids):
+        job = app_module.jobs.wait(job_id, timeout=600)
+        assert job.status == "done", job.error
+    return {"jobs": len(set(job_ids)), "calls": fake.calls - calls, "wall_s": time.perf_counter() - t0}
+
+
+def child(minutes_path: str, start_at: float, delay: float):
+    from common import load_app
+    app_module, fake = load_app(delay, cache=True)
+    with open(minutes_path, encoding="utf-8") as f:
+        minutes = f.read()
+    time.sleep(max(0.0, start_at - time.time()))
+    res = app_module.app.test_client().post("/generate", data={"minutes_text": minutes},
+                                            headers={"Accept": "application/json"})
+    job = app_module.jobs.wait(res.get_json()["job_id"], timeout=600)
+    print(json.dumps({"calls": fake.calls, "status": job.status, "error": job.error}))
+
+
+def run_workers(workers: int, delay: float, coalesce: bool) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        minutes_path = os.path.join(tmp, "minutes.txt")
+        with open(minutes_path, "w", encoding="utf-8") as f:
+            f.write(unique_minutes())
+        env = dict(os.environ, PARSE_CACHE_ENABLED="1", PARSE_CACHE_PATH=os.path.join(tmp, "cache.sqlite3"),
+                   SINGLE_FLIGHT_ENABLED="1" if coalesce else "0")
+        start_at = time.time() + 3.0  # 子プロセスの起動・app の読み込みを待つ
+        procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", minutes_path,
+                                   str(start_at), str(delay)], env=env, stdout=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+        results = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+    for r in results:
+        assert r["status"] == "done", r["error"]
+    return {"jobs": workers, "calls": sum(r["calls"] for r in results), "wall_s": time.time() - start_at}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=20, help="1プロセスに同時に送る件数")
+    ap.add_argument("--workers", type=int, default=4, help="同時に生成する子プロセス数")
+    ap.add_argument("--llm-delay", type=float, default=0.5)
+    ap.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(args.child[0], float(args.child[1]), float(args.child[2]))
+        return
+
+    print(f"{'scope':>8} {'mode':>9} {'requests':>8} {'jobs':>5} {'llm_calls':>9} {'wall_s':>7}")
+    failed = False
+    for scope, n, run in (("process", args.requests, run_process), ("workers", args.workers, run_workers)):
+        for coalesce in (False, True):
+            r = run(n, args.llm_delay, coalesce)
+            print(f"{scope:>8} {'coalesce' if coalesce else 'separate':>9} {n:>8} {r['jobs']:>5} "
+                  f"{r['calls']:>9} {r['wall_s']:>7.2f}")
+            failed |= coalesce and r["calls"] != 1
+    if failed:
+        print("[ERROR] Identical concurrent requests made more than one LLM call")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+/generate の負荷ベンチマーク（スタブ LLM）
+
+gunicorn の同期ワーカー数を --web-workers 本のスレッドで模擬し、
+N 件の生成リクエストを流したときの受付 RPS と完了スループットを比較する。
+
+  before: リクエスト処理中に解析〜生成まで同期実行（従来の /generate）
+  after : /generate はジョブ投入のみで即応答し、ジョブプールで実行
+
+使い方:
+  python bench/bench_generate_load.py --requests 40 --web-workers 2 --llm-delay 0.5
+"""
+import argparse
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from common import SAMPLE_MINUTES, load_app
+
+
+def minutes(i: int) -> str:
+    # 同じ議事録は1つのジョブにまとめられるので、リクエストごとに変える
+    return SAMPLE_MINUTES + f"\n- 問い合わせ番号：{i}\n"
+
+
+def run_before(app_module, n: int, web_workers: int):
+    class _NullJob:
+        kind = "generate"
+
+        def __init__(self):
+            self.id = uuid.uuid4().hex
+
+        def publish(self, *args, **kwargs):
+            pass
+
+    def handle(i):
+        # 従来の /generate と同じく、リクエストスレッド内で全処理を行う
+        app_module.run_generation(_NullJob(), minutes(i))
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=web_workers) as pool:
+        list(pool.map(handle, range(n)))
+    elapsed = time.perf_counter() - t0
+    return elapsed, elapsed
+
+
+def run_after(app_module, n: int, web_workers: int):
+    client = app_module.app.test_client()
+
+    def handle(i):
+        res = client.post("/generate", data={"minutes_text": minutes(i)},
+                          headers={"Accept": "application/json"})
+        assert res.status_code == 202, res.status_code
+        return res.get_json()["job_id"]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=web_workers) as pool:
+        job_ids = list(pool.map(handle, range(n)))
+    accepted = time.perf_counter() - t0
+    for job_id in job_ids:
+        job = app_module.jobs.wait(job_id, timeout=600)
+        assert job.status == "done", job.error
+    completed = time.perf_counter() - t0
+    return accepted, completed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=40)
+    ap.add_argument("--web-workers", type=int, default=2)
+    ap.add_argument("--llm-delay", type=float, default=0.5)
+    args = ap.parse_args()
+
+    app_module, fake = load_app(delay=args.llm_delay)
+    app_module.jobs.max_pending = max(app_module.jobs.max_pending, args.requests)
+
+    print(f"requests={args.requests} web_workers={args.web_workers} "
+          f"job_workers={app_module.jobs._executor._max_workers} llm_delay={args.llm_delay}s")
+    for name, fn in (("before", run_before), ("after", run_after)):
+        accepted, completed = fn(app_module, args.requests, args.web_workers)
+        print(f"{name:>6}: accept {args.requests / accepted:8.1f} req/s | "
+              f"complete {args.requests / completed:6.1f} decks/s ({completed:.2f}s)")
+    print(f"LLM calls: {fake.calls}")
+
+
+if __name__ == "__main__":
+    main()
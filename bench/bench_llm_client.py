@@ -0,0 +1,201 @@
+"""
+LLM クライアントのベンチマーク（ローカルのモックサーバーに対して実行）
+
+モックサーバーは --server-rpm を超えると 429 を返し、--error-rate の割合で 500 を返す。
+  raw    : 再試行・レート制限なしの AzureOpenAI
+  managed: LLMClient（クライアント側 RPM 制限・バックオフ・ブレーカー）
+で --requests 件を並行に投げ、成功数・429 の回数・所要時間を比較する。
+--async を付けると managed を AsyncAzureOpenAI 経由（acreate）で実行する。
+--stream を付けると stream=True で最後まで読み、サーバー側で同時に送信中だったストリーム数の最大も表示する
+（managed は --client-concurrency を超えないこと。超えたら終了コード 1）。
+
+最初にモックサーバーなしで次を確かめる（満たさなければ終了コード 1）:
+  - 半開状態の試しの呼び出しが再試行対象のエラーで失敗しても、上流が回復すればまた呼び出せる
+  - 同期（create）と非同期（acreate）を同時に使っても、同時実行数が max_concurrency を超えない
+
+使い方:
+  python bench/bench_llm_client.py --requests 40 --server-rpm 30 --client-rpm 30 --error-rate 0.1
+  python bench/bench_llm_client.py --requests 20 --server-rpm 0 --client-rpm 0 --error-rate 0 --stream --client-concurrency 2
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import common  # noqa: F401  (sys.path・ダミー設定)
+from mock_llm_server import start_server
+
+MESSAGES = [{"role": "user", "content": "議事録"}]
+
+
+class FlakyClient:
+    """fail 回だけ接続エラーを出し、その後は応答する chat.completions 互換のクライアント（同期・非同期）"""
+
+    def __init__(self, fail: int = 0, latency: float = 0.0):
+        self.fail = fail
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self.acreate)))
+
+    def _enter(self):
+        import httpx
+        import openai
+        with self._lock:
+            if self.fail > 0:
+                self.fail -= 1
+                raise openai.APIConnectionError(request=httpx.Request("POST", "http://mock/chat/completions"))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+        return SimpleNamespace(usage=None, choices=[])
+
+    def create(self, **kwargs):
+        self._enter()
+        time.sleep(self.latency)
+        return self._leave()
+
+    async def acreate(self, **kwargs):
+        self._enter()
+        await asyncio.sleep(self.latency)
+        return self._leave()
+
+
+def check_breaker_recovery(llm_client) -> bool:
+    """半開の試しが再試行対象のエラーで失敗 → 開き直す → 回復後の試しで閉じる"""
+    breaker = llm_client.CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    fake = FlakyClient()
+    llm = llm_client.LLMClient(fake, breaker=breaker, max_retries=3, backoff_base=0.001, backoff_max=0.001)
+    breaker.record_failure()
+    time.sleep(0.06)
+    fake.fail = 1
+    try:
+        llm.create(model="mock", messages=MESSAGES)
+        trial = "ok"
+    except llm_client.CircuitOpenError:
+        trial = "reopened"
+    time.sleep(0.06)
+    recovered = []
+    for _ in range(3):
+        try:
+            llm.create(model="mock", messages=MESSAGES)
+            recovered.append(True)
+        except llm_client.CircuitOpenError:
+            recovered.append(False)
+    ok = trial == "reopened" and all(recovered) and breaker.state == "closed"
+    print(f"breaker: failed half-open trial -> {trial}; after recovery {sum(recovered)}/3 calls ok "
+          f"({'ok' if ok else 'FAIL'})")
+    return ok
+
+
+def check_shared_limit(llm_client, limit: int = 2) -> bool:
+    """同期・非同期を同時に使ったときの最大同時実行数"""
+    fake = FlakyClient(latency=0.05)
+    llm = llm_client.LLMClient(fake, async_client_factory=lambda: fake.async_client, max_concurrency=limit)
+
+    async def run_async():
+        await asyncio.gather(*[llm.acreate(model="mock", messages=MESSAGES) for _ in range(6)])
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        futures = [pool.submit(llm.create, model="mock", messages=MESSAGES) for _ in range(6)]
+        asyncio.run(run_async())
+        for f in futures:
+            f.result()
+    ok = fake.max_in_flight <= limit
+    print(f"sync + async: max in flight {fake.max_in_flight} (limit {limit}) ({'ok' if ok else 'FAIL'})")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=40)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--server-rpm", type=int, default=30)
+    ap.add_argument("--client-rpm", type=int, default=30)
+    ap.add_argument("--error-rate", type=float, default=0.1)
+    ap.add_argument("--client-concurrency", type=int, default=None, help="LLMClient の同時実行数（既定は設定値）")
+    ap.add_argument("--async", dest="use_async", action="store_true")
+    ap.add_argument("--stream", action="store_true")
+    args = ap.parse_args()
+    stream = {"stream": True} if args.stream else {}
+
+    def drain(resp):
+        if args.stream:
+            for _ in resp:
+                pass
+
+    async def adrain(resp):
+        if args.stream:
+            async for _ in resp:
+                pass
+
+    from openai import AzureOpenAI
+    import llm_client
+
+    checks_ok = check_breaker_recovery(llm_client) & check_shared_limit(llm_client)
+    exceeded = False
+    for name in ("raw", "managed"):
+        server, state = start_server(rpm=args.server_rpm, error_rate=args.error_rate)
+        endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+        if name == "raw":
+            raw = AzureOpenAI(api_key="dummy", azure_endpoint=endpoint, api_version="2024-02-01", max_retries=0)
+            call = lambda: drain(raw.chat.completions.create(model="mock", messages=MESSAGES, **stream))
+        else:
+            llm = llm_client.create_azure_llm_client("dummy", endpoint, "2024-02-01")
+            llm.requests_bucket = llm_client.TokenBucket(args.client_rpm)
+            # バケットは満タンから始まるので、ベンチでは初期量を絞ってバーストを抑える
+            llm.requests_bucket.tokens = min(llm.requests_bucket.tokens, args.concurrency)
+            llm.backoff_base, llm.backoff_max = 0.2, 5.0
+            if args.client_concurrency:
+                llm.max_concurrency = args.client_concurrency
+                llm._semaphore = threading.BoundedSemaphore(args.client_concurrency)
+            call = lambda: drain(llm.create(model="mock", messages=MESSAGES, **stream))
+
+        ok = failed = 0
+        t0 = time.perf_counter()
+        if name == "managed" and args.use_async:
+            async def one_async():
+                await adrain(await llm.acreate(model="mock", messages=MESSAGES, **stream))
+
+            async def run_all():
+                results = await asyncio.gather(*[one_async() for _ in range(args.requests)], return_exceptions=True)
+                return results
+            results = asyncio.run(run_all())
+            ok = sum(1 for r in results if not isinstance(r, Exception))
+            failed = len(results) - ok
+        else:
+            def one(_):
+                try:
+                    call()
+                    return True
+                except Exception:
+                    return False
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                results = list(pool.map(one, range(args.requests)))
+            ok = sum(results)
+            failed = len(results) - ok
+        elapsed = time.perf_counter() - t0
+        server.shutdown()
+        line = (f"{name:>7}: ok {ok:3d} | failed {failed:3d} | server 429s {state.counts['throttled']:3d} "
+                f"| server 500s {state.counts['error']:3d} | {elapsed:6.2f}s")
+        if args.stream:
+            line += f" | max open streams {state.max_streaming:2d}"
+            if name == "managed" and state.max_streaming > llm.max_concurrency:
+                exceeded = True
+        print(line)
+    if exceeded:
+        print("[ERROR] Managed streams exceeded the client concurrency limit")
+    if exceeded or not checks_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
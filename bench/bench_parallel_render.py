@@ -0,0 +1,63 @@
+"""
+並列描画（シャード分割＋パッケージ結合）のベンチマーク
+
+大きなデッキを1プロセスで順に作る場合と、スライド計画をシャードに分けて
+プロセスプールで描画・結合する場合の所要時間を比較し、出力が同一か確認する。
+（並列化の効果は CPU コア数に依存する。1コアの環境では結合の分だけ遅くなる）
+
+使い方:
+  python bench/bench_parallel_render.py --sections 500 --processes 2,4,8
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+from common import deck_digest, load_app, synthetic_parsed
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sections", type=int, default=300)
+    ap.add_argument("--processes", default="2,4", help="プロセス数（カンマ区切り）")
+    args = ap.parse_args()
+
+    app_module, _ = load_app()
+    app_module.PARALLEL_RENDER_MIN_SLIDES = 0
+    parsed = synthetic_parsed(args.sections, bullet_len=120, next_actions=40)
+
+    def render(processes):
+        out = io.BytesIO()
+        deck = app_module.create_meeting_summary_ppt(parsed, processes=processes)
+        deck.write_to(out)
+        return out.getvalue(), deck.slide_count
+
+    render(1)  # テンプレート読み込みを除外
+    (serial, slides), serial_s = timed(lambda: render(1))
+    expected = deck_digest(serial)
+    print(f"cpu cores: {os.cpu_count()}, sections: {args.sections}, slides: {slides}")
+    print(f"{'processes':>9} {'wall_s':>8} {'speedup':>8}  output")
+    print(f"{1:>9} {serial_s:>8.2f} {1.0:>8.2f}  baseline")
+
+    failed = False
+    for n in [int(x) for x in args.processes.split(",") if x.strip()]:
+        app_module.get_render_pool(n).submit(int).result()  # プロセス起動を除外
+        (blob, _), elapsed = timed(lambda: render(n))
+        same = deck_digest(blob) == expected
+        failed |= not same
+        print(f"{n:>9} {elapsed:>8.2f} {serial_s / elapsed:>8.2f}  {'identical' if same else 'DIFFERENT'}")
+
+    if failed:
+        print("[ERROR] Merged output differs from the serial render")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
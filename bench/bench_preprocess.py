@@ -0,0 +1,114 @@
+"""
+議事録の前処理（preprocess.preprocess_minutes）のベンチマーク
+
+タイムスタンプ・言いよどみ・話者ラベル・相づち・署名・言い直しを含む合成の文字起こしを作り、
+前処理前後のトークン数と処理時間を表示する。出力が決定的であることと、
+REGRESSION_CASES（消してはいけない行を含む入力）の出力が期待どおりであることも確認する（満たさなければ終了コード 1）。
+
+使い方:
+  python bench/bench_preprocess.py --turns 100,1000,5000
+"""
+import argparse
+import sys
+import time
+import unicodedata
+
+from common import SAMPLE_MINUTES  # noqa: F401（ダミーの環境変数を設定するため先に読み込む）
+from preprocess import preprocess_minutes
+
+SPEAKERS = ["田中 太郎", "佐藤 花子", "Speaker 3"]
+UTTERANCES = [
+    "研修データが部署ごとに管理されていて、全社で活用できていないのが課題です。",
+    "PoC は人事部の研修データに限定して、三か月程度で効果を確認したいと考えています。",
+    "予算は来期に計上する見込みですが、決裁は部長の判断になります。",
+    "The API rate limit is 100 requests per minute per tenant, so batching is required.",
+    "次回の打ち合わせまでに、具体的な提案内容と概算費用を整理してお送りします。",
+]
+FILLERS = ["えーと、", "あのー、", "まあ、", "うーん、", "", "", "um, "]
+SIGNATURE = "\n--\n株式会社サンプル 営業部\nTEL: 03-1234-5678\nMail: sales@example.com\n"
+
+# (名前, 入力, 期待する出力)。期待する出力が None なら、入力を NFKC 正規化したものがそのまま残ること
+REGRESSION_CASES = [
+    # 別の節の同じ行（担当の箇条）と、項目：値の行（予算）は残す
+    ("sections", "## 課題\n- 担当：提案側で資料を準備する\n## ネクストアクション\n- 担当：提案側で資料を準備する\n"
+                 "予算：500万円\n予算：追加で200万円", None),
+    # 「名前: 発話」の文字起こしは、続いた同じ話者のターンをまとめて相づちを除く
+    ("speakers", "山田: 研修データの件です。\n山田: 部署ごとに管理されています。\n鈴木: はい。\n"
+                 "鈴木: 承知しました。\n山田: 三か月で確認します。\n鈴木: 費用を整理します。",
+     "山田: 研修データの件です。\n部署ごとに管理されています。\n鈴木: 承知しました。\n"
+     "山田: 三か月で確認します。\n鈴木: 費用を整理します。"),
+    # 連絡先の項目名で始まる本文は残し、区切り線のあとの署名だけを除く
+    ("contacts", "## 決定事項\nURLを後日共有する\n携帯版アプリの導入を検討\nTEL会議は月1回\nMAIL配信は停止する" + SIGNATURE,
+     "## 決定事項\nURLを後日共有する\n携帯版アプリの導入を検討\nTEL会議は月1回\nMAIL配信は停止する"),
+    # 担当者だけが違うアクションの箇条は、ほぼ同じ内容でも両方残す
+    ("actions", "## ネクストアクション\n- 担当 山田：研修データの棚卸し結果と今後の活用方針の案を来週の定例までに共有する\n"
+                "- 担当 佐藤：研修データの棚卸し結果と今後の活用方針の案を来週の定例までに共有する", None),
+]
+
+
+def check_regressions() -> bool:
+    failed = False
+    for name, text, expected in REGRESSION_CASES:
+        expected = unicodedata.normalize("NFKC", text) if expected is None else expected
+        out, _ = preprocess_minutes(text)
+        if out != expected:
+            print(f"[ERROR] Regression case '{name}':\n--- expected\n{expected}\n--- got\n{out}")
+            failed = True
+    return failed
+
+
+def noisy_transcript(turns: int) -> str:
+    """
+    決定的に生成した文字起こし（Teams 形式の「名前 時刻」行＋発話）
+    発話はターンごとに異なり、5ターンに1回は直前の発話の言い直し（ほぼ同じ文）、
+    9ターンに1回は直前の発話の貼り付け重複、7ターンに1回は相づちだけになる。
+    """
+    lines = []
+    previous = UTTERANCES[0]
+    for i in range(turns):
+        speaker = SPEAKERS[(i // 3) % len(SPEAKERS)]
+        lines.append(f"{speaker} {i // 60}:{i % 60:02d}")
+        if i % 7 == 3:
+            lines.append("はい。")
+            continue
+        if i % 9 == 8:
+            text = previous
+        elif i % 5 == 4:
+            text = previous.replace("。", "ね。")
+        else:
+            text = f"論点{i}について、{UTTERANCES[i % len(UTTERANCES)]}"
+        lines.append(FILLERS[i % len(FILLERS)] + text)
+        previous = text
+        if i % 50 == 49:
+            lines.append("録画を開始しました")
+    return "\n".join(lines) + SIGNATURE
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", default="100,1000,5000")
+    args = ap.parse_args()
+
+    print(f"{'input':>10} {'chars':>8} {'tokens':>8} {'after':>8} {'saved':>6} {'ms':>8}  removed")
+    cases = [("sample", SAMPLE_MINUTES)] + [(f"{n} turns", noisy_transcript(n))
+                                            for n in [int(x) for x in args.turns.split(",") if x.strip()]]
+    failed = False
+    for name, text in cases:
+        preprocess_minutes(text)  # トークナイザの読み込みを除外
+        t0 = time.perf_counter()
+        compact, report = preprocess_minutes(text)
+        elapsed = (time.perf_counter() - t0) * 1000
+        failed |= preprocess_minutes(text)[0] != compact
+        saved = 1 - report["tokens_after"] / max(1, report["tokens_before"])
+        removed = " ".join(f"{k}={v}" for k, v in report["removed"].items() if v)
+        print(f"{name:>10} {report['chars_before']:>8} {report['tokens_before']:>8} {report['tokens_after']:>8} "
+              f"{saved:>6.0%} {elapsed:>8.1f}  {removed}")
+    print(f"tokenizer: {report['tokenizer']}")
+    if failed:
+        print("[ERROR] Pre-processing is not deterministic")
+    if check_regressions() or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+スライドのプレビュー（/preview）のベンチマーク
+
+合成データで、プレビューの所要時間（計画もない状態・計画だけある状態・プレビューのキャッシュあり）を
+PPTX の生成（描画・保存）と比べる。プレビューの枚数が計画と一致すること、
+プレビューだけでは python-pptx を読み込まないこと、形の合わない JSON は 400 になることも確認する
+（満たさなければ終了コード 1）。
+
+使い方:
+  python bench/bench_preview.py --sizes 10,100,500 --repeat 3
+"""
+import argparse
+import sys
+import time
+
+from common import load_app, synthetic_parsed
+
+
+def best_ms(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        ms = (time.perf_counter() - t0) * 1000
+        best = ms if best is None else min(best, ms)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,100,500", help="セクション数（カンマ区切り）")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    app_module, _ = load_app()
+    from layout_plan import PlanCache
+    from preview import PreviewCache
+    client = app_module.app.test_client()
+    # 文字幅表などの初回だけの準備を除く
+    client.post("/preview", json=synthetic_parsed(1))
+
+    failed = False
+    rows = []
+    for n in [int(x) for x in args.sizes.split(",")]:
+        parsed = synthetic_parsed(n)
+
+        def cold():
+            app_module.plan_cache = PlanCache()
+            app_module.preview_cache = PreviewCache()
+            return client.post("/preview", json=parsed)
+
+        def planned():
+            app_module.preview_cache = PreviewCache()
+            return client.post("/preview", json=parsed)
+
+        cold_ms = best_ms(cold, args.repeat)
+        planned_ms = best_ms(planned, args.repeat)
+        res = client.post("/preview", json=parsed)
+        cached_ms = best_ms(lambda: client.post("/preview", json=parsed), args.repeat)
+        body = res.get_json()
+        slides = len(app_module.plan_deck_cached(parsed))
+        if body["slide_count"] != slides or len(body["slides"]) != slides:
+            print(f"[ERROR] {n} sections: preview has {body['slide_count']} slides, plan has {slides}")
+            failed = True
+        size_kib = len(res.get_data()) / 1024
+        rows.append((n, slides, cold_ms, planned_ms, cached_ms, size_kib, parsed))
+
+    for body in ({"title": 5}, {"sections": [None]}, {"bant": "x"}):
+        res = client.post("/preview", json=body)
+        if res.status_code != 400 or not res.get_json().get("details"):
+            print(f"[ERROR] POST /preview {body}: {res.status_code}")
+            failed = True
+
+    if "pptx" in sys.modules:
+        print("[ERROR] Preview loaded python-pptx")
+        failed = True
+
+    print(f"{'sections':>8} {'slides':>6} {'cold_ms':>8} {'planned_ms':>10} {'cached_ms':>9} {'json_kib':>8} "
+          f"{'pptx_ms':>8}")
+    for n, slides, cold_ms, planned_ms, cached_ms, size_kib, parsed in rows:
+        pptx_ms = best_ms(lambda: app_module.create_meeting_summary_ppt(parsed, processes=1).to_bytesio(), 1)
+        print(f"{n:>8} {slides:>6} {cold_ms:>8.1f} {planned_ms:>10.1f} {cached_ms:>9.1f} {size_kib:>8.0f} "
+              f"{pptx_ms:>8.0f}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
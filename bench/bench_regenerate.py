@@ -0,0 +1,61 @@
+"""
+編集後の再生成（app.create_incremental_ppt）のベンチマーク
+
+サイズごとに、箇条書きを1つだけ編集した解析結果から、前回のデッキを再利用して作る経路と
+すべて描き直す経路を比べる。出力のパッケージが同一であることも確認する。
+
+使い方:
+  python bench/bench_regenerate.py --sizes 10,100,500
+"""
+import argparse
+import copy
+import sys
+import time
+
+from common import deck_digest, load_app, synthetic_parsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,100,500")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    app_module, _ = load_app()
+    from incremental import plan_keys
+    app_module.create_meeting_summary_ppt(synthetic_parsed(1), processes=1).to_bytesio()
+    app_module.template_package()
+
+    def best(fn):
+        times, out = [], None
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            out = fn().to_bytesio().getvalue()
+            times.append(time.perf_counter() - t0)
+        return min(times), out
+
+    print(f"{'sections':>8} {'slides':>6} {'full_s':>8} {'incr_s':>8} {'speedup':>8} {'reused':>6}  output")
+    failed = False
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        parsed = synthetic_parsed(n)
+        deck = app_module.create_meeting_summary_ppt(parsed, processes=1)
+        previous = deck.to_bytesio().getvalue()
+        sidecar = {"template_slides": deck.slide_count - len(deck.plan), "slide_keys": plan_keys(deck.plan)}
+
+        edited = copy.deepcopy(parsed)
+        edited["sections"][n // 2]["bullets"][0] += "（修正）"
+        full_s, full = best(lambda: app_module.create_meeting_summary_ppt(edited, processes=1))
+        incr_s, incr = best(lambda: app_module.create_incremental_ppt(edited, sidecar, previous))
+        reused = app_module.create_incremental_ppt(edited, sidecar, previous).reused_slides
+
+        same = deck_digest(full) == deck_digest(incr)
+        failed |= not same
+        print(f"{n:>8} {deck.slide_count:>6} {full_s:>8.3f} {incr_s:>8.3f} {full_s / incr_s:>7.1f}x {reused:>6}"
+              f"  {'identical' if same else 'DIFFERENT'}")
+    if failed:
+        print("[ERROR] Incremental output differs from the full render")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
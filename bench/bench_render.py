@@ -0,0 +1,194 @@
+"""
+スライド描画パイプラインのオフラインベンチマーク
+
+合成した解析結果（10〜500セクション、長い箇条書き、多数のネクストアクション）を
+create_meeting_summary_ppt() に渡し、サイズごとに次を計測する。
+
+  wall  : 描画〜保存（BytesIO）の所要時間（--repeat 回の中央値）
+  cpu   : 同じく CPU 時間
+  rss   : ピーク RSS（サイズごとに子プロセスで計測）
+  alloc : tracemalloc によるピーク確保量（別パスで計測）
+  size  : 出力 PPTX のバイト数
+  plan  : スライド計画（layout_plan.plan_deck）だけの所要時間と枚数
+
+出力の同一性は bench/fixtures/render_digests.json のダイジェストと照合する
+（描画処理を変更して出力が変わる場合は --update-golden で更新）。
+
+--e2e では偽の LLM を差し込んだ /generate（ジョブ投入〜保存完了）も計測する。
+形の合わない JSON を POST /plan に送ると 400 になることも確認する（満たさなければ終了コード 1）。
+
+使い方:
+  python bench/bench_render.py
+  python bench/bench_render.py --sizes 10,100,500 --repeat 5 --e2e
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from common import deck_digest, load_app, synthetic_parsed
+from layout_plan import plan_deck
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "render_digests.json")
+DEFAULT_SIZES = "10,50,100,250,500"
+
+
+def fixture(n_sections: int) -> dict:
+    return synthetic_parsed(n_sections, bullets=6, bullet_len=120, next_actions=40)
+
+
+def render(app_module, parsed) -> bytes:
+    buf = io.BytesIO()
+    app_module.create_meeting_summary_ppt(parsed).write_to(buf)
+    return buf.getvalue()
+
+
+def measure_size(n_sections: int, repeat: int) -> dict:
+    """1サイズ分を計測する（子プロセスで実行される）"""
+    app_module, _ = load_app()
+    parsed = fixture(n_sections)
+    render(app_module, fixture(1))  # テンプレート読み込み・初回インポートを除外
+
+    t0 = time.perf_counter()
+    slides = len(plan_deck(parsed))
+    plan_s = time.perf_counter() - t0
+
+    walls, cpus, digests = [], [], set()
+    blob = b""
+    for _ in range(repeat):
+        t0, c0 = time.perf_counter(), time.process_time()
+        blob = render(app_module, parsed)
+        walls.append(time.perf_counter() - t0)
+        cpus.append(time.process_time() - c0)
+        digests.add(deck_digest(blob))
+    rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    render(app_module, parsed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "sections": n_sections,
+        "wall_s": statistics.median(walls),
+        "cpu_s": statistics.median(cpus),
+        "rss_mib": rss_kib / 1024,
+        "alloc_peak_mib": peak / (1024 * 1024),
+        "bytes": len(blob),
+        "slides": slides,
+        "plan_ms": plan_s * 1000,
+        "digest": digests.pop() if len(digests) == 1 else None,
+    }
+
+
+def run_child(n_sections: int, repeat: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", str(n_sections), "--repeat", str(repeat)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure_e2e(n_sections: int, requests: int) -> dict:
+    """偽 LLM を差し込んだ /generate をジョブ完了まで計測する"""
+    app_module, fake = load_app(payload=fixture(n_sections))
+    test_client = app_module.app.test_client()
+    latencies = []
+    for i in range(requests):
+        t0 = time.perf_counter()
+        resp = test_client.post("/generate", data={"minutes_text": f"議事録 {i}"},
+                                headers={"Accept": "application/json"})
+        job = app_module.jobs.wait(resp.get_json()["job_id"], timeout=600)
+        if job.error:
+            raise RuntimeError(job.error)
+        latencies.append(time.perf_counter() - t0)
+        app_module.artifact_storage.delete(job.result["filename"])
+    return {"sections": n_sections, "requests": requests, "llm_calls": fake.calls,
+            "p50_s": statistics.median(latencies), "max_s": max(latencies)}
+
+
+# POST /plan が 400 を返すべき形の合わない解析結果
+BAD_PAYLOADS = [{"sections": [None]}, {"bant": "x"}, {"title": 5}, {"next_actions": "x"}]
+
+
+def check_plan_payloads() -> bool:
+    """形の合わない解析結果は 500 ではなく 400 とエラー内容を返す"""
+    app_module, _ = load_app()
+    client = app_module.app.test_client()
+    ok = True
+    for body in BAD_PAYLOADS:
+        res = client.post("/plan", json=body)
+        if res.status_code != 400 or not (res.get_json() or {}).get("details"):
+            print(f"[ERROR] POST /plan {json.dumps(body)}: {res.status_code}")
+            ok = False
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="セクション数（カンマ区切り）")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--e2e", action="store_true", help="/generate のエンドツーエンド計測も行う")
+    ap.add_argument("--e2e-sections", type=int, default=100)
+    ap.add_argument("--e2e-requests", type=int, default=5)
+    ap.add_argument("--update-golden", action="store_true", help="現在の出力を基準として保存する")
+    ap.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure_size(args.child, args.repeat)))
+        return
+
+    golden = {}
+    if os.path.exists(GOLDEN_PATH):
+        with open(GOLDEN_PATH, encoding="utf-8") as f:
+            golden = json.load(f)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print(f"{'sections':>8} {'wall_s':>8} {'cpu_s':>8} {'rss_mib':>8} {'alloc_mib':>9} {'bytes':>10} {'slides':>6} {'plan_ms':>8}  output")
+    mismatched = []
+    for n in sizes:
+        r = run_child(n, args.repeat)
+        expected = golden.get(str(n))
+        if r["digest"] is None:
+            status = "NONDETERMINISTIC"
+            mismatched.append(n)
+        elif args.update_golden:
+            golden[str(n)] = r["digest"]
+            status = "updated"
+        elif expected is None:
+            status = "no golden"
+        elif expected == r["digest"]:
+            status = "identical"
+        else:
+            status = "CHANGED"
+            mismatched.append(n)
+        print(f"{n:>8} {r['wall_s']:>8.3f} {r['cpu_s']:>8.3f} {r['rss_mib']:>8.1f} {r['alloc_peak_mib']:>9.1f} "
+              f"{r['bytes']:>10} {r['slides']:>6} {r['plan_ms']:>8.1f}  {status}")
+
+    if args.update_golden:
+        os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+        with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+            json.dump(golden, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.e2e:
+        e = measure_e2e(args.e2e_sections, args.e2e_requests)
+        print(f"e2e /generate: {e['sections']} sections x {e['requests']} requests, "
+              f"p50 {e['p50_s']:.3f}s, max {e['max_s']:.3f}s, llm calls {e['llm_calls']}")
+
+    payloads_ok = check_plan_payloads()
+    if mismatched:
+        print(f"[ERROR] Output differs from golden for sections: {mismatched}")
+    if mismatched or not payloads_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+解析の応答モード（verbose / compact）の比較
+
+bench/fixtures/parse_responses.jsonl の応答（1行1件: case, mode, content, completion_tokens, latency_ms）を
+app と同じ手順（コードフェンス除去 → json.loads → スキーマ検査 → compact は従来の形に展開）で解釈し、
+モードごとの出力トークン数と解釈の失敗率を表示する。
+スキーマに合う verbose の応答は compact に変換して展開し、元に戻ることも確認する。
+
+続けて、解釈できた各応答に同じ壊れ方（FAULTS: 途中切れ・末尾カンマ・コードフェンス・形の違い）を
+両モードで同じように加え、どちらのモードでも期待どおりに検出（またはコードフェンスなら解釈）できるかを確かめる。
+期待と違えば終了コード 1。
+
+同梱のフィクスチャは、各モードの正常な応答をサンプル議事録から用意したもの（両モードで同じ case）なので、
+失敗率は 0% になる。実際のデプロイメントの失敗率を比べるには --record で記録し直す
+（.env か環境変数の Azure OpenAI 設定を使う。温度は LLM_TEMPERATURE ではなく --temperature で指定）。
+
+使い方:
+  python bench/bench_response_mode.py
+  python bench/bench_response_mode.py --record 5 --temperature verbose=1.0,compact=0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# --record では .env の Azure OpenAI 設定を使う（common はダミーの設定を未設定の場合だけ入れる）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv(os.path.join(ROOT, ".env"))
+
+from common import SAMPLE_MINUTES  # noqa: E402
+import compact_schema  # noqa: E402
+from preprocess import count_tokens  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "parse_responses.jsonl")
+MODES = ("verbose", "compact")
+
+
+def interpret(mode: str, content: str) -> tuple:
+    """(従来の形の解析結果, 失敗の種類)。失敗の種類は None / "json" / "schema" """
+    from app import strip_code_fence
+    try:
+        data = json.loads(strip_code_fence(content))
+    except ValueError:
+        return None, "json"
+    schema = compact_schema.RESPONSE_SCHEMA if mode == "compact" else compact_schema.VERBOSE_SCHEMA
+    errors = compact_schema.validate(data, schema)
+    parsed = compact_schema.expand(data) if mode == "compact" else data
+    return parsed, "schema" if errors else None
+
+
+def _truncate(content: str) -> str:
+    # トークン上限で途中で切れた応答
+    return content[:len(content) * 6 // 10]
+
+
+def _trailing_comma(content: str) -> str:
+    body = content.rstrip()
+    return body[:-1].rstrip() + ",\n}"
+
+
+def _fence(content: str) -> str:
+    return "```json\n" + content + "\n```"
+
+
+def _wrong_shape(content: str) -> str:
+    # 配列のはずの最初の項目を文字列にする（どちらのモードでもスキーマ違反）
+    data = json.loads(content)
+    key = next(k for k, v in data.items() if isinstance(v, list))
+    data[key] = "、".join(map(str, data[key]))
+    return json.dumps(data, ensure_ascii=False)
+
+
+# (名前, 加工, 期待する失敗の種類)
+FAULTS = [
+    ("truncated", _truncate, "json"),
+    ("trailing-comma", _trailing_comma, "json"),
+    ("fenced", _fence, None),
+    ("wrong-shape", _wrong_shape, "schema"),
+]
+
+
+def check_faults(rows: list) -> int:
+    """解釈できた応答に FAULTS を両モードで加え、期待と違う結果になった数を返す"""
+    mismatches = 0
+    results = {mode: {name: [0, 0] for name, _, _ in FAULTS} for mode in MODES}  # [期待どおり, 件数]
+    for r in rows:
+        mode = r["mode"]
+        if interpret(mode, r["content"])[1] is not None:
+            continue
+        for name, fault, expected in FAULTS:
+            _, failure = interpret(mode, fault(r["content"]))
+            results[mode][name][1] += 1
+            if failure == expected:
+                results[mode][name][0] += 1
+            else:
+                mismatches += 1
+                print(f"[ERROR] {mode} {r['case']} {name}: expected {expected or 'ok'}, got {failure or 'ok'}")
+    print("injected faults (same faults in both modes; expected result in brackets):")
+    for name, _, expected in FAULTS:
+        cells = " ".join(f"{mode}={results[mode][name][0]}/{results[mode][name][1]}" for mode in MODES)
+        print(f"  {name:>15} [{expected or 'ok':>6}] {cells}")
+    return mismatches
+
+
+def record(n: int, temperatures: dict, out_path: str):
+    """設定中のデプロイメントに各モードで n 回ずつ解析させ、応答を記録する"""
+    import app as app_module
+    from bench_preprocess import noisy_transcript
+    cases = {"sample": SAMPLE_MINUTES, "transcript": noisy_transcript(200)}
+    rows = []
+    for mode in MODES:
+        app_module.COMPACT_RESPONSE = mode == "compact"
+        for case, text in cases.items():
+            messages = app_module.build_parse_messages(app_module.compact_minutes(text))
+            for i in range(n):
+                t0 = time.perf_counter()
+                resp = app_module.get_llm().create(
+                    model=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini"),
+                    temperature=temperatures[mode],
+                    response_format=app_module.response_format(),
+                    messages=messages,
+                )
+                usage = getattr(resp, "usage", None)
+                rows.append({"case": f"{case}-{i}", "mode": mode, "content": resp.choices[0].message.content,
+                             "completion_tokens": getattr(usage, "completion_tokens", None),
+                             "latency_ms": round((time.perf_counter() - t0) * 1000)})
+                print(f"[INFO] recorded {mode} {case}-{i}")
+    with open(out_path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixtures", default=FIXTURES)
+    ap.add_argument("--record", type=int, default=0, help="各モード・各議事録で記録する応答数（0 は記録しない）")
+    ap.add_argument("--temperature", default="verbose=1.0,compact=0.2")
+    args = ap.parse_args()
+
+    if args.record:
+        temperatures = {k: float(v) for k, v in (x.split("=") for x in args.temperature.split(","))}
+        record(args.record, temperatures, args.fixtures)
+
+    with open(args.fixtures, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    print(f"{'mode':>8} {'responses':>9} {'tokens':>7} {'p95':>6} {'json_fail':>9} {'schema_fail':>11} "
+          f"{'fail_rate':>9} {'latency_ms':>10}")
+    mean_tokens = {}
+    ok_tokens = {mode: {} for mode in MODES}  # 解釈できた応答のトークン数（case ごと）
+    roundtrip_failed = 0
+    tokenizer = "-"
+    for mode in MODES:
+        tokens, latency, failures = [], [], {"json": 0, "schema": 0}
+        subset = [r for r in rows if r["mode"] == mode]
+        for r in subset:
+            n, tokenizer = count_tokens(r["content"])
+            n = r.get("completion_tokens") or n
+            tokens.append(n)
+            if r.get("latency_ms"):
+                latency.append(r["latency_ms"])
+            parsed, failure = interpret(mode, r["content"])
+            if failure:
+                failures[failure] += 1
+                continue
+            ok_tokens[mode][r["case"]] = n
+            if mode == "verbose" and compact_schema.expand(compact_schema.compact(parsed)) != parsed:
+                roundtrip_failed += 1
+                print(f"[ERROR] {r['case']}: compact → expand does not restore the verbose response")
+        if not subset:
+            continue
+        mean_tokens[mode] = statistics.mean(tokens)
+        p95 = sorted(tokens)[min(len(tokens) - 1, int(len(tokens) * 0.95))]
+        rate = (failures["json"] + failures["schema"]) / len(subset)
+        print(f"{mode:>8} {len(subset):>9} {mean_tokens[mode]:>7.0f} {p95:>6} {failures['json']:>9} "
+              f"{failures['schema']:>11} {rate:>9.0%} {statistics.mean(latency) if latency else 0:>10.0f}")
+    # 比は両モードとも解釈できた case だけで比べる（失敗した応答の長さに左右されないように）
+    shared = ok_tokens["verbose"].keys() & ok_tokens["compact"].keys()
+    if shared:
+        ratio = sum(ok_tokens["compact"][c] for c in shared) / sum(ok_tokens["verbose"][c] for c in shared)
+        print(f"compact / verbose output tokens: {ratio:.0%} over {len(shared)} cases "
+              f"(tokenizer: {tokenizer}; recorded completion_tokens are used when present)")
+    if check_faults(rows) or roundtrip_failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+生成結果の保存経路のベンチマーク
+
+大きなデッキについて、1リクエストあたりの保存処理のメモリ・CPU を比較する。
+
+  before: BytesIO へ保存 → getvalue() でコピーしてファイルへ書き込み → Presentation(file) で再解析して枚数を数える
+  after : DeckResult.write_to でファイルへ直接書き込み、枚数は生成時の値を使う
+
+使い方:
+  python bench/bench_save_path.py --sections 300
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from common import load_app, synthetic_parsed
+from pptx import Presentation
+
+
+def measure(fn):
+    # CPU は tracemalloc の影響を受けないよう別に計る
+    cpu0 = time.process_time()
+    result = fn()
+    cpu = time.process_time() - cpu0
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, cpu, peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sections", type=int, default=300)
+    args = ap.parse_args()
+
+    app_module, _ = load_app()
+    parsed = synthetic_parsed(args.sections)
+    workdir = tempfile.mkdtemp()
+    # 生成は共通なので1回だけ行い、保存経路のみを比較する
+    deck = app_module.create_meeting_summary_ppt(parsed)
+
+    def before():
+        ppt_file = deck.to_bytesio()  # 従来の create_meeting_summary_ppt の戻り値相当
+        path = os.path.join(workdir, "before.pptx")
+        with open(path, "wb") as f:
+            f.write(ppt_file.getvalue())
+        return len(Presentation(path).slides)
+
+    def after():
+        path = os.path.join(workdir, "after.pptx")
+        deck.write_to(path)
+        return deck.slide_count
+
+    n_before, cpu_before, peak_before = measure(before)
+    n_after, cpu_after, peak_after = measure(after)
+    assert n_before == n_after
+
+    size = os.path.getsize(os.path.join(workdir, "after.pptx"))
+    print(f"sections={args.sections} slides={n_after} size={size / 1024:.0f} KiB")
+    print(f"before: cpu {cpu_before * 1000:7.1f} ms | peak {peak_before / 2**20:6.1f} MiB")
+    print(f" after: cpu {cpu_after * 1000:7.1f} ms | peak {peak_after / 2**20:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
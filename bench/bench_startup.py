@@ -0,0 +1,103 @@
+"""
+ワーカー起動（インポート時間・コールドスタート）のベンチマーク
+
+子プロセスで Azure OpenAI の認証情報なしに app を読み込み、
+インポート・最初のリクエスト（GET /）・最初のデッキ描画までの時間と、読み込み済みの重いモジュールを表示する。
+warm は WARMUP_ON_START=1（gunicorn --preload のマスターで行う事前読み込み）の場合。
+最後に python -X importtime で app が直接読み込むモジュールの所要時間（累積）を多い順に示す。
+
+使い方:
+  python bench/bench_startup.py --repeat 3 --top 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pptx", "lxml.etree", "openai", "httpx", "numpy", "tiktoken"]
+
+
+def child():
+    sys.path.insert(0, ROOT)
+    t0 = time.perf_counter()
+    import app as app_module
+    t_import = time.perf_counter() - t0
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    t1 = time.perf_counter()
+    status = app_module.app.test_client().get("/").status_code
+    t_request = time.perf_counter() - t1
+
+    from common import SAMPLE_PARSED
+    t2 = time.perf_counter()
+    app_module.create_meeting_summary_ppt(SAMPLE_PARSED, processes=1).to_bytesio()
+    t_deck = time.perf_counter() - t2
+    print(json.dumps({"import_s": t_import, "request_s": t_request, "deck_s": t_deck,
+                      "status": status, "loaded": loaded}))
+
+
+def clean_env(warm: bool) -> dict:
+    env = {k: v for k, v in os.environ.items() if not k.startswith("AZURE_OPENAI_")}
+    env["WARMUP_ON_START"] = "1" if warm else "0"
+    return env
+
+
+def run_child(warm: bool) -> dict:
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], env=clean_env(warm),
+                         cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def import_profile(top: int) -> tuple:
+    """
+    python -X importtime の結果から (app の累積マイクロ秒, app が直接読み込むモジュールの上位 top 件)
+    行の形式は "import time: self | cumulative | name" で、name の字下げが入れ子の深さを表す
+    """
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], env=clean_env(False),
+                         cwd=ROOT, check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # 見出し行
+        cumulative, name = int(fields[1]), fields[2][1:]
+        if not name.startswith(" "):
+            # 入れ子のモジュールは親より先に出力される
+            if name == "app":
+                return cumulative, sorted(rows, reverse=True)[:top]
+            rows = []
+        elif not name.startswith("   "):
+            rows.append((cumulative, name.strip()))
+    return 0, []
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    print(f"{'mode':>6} {'import_s':>9} {'first_req_s':>11} {'first_deck_s':>12} {'total_s':>8}  loaded after import")
+    for warm in (False, True):
+        runs = [run_child(warm) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["import_s"] + r["request_s"] + r["deck_s"])
+        total = best["import_s"] + best["request_s"] + best["deck_s"]
+        print(f"{'warm' if warm else 'lazy':>6} {best['import_s']:>9.3f} {best['request_s']:>11.3f} "
+              f"{best['deck_s']:>12.3f} {total:>8.3f}  {', '.join(best['loaded']) or '-'}")
+
+    total, rows = import_profile(args.top)
+    print(f"\npython -X importtime: app {total / 1000:.1f} ms (cumulative)")
+    for cumulative, name in rows:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+生成物の保存先（storage）のチェック
+
+S3Storage を MinIO などの代わりになる S3 互換のスタンドイン（既定はこのファイルの FakeS3Client、
+--moto なら moto のモック）に向け、LocalStorage と同じ手順で
+保存・読み出し・範囲読み出し（長さ 0 のオブジェクトを含む）・ETag・削除（TTL / 容量上限）と、
+/download の 200 / 206 / 304 を確認する。1つでも満たさなければ終了コード 1。
+
+FakeS3Client は S3 と同じく、不正な Range（"bytes=0--1" など）や範囲外の Range をエラーにする。
+
+使い方:
+  python bench/bench_storage.py
+  python bench/bench_storage.py --moto   # pip install "moto[s3]" boto3
+"""
+import argparse
+import hashlib
+import io
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from common import load_app
+from storage import ArtifactEvictor, LocalStorage, S3Storage
+
+BUCKET = "meeting-slides"
+PREFIX = "artifacts/"
+_RANGE_RE = re.compile(r'^bytes=(\d+)-(\d*)$')
+
+
+class S3Error(Exception):
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class _Body:
+    def __init__(self, data: bytes):
+        self._f = io.BytesIO(data)
+
+    def iter_chunks(self, chunk_size: int):
+        while True:
+            chunk = self._f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        self._f.close()
+
+
+class FakeS3Client:
+    """S3Storage が使う範囲だけの S3 クライアント（メモリ上）。now で LastModified を決める"""
+
+    def __init__(self, now=time.time):
+        self.now = now
+        self.objects = {}  # (bucket, key) -> (data, mtime)
+        self.requests = []  # get_object の引数
+        self._lock = threading.Lock()
+
+    def _get(self, bucket, key):
+        try:
+            return self.objects[(bucket, key)]
+        except KeyError:
+            raise S3Error("NoSuchKey")
+
+    @staticmethod
+    def _meta(data: bytes, mtime: float) -> dict:
+        return {"ContentLength": len(data), "ETag": f'"{hashlib.md5(data).hexdigest()}"',
+                "LastModified": datetime.fromtimestamp(mtime, timezone.utc)}
+
+    def upload_fileobj(self, f, bucket, key):
+        with self._lock:
+            self.objects[(bucket, key)] = (f.read(), self.now())
+
+    def head_object(self, Bucket, Key):
+        return self._meta(*self._get(Bucket, Key))
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.requests.append({"Key": Key, "Range": Range})
+        data, mtime = self._get(Bucket, Key)
+        if Range is not None:
+            m = _RANGE_RE.match(Range)
+            if m is None:
+                raise S3Error("InvalidArgument")
+            start = int(m.group(1))
+            end = int(m.group(2)) + 1 if m.group(2) else len(data)
+            if start >= len(data) or end <= start:
+                raise S3Error("InvalidRange")
+            data = data[start:end]
+        return dict(self._meta(data, mtime), Body=_Body(data))
+
+    def delete_object(self, Bucket, Key):
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+
+    def get_paginator(self, name):
+        assert name == "list_objects_v2"
+
+        def paginate(Bucket, Prefix=""):
+            contents = [dict(Key=key, Size=len(data), ETag=f'"{hashlib.md5(data).hexdigest()}"',
+                             LastModified=datetime.fromtimestamp(mtime, timezone.utc))
+                        for (bucket, key), (data, mtime) in sorted(self.objects.items())
+                        if bucket == Bucket and key.startswith(Prefix)]
+            yield {"Contents": contents} if contents else {}
+
+        return SimpleNamespace(paginate=paginate)
+
+
+class Checker:
+    def __init__(self, label: str):
+        self.label = label
+        self.failed = 0
+
+    def check(self, name: str, ok: bool, detail=""):
+        print(f"  {'ok' if ok else 'FAIL':>4}  {self.label}: {name}{f' ({detail})' if detail and not ok else ''}")
+        self.failed += not ok
+
+
+def check_storage(storage, c: Checker, tick, fake: FakeS3Client = None):
+    """保存・読み出し・範囲・ETag・削除。tick() は保存の間に呼び、更新時刻をずらす"""
+    data = bytes(range(256)) * 1024  # 256 KiB（READ_CHUNK_SIZE を超える）
+    info = storage.save("deck.pptx", lambda f: f.write(data))
+    c.check("save returns size", info is not None and info.size == len(data))
+    c.check("read", storage.read("deck.pptx") == data)
+    c.check("full iter_bytes", b"".join(storage.iter_bytes("deck.pptx")) == data)
+    c.check("range", b"".join(storage.iter_bytes("deck.pptx", 100, 70000)) == data[100:70000])
+    c.check("open range", b"".join(storage.iter_bytes("deck.pptx", 200000)) == data[200000:])
+    if fake is not None:
+        sent = [r["Range"] for r in fake.requests[-4:]]
+        c.check("Range only for sub-ranges", sent == [None, None, "bytes=100-69999", "bytes=200000-"], sent)
+    etag = storage.stat("deck.pptx").etag
+    c.check("etag stable", storage.stat("deck.pptx").etag == etag)
+    storage.save("deck.pptx", lambda f: f.write(data[::-1]))
+    c.check("etag changes with content", storage.stat("deck.pptx").etag != etag)
+
+    storage.save("empty.json", lambda f: None)
+    c.check("zero-length stat", storage.stat("empty.json").size == 0)
+    try:
+        c.check("zero-length read", storage.read("empty.json") == b"")
+        c.check("zero-length range", b"".join(storage.iter_bytes("empty.json", 0, 0)) == b"")
+    except Exception as e:
+        c.check("zero-length read", False, repr(e))
+    c.check("missing stat", storage.stat("missing.pptx") is None)
+
+    # 削除: TTL 超過（最も古い1件）→ 容量上限（次に古い1件）
+    for info in storage.list():
+        storage.delete(info.name)
+    for i in range(4):
+        tick()
+        storage.save(f"a{i}.pptx", lambda f: f.write(b"x" * 1000))
+    c.check("list", sorted(i.name for i in storage.list()) == [f"a{i}.pptx" for i in range(4)])
+    now = time.time()
+    ages = sorted((now - i.mtime for i in storage.list()), reverse=True)
+    removed = ArtifactEvictor(storage, ttl_seconds=(ages[0] + ages[1]) / 2, max_bytes=2000).sweep()
+    left = sorted(i.name for i in storage.list())
+    c.check("evict ttl + size", removed == 2 and left == ["a2.pptx", "a3.pptx"], f"removed={removed} left={left}")
+
+
+def check_download(app_module, storage, c: Checker):
+    """/download の全体・範囲・条件付き GET・長さ 0 のファイル"""
+    app_module.artifact_storage = storage
+    client = app_module.app.test_client()
+    data = b"0123456789" * 10000
+    storage.save("dl.pptx", lambda f: f.write(data))
+    storage.save("dl-empty.pptx", lambda f: None)
+    res = client.get("/download/dl.pptx")
+    c.check("download 200", res.status_code == 200 and res.data == data, res.status_code)
+    res2 = client.get("/download/dl.pptx", headers={"Range": "bytes=10-19"})
+    c.check("download 206", res2.status_code == 206 and res2.data == data[10:20], res2.status_code)
+    res3 = client.get("/download/dl.pptx", headers={"If-None-Match": res.headers["ETag"]})
+    c.check("download 304", res3.status_code == 304, res3.status_code)
+    res4 = client.get("/download/dl-empty.pptx")
+    c.check("download zero-length", res4.status_code == 200 and res4.data == b"", res4.status_code)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--moto", action="store_true", help="FakeS3Client の代わりに moto のモックを使う")
+    args = ap.parse_args()
+
+    app_module, _ = load_app()
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        c = Checker("local")
+        check_storage(LocalStorage(tmp), c, lambda: time.sleep(0.01))
+        failed += c.failed
+
+    if args.moto:
+        import boto3
+        from moto import mock_aws
+        with mock_aws():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket=BUCKET)
+            c = Checker("s3 (moto)")
+            check_storage(S3Storage(BUCKET, PREFIX, client=client), c, lambda: time.sleep(1.1))  # LastModified は秒単位
+            check_download(app_module, S3Storage(BUCKET, PREFIX, client=client), c)
+            failed += c.failed
+    else:
+        clock = [time.time() - 100]
+
+        def tick():
+            clock[0] += 10
+
+        fake = FakeS3Client(now=lambda: clock[0])
+        c = Checker("s3 (fake)")
+        check_storage(S3Storage(BUCKET, PREFIX, client=fake), c, tick, fake)
+        check_download(app_module, S3Storage(BUCKET, PREFIX, client=fake), c)
+        failed += c.failed
+
+    if failed:
+        print(f"[ERROR] {failed} storage checks failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
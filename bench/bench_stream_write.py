@@ -0,0 +1,78 @@
+"""
+ストリーミング書き出しのメモリ比較
+
+サイズごとに子プロセスで、Presentation 全体を組み立ててから保存する従来の経路と、
+少しずつ描画しながら書き出す経路（StreamedDeckResult）を比較する。
+RSS は app 読み込み・テンプレート準備後からの増分（ピーク）で示す。
+
+使い方:
+  python bench/bench_stream_write.py --sizes 100,500,1000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import deck_digest, load_app, synthetic_parsed
+
+
+def current_rss_mib() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def measure(n_sections: int, streamed: bool, chunk: int) -> dict:
+    app_module, _ = load_app()
+    app_module.STREAM_WRITE_MIN_SLIDES = 1 if streamed else 0
+    app_module.STREAM_WRITE_CHUNK_SLIDES = chunk
+    app_module.create_meeting_summary_ppt(synthetic_parsed(1), processes=1).to_bytesio()
+    parsed = synthetic_parsed(n_sections, bullet_len=120, next_actions=40)
+    base = current_rss_mib()
+    with tempfile.TemporaryFile() as f:
+        t0 = time.perf_counter()
+        deck = app_module.create_meeting_summary_ppt(parsed, processes=1)
+        deck.write_to(f)
+        elapsed = time.perf_counter() - t0
+        f.seek(0)
+        digest = deck_digest(f.read())
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"wall_s": elapsed, "rss_delta_mib": peak - base, "slides": deck.slide_count, "digest": digest}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100,500")
+    ap.add_argument("--chunk", type=int, default=50, help="ストリーミング時に一度に描画するスライド数")
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(int(args.child[0]), args.child[1] == "stream", args.chunk)))
+        return
+
+    def run(n, mode):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(n), mode,
+                              "--chunk", str(args.chunk)], check=True, capture_output=True, text=True).stdout
+        return json.loads(out.strip().splitlines()[-1])
+
+    print(f"{'sections':>8} {'slides':>6} {'mode':>8} {'wall_s':>8} {'rss+mib':>8}  output")
+    failed = False
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        full = run(n, "full")
+        stream = run(n, "stream")
+        same = full["digest"] == stream["digest"]
+        failed |= not same
+        print(f"{n:>8} {full['slides']:>6} {'full':>8} {full['wall_s']:>8.2f} {full['rss_delta_mib']:>8.1f}")
+        print(f"{n:>8} {stream['slides']:>6} {'stream':>8} {stream['wall_s']:>8.2f} {stream['rss_delta_mib']:>8.1f}"
+              f"  {'identical' if same else 'DIFFERENT'}")
+    if failed:
+        print("[ERROR] Streamed output differs from the full render")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
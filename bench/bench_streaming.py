@@ -0,0 +1,117 @@
+"""
+ストリーミング解析のベンチマーク（スタブ LLM）
+
+LLM が --llm-delay 秒かけて JSON を出力する状況で、
+  batch    : 応答を待ってから PPTX を組み立てる（parse_meeting_minutes → create_meeting_summary_ppt）
+  streaming: 応答を受け取りながらスライドを組み立てる（create_meeting_summary_ppt_streaming）
+の、最初の進捗（スライド）が出るまでの時間と全体の時間を比較する。
+
+続けて、LLM がキーをいろいろな順序で返した場合（verbose / compact の両方）に、
+ストリーミングで組み立てたスライドの並びが plan_deck(解析結果) と一致するかを確認する。
+途中で切れた応答（finish_reason="length"）では、生成ジョブが失敗し、解析キャッシュにも保存されないことも確認する
+（満たさなければ終了コード 1）。
+
+使い方:
+  python bench/bench_streaming.py --sections 60 --llm-delay 2.0
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from common import SAMPLE_MINUTES, SAMPLE_PARSED, load_app, synthetic_parsed
+
+# 確認するキーの順序（先頭に置くキー。残りは元の順序）
+KEY_ORDERS = [
+    [],
+    ["sections"],
+    ["sections", "agenda", "title"],
+    ["summary", "bant", "next_actions", "sections", "meeting_date"],
+    ["agenda", "sections", "company_name", "title"],
+]
+
+
+def reordered(parsed: dict, first: list, reverse_rest: bool = False) -> dict:
+    rest = [k for k in parsed if k not in first]
+    return {k: parsed[k] for k in first + (rest[::-1] if reverse_rest else rest)}
+
+
+def check_key_orders(app_module, fake) -> bool:
+    """キーの順序を変えた応答でも、ストリーミングの計画が plan_deck と同じになるか"""
+    import compact_schema
+    from layout_plan import plan_deck
+    ok = True
+    base = compact_schema.expand(compact_schema.compact(SAMPLE_PARSED))
+    short = {v: k for k, v in compact_schema.TOP_KEYS.items()}
+    for compact in (False, True):
+        app_module.COMPACT_RESPONSE = compact
+        for first in KEY_ORDERS:
+            for reverse_rest in (False, True):
+                payload = reordered(base, first, reverse_rest)
+                if compact:
+                    values = compact_schema.compact(payload)
+                    payload = {short[k]: values[short[k]] for k in payload}
+                fake.chat.completions.payload = payload
+                parsed, deck = app_module.create_meeting_summary_ppt_streaming(SAMPLE_MINUTES)
+                if deck.plan != plan_deck(parsed):
+                    order = ",".join(list(payload)[:5])
+                    print(f"[ERROR] {'compact' if compact else 'verbose'} key order {order}...: "
+                          f"{[p['source'] for p in deck.plan]} != {[p['source'] for p in plan_deck(parsed)]}")
+                    ok = False
+    app_module.COMPACT_RESPONSE = False
+    return ok
+
+
+def check_truncated(app_module, fake) -> bool:
+    """途中で切れた応答はジョブの失敗にし、欠けた解析結果をキャッシュしない"""
+    import tempfile
+    from parse_cache import ParseCache
+    fake.chat.completions.payload = SAMPLE_PARSED
+    fake.chat.completions.truncate_at = len(json.dumps(SAMPLE_PARSED, ensure_ascii=False)) // 2
+    saved_cache = app_module.parse_cache
+    with tempfile.TemporaryDirectory() as tmp:
+        app_module.parse_cache = ParseCache(os.path.join(tmp, "cache.sqlite3"))
+        try:
+            job = app_module.jobs.wait(app_module.jobs.submit(app_module.run_generation, "途中切れの確認").id, 30)
+            cached = app_module.lookup_parse_cache("途中切れの確認")
+        finally:
+            app_module.parse_cache = saved_cache
+            fake.chat.completions.truncate_at = None
+    ok = job.status == "error" and cached is None
+    print(f"truncated stream: job {job.status}, cached {cached is not None} ({'ok' if ok else 'FAIL'})")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sections", type=int, default=60)
+    ap.add_argument("--llm-delay", type=float, default=2.0)
+    args = ap.parse_args()
+
+    app_module, fake = load_app(delay=args.llm_delay, payload=synthetic_parsed(args.sections))
+
+    t0 = time.perf_counter()
+    parsed = app_module.parse_meeting_minutes(SAMPLE_MINUTES)
+    first = time.perf_counter() - t0  # 一括方式では解析完了まで進捗が出ない
+    app_module.create_meeting_summary_ppt(parsed)
+    total = time.perf_counter() - t0
+    print(f"    batch: first progress {first:6.2f}s | total {total:6.2f}s")
+
+    marks = []
+    t0 = time.perf_counter()
+    app_module.create_meeting_summary_ppt_streaming(
+        SAMPLE_MINUTES, on_progress=lambda stage, **data: marks.append(time.perf_counter() - t0))
+    total = time.perf_counter() - t0
+    print(f"streaming: first progress {marks[0]:6.2f}s | total {total:6.2f}s")
+
+    fake.chat.completions.delay = 0
+    orders_ok = check_key_orders(app_module, fake)
+    if orders_ok:
+        print(f"key orders: streamed plan matches plan_deck for {len(KEY_ORDERS) * 4} responses")
+    if not (check_truncated(app_module, fake) and orders_ok):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+テンプレート読み込みのマイクロベンチマーク
+
+マスターに大きな画像と多数の図形を載せた「重い」テンプレートを作り、
+デッキ1枚あたりの準備時間を比較する。
+
+  before: Presentation(template_path) を毎回実行（従来の create_meeting_summary_ppt）
+  clone : TemplatePool のプロトタイプからコピー（事前用意なし）
+  pool  : TemplatePool の事前用意済みコピーを取得
+
+使い方:
+  python bench/bench_template.py --images 4 --shapes 300 --decks 30
+"""
+import argparse
+import copy
+import io
+import os
+import random
+import tempfile
+import time
+
+import common  # noqa: F401  (sys.path の設定)
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+
+from template_pool import TemplatePool
+
+_PIC_XML = (
+    '<p:pic xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"'
+    ' xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+    ' xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<p:nvPicPr><p:cNvPr id="{id}" name="bg{id}"/><p:cNvPicPr/><p:nvPr/></p:nvPicPr>'
+    '<p:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></p:blipFill>'
+    '<p:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+    '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></p:spPr></p:pic>'
+)
+
+
+def build_heavy_template(path: str, images: int, shapes: int):
+    from lxml import etree
+    prs = Presentation()
+    master = prs.slide_master
+    tree = master.shapes._spTree
+    rnd = random.Random(0)
+    for i in range(images):
+        img = Image.frombytes("RGB", (800, 600), bytes(rnd.getrandbits(8) for _ in range(800 * 600 * 3)))
+        buf = io.BytesIO()
+        img.save(buf, "PNG")
+        buf.seek(0)
+        _, rid = master.part.get_or_add_image_part(buf)
+        tree.append(etree.fromstring(_PIC_XML.format(id=1000 + i, rid=rid, cx=Inches(1), cy=Inches(1))))
+    # マスター・レイアウトに図形を大量に載せて XML を重くする
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    for i in range(shapes):
+        slide.shapes.add_textbox(Inches(i % 9), Inches(i % 7), Inches(1), Inches(0.3)).text = f"装飾 {i}"
+    for sp in list(slide.shapes._spTree.iterchildren())[2:]:
+        tree.append(copy.deepcopy(sp))
+        for layout in prs.slide_layouts:
+            layout.shapes._spTree.append(copy.deepcopy(sp))
+    # 作業用スライドは削除
+    sldIdLst = prs.slides._sldIdLst
+    prs.part.drop_rel(sldIdLst[0].rId)
+    sldIdLst.remove(sldIdLst[0])
+    prs.save(path)
+
+
+def timed(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--images", type=int, default=4)
+    ap.add_argument("--shapes", type=int, default=300)
+    ap.add_argument("--decks", type=int, default=30)
+    ap.add_argument("--template", help="既存のテンプレートを使う場合のパス")
+    args = ap.parse_args()
+
+    path = args.template
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(), "heavy.pptx")
+        build_heavy_template(path, args.images, args.shapes)
+    print(f"template: {path} ({os.path.getsize(path) / 1024:.0f} KiB)")
+
+    before = timed(lambda: Presentation(path), args.decks)
+
+    clone_pool = TemplatePool(path, size=0)
+    clone_pool.warmup()
+    clone = timed(clone_pool.new_presentation, args.decks)
+
+    pool = TemplatePool(path, size=args.decks)
+    pool.warmup()
+    ready = timed(pool.new_presentation, args.decks)
+
+    print(f"before: {before:7.2f} ms/deck")
+    print(f" clone: {clone:7.2f} ms/deck")
+    print(f"  pool: {ready:7.2f} ms/deck (pre-warmed)")
+
+    # 生成結果がテンプレートと同じ構成であることを確認
+    prs = clone_pool.new_presentation()
+    prs.slides.add_slide(prs.slide_layouts[1])
+    out = io.BytesIO()
+    prs.save(out)
+    check = Presentation(io.BytesIO(out.getvalue()))
+    assert len(check.slides) == 1 and len(check.slide_layouts) == len(Presentation(path).slide_layouts)
+
+
+if __name__ == "__main__":
+    main()
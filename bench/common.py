@@ -0,0 +1,151 @@
+"""
+ベンチマーク共通ヘルパー
+
+app をインポートする前にダミーの Azure OpenAI 設定を入れ、
+LLM 呼び出しを固定レスポンスを返すスタブに差し替える。
+"""
+import json
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "bench-dummy-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://bench.invalid.openai.azure.com/")
+
+SAMPLE_MINUTES = """# トレノケート株式会社様
+
+## 概要・目的
+- 日時：2025年7月9日（水）
+- 実施方法：オンライン（Microsoft Teams）
+- 目的：AI・データ活用による人材育成・業務効率化のご提案
+
+## 明確な課題・潜在的ニーズ
+- 既存研修データの有効活用
+- AIによる業務効率化の推進
+- PoC（概念実証）を限定的な範囲で実施したい
+
+## 合意したネクストアクション
+- 具体的な提案内容の整理（担当：提案側）
+- 次回打ち合わせでの詳細説明準備（担当：提案側）
+"""
+
+SAMPLE_PARSED = {
+    "company_name": "トレノケート株式会社",
+    "meeting_date": "2025年7月9日",
+    "title": "AI・データ活用による人材育成のご提案",
+    "agenda": ["概要・目的", "課題・ニーズ", "ネクストアクション"],
+    "sections": [
+        {"title": "概要・目的", "bullets": ["オンライン実施（Teams）", "AI・データ活用の提案"], "notes": []},
+        {"title": "課題", "bullets": ["既存研修データの有効活用", "AIによる業務効率化の推進"], "notes": ["PoCは限定範囲"]},
+    ],
+    "challenges": ["研修データが活用されていない"],
+    "needs": ["小さく始めるPoC"],
+    "next_actions": ["提案内容の整理（提案側）", "詳細説明の準備（提案側）"],
+    "bant": {"budget": "未定", "authority": "人事部長", "need": "業務効率化", "timeline": "今期中"},
+    "summary": ["PoCから段階的に導入"],
+}
+
+
+class FakeCompletions:
+    """
+    chat.completions.create を模した固定レスポンスのスタブ（呼び出し回数を数える）
+    stream=True のときは delay 秒かけて本文を少しずつ返す
+    truncate_at を指定すると、ストリームの本文をその文字数で切り、finish_reason="length" で終える
+    """
+
+    def __init__(self, delay: float = 0.0, payload: dict = None):
+        self.delay = delay
+        self.payload = payload or SAMPLE_PARSED
+        self.truncate_at = None
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+        content = json.dumps(self.payload, ensure_ascii=False)
+        if kwargs.get("stream"):
+            return self._stream(content)
+        if self.delay:
+            time.sleep(self.delay)
+        message = SimpleNamespace(content=content)
+        usage = SimpleNamespace(prompt_tokens=len(kwargs["messages"][-1]["content"]) // 2,
+                                completion_tokens=len(content) // 2,
+                                total_tokens=0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+    def _stream(self, content: str, piece: int = 8):
+        # サーバー側は読み手を待たずに生成を続けるので、到着時刻は開始からの経過時間で決める
+        if self.truncate_at is not None:
+            content = content[:self.truncate_at]
+        pieces = [content[i:i + piece] for i in range(0, len(content), piece)]
+        wait = self.delay / max(1, len(pieces))
+        start = time.perf_counter()
+        yield SimpleNamespace(choices=[])  # Azure のフィルタ結果チャンク相当
+        for i, p in enumerate(pieces):
+            ready = start + (i + 1) * wait - time.perf_counter()
+            if ready > 0:
+                time.sleep(ready)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=p))])
+        if self.truncate_at is not None:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason="length")])
+
+
+class FakeClient:
+    def __init__(self, delay: float = 0.0, payload: dict = None):
+        self.chat = SimpleNamespace(completions=FakeCompletions(delay, payload))
+
+    @property
+    def calls(self) -> int:
+        return self.chat.completions.calls
+
+
+def synthetic_parsed(n_sections: int, bullets: int = 6, bullet_len: int = 30, next_actions: int = 5) -> dict:
+    """n_sections 件のセクションを持つ解析結果（決定的に生成）"""
+    base = "顧客の業務課題とAI活用による改善提案の要点を整理する"
+    def text(i, j):
+        s = f"{i}-{j} " + base * (1 + bullet_len // len(base))
+        return s[:bullet_len + (j * 7) % 20]
+    return dict(
+        SAMPLE_PARSED,
+        agenda=[f"議題{i}" for i in range(min(n_sections, 8))],
+        sections=[{"title": f"セクション{i}",
+                   "bullets": [text(i, j) for j in range(bullets + i % 3)],
+                   "notes": [text(i, 99)] if i % 2 else []}
+                  for i in range(n_sections)],
+        next_actions=[f"ネクストアクション{i}（担当：提案側）" for i in range(next_actions)],
+    )
+
+
+def load_app(delay: float = 0.0, payload: dict = None, cache: bool = False):
+    """スタブ LLM を差し込んだ app モジュールを返す（既定では解析キャッシュを無効化）"""
+    import app as app_module
+    from llm_client import LLMClient
+    fake = FakeClient(delay, payload)
+    app_module.client = fake
+    app_module.llm = LLMClient(fake)
+    if not cache:
+        app_module.parse_cache = None
+    return app_module, fake
+
+
+def deck_digest(blob: bytes) -> str:
+    """PPTX の各パートの内容から出力の同一性を判定するダイジェスト（作成日時を含む docProps は除く）"""
+    import hashlib
+    import io
+    import zipfile
+    h = hashlib.sha256()
+    with zipfile.ZipFile(io.BytesIO(blob)) as zf:
+        for name in sorted(zf.namelist()):
+            if name.startswith("docProps/"):
+                continue
+            h.update(name.encode())
+            h.update(hashlib.sha256(zf.read(name)).digest())
+    return h.hexdigest()
@@ -0,0 +1,172 @@
+"""
+Azure OpenAI の chat/completions を模したローカルのモックサーバー
+
+1分あたりのリクエスト数が --rpm を超えたら 429（Retry-After 付き）を返し、
+--error-rate の割合で 500 を返す。正常時は --latency 秒待ってから固定の JSON を返す。
+"stream": true のリクエストには SSE（chunked）で本文を少しずつ返す（アプリの既定の LLM_STREAMING=1 のまま使える）。
+response_format が json_schema のとき（LLM_RESPONSE_MODE=compact）は短縮キーの JSON を返す。
+
+  python bench/mock_llm_server.py --port 8099 --rpm 60 --error-rate 0.05
+  AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8099 AZURE_OPENAI_API_KEY=dummy python app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import SAMPLE_PARSED
+import compact_schema  # noqa: E402  (common でリポジトリ直下を sys.path に追加してから)
+
+STREAM_PIECE_CHARS = 40  # SSE の1チャンクあたりの文字数
+
+
+class MockState:
+    def __init__(self, rpm: int, error_rate: float, latency: float):
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.latency = latency
+        self.window = deque()
+        self.counts = {"ok": 0, "throttled": 0, "error": 0}
+        self.streaming = 0      # 送信中のストリーム数
+        self.max_streaming = 0  # その最大値
+        self.lock = threading.Lock()
+
+    def stream_started(self):
+        with self.lock:
+            self.streaming += 1
+            self.max_streaming = max(self.max_streaming, self.streaming)
+
+    def stream_finished(self):
+        with self.lock:
+            self.streaming -= 1
+
+    def admit(self):
+        """(status, retry_after) を返す"""
+        now = time.monotonic()
+        with self.lock:
+            while self.window and now - self.window[0] > 60:
+                self.window.popleft()
+            if self.rpm and len(self.window) >= self.rpm:
+                self.counts["throttled"] += 1
+                return 429, max(0.0, 60 - (now - self.window[0]))
+            self.window.append(now)
+            if random.random() < self.error_rate:
+                self.counts["error"] += 1
+                return 500, None
+            self.counts["ok"] += 1
+            return 200, None
+
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def _event(self, obj):
+            self._chunk(b"data: " + json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n\n")
+
+        def _stream(self, content: str, usage: dict, include_usage: bool):
+            """SSE で本文を STREAM_PIECE_CHARS 文字ずつ返す（所要時間は合計で --latency 程度）"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": "mock"}
+            pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+            state.stream_started()
+            try:
+                # Azure と同じく、最初にコンテンツフィルタ結果だけの（choices が空の）チャンクを送る
+                self._event(dict(base, choices=[]))
+                for piece in pieces:
+                    time.sleep(state.latency / max(1, len(pieces)))
+                    self._event(dict(base, choices=[{"index": 0, "finish_reason": None,
+                                                     "delta": {"role": "assistant", "content": piece}}]))
+                self._event(dict(base, choices=[{"index": 0, "finish_reason": "stop", "delta": {}}]))
+                if include_usage:
+                    self._event(dict(base, choices=[], usage=usage))
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                state.stream_finished()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                request = {}
+            if not self.path.split("?")[0].endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+            status, retry_after = state.admit()
+            if status == 429:
+                return self._send(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                                  {"Retry-After": f"{retry_after:.0f}", "retry-after-ms": f"{retry_after * 1000:.0f}"})
+            if status == 500:
+                return self._send(500, {"error": {"message": "Internal server error"}})
+            compact = (request.get("response_format") or {}).get("type") == "json_schema"
+            content = json.dumps(compact_schema.compact(SAMPLE_PARSED) if compact else SAMPLE_PARSED,
+                                 ensure_ascii=False)
+            usage = {"prompt_tokens": 500, "completion_tokens": len(content), "total_tokens": 500 + len(content)}
+            if request.get("stream"):
+                include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+                return self._stream(content, usage, include_usage)
+            time.sleep(state.latency)
+            self._send(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": "mock",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            })
+
+    return Handler
+
+
+def start_server(port: int = 0, rpm: int = 60, error_rate: float = 0.0, latency: float = 0.05):
+    """バックグラウンドで起動し (server, state) を返す（port=0 は空きポート）"""
+    state = MockState(rpm, error_rate, latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--rpm", type=int, default=60)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--latency", type=float, default=0.05)
+    args = ap.parse_args()
+    server, state = start_server(args.port, args.rpm, args.error_rate, args.latency)
+    print(f"mock Azure OpenAI listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(10)
+            print(state.counts)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
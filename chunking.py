@@ -0,0 +1,149 @@
+"""
+長い議事録の分割解析（map-reduce）用ユーティリティ
+
+- split_minutes: 話者・見出し・段落の切れ目で、重なりを持たせたチャンクに分割
+- merge_parsed: チャンクごとの解析結果を既存スキーマの1つの dict に統合（重複除去つき）
+"""
+import os
+import re
+import unicodedata
+
+CHUNKED_PARSE_ENABLED = os.getenv("CHUNKED_PARSE_ENABLED", "1") != "0"
+CHUNK_THRESHOLD_CHARS = int(os.getenv("CHUNK_THRESHOLD_CHARS", "12000"))  # これを超えたら分割
+CHUNK_SIZE_CHARS = int(os.getenv("CHUNK_SIZE_CHARS", "6000"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("CHUNK_OVERLAP_CHARS", "400"))
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))
+
+# 「山田：」「Speaker 1:」「[10:02] 佐藤」「# 見出し」のような行で区切る
+_BOUNDARY_RE = re.compile(r'^\s*(#{1,6}\s|\[?\d{1,2}:\d{2}|[^\s:：]{1,20}[：:]\s*\S)')
+
+LIST_KEYS = ("agenda", "challenges", "needs", "next_actions", "summary")
+SCALAR_KEYS = ("company_name", "meeting_date", "title")
+BANT_KEYS = ("budget", "authority", "need", "timeline")
+
+
+def _units(text: str) -> list:
+    """空行・話者ラベル・見出しを境界として、分割の最小単位に切る"""
+    units, current = [], []
+    for line in text.splitlines():
+        if not line.strip() or _BOUNDARY_RE.match(line):
+            if current:
+                units.append("\n".join(current))
+                current = []
+            if not line.strip():
+                continue
+        current.append(line)
+    if current:
+        units.append("\n".join(current))
+    return units
+
+
+def _hard_split(unit: str, size: int) -> list:
+    # 1単位がチャンクより長い場合は行単位、それでも長ければ文字数で切る
+    pieces, buf = [], ""
+    for line in unit.splitlines():
+        while len(line) > size:
+            if buf:
+                pieces.append(buf)
+                buf = ""
+            pieces.append(line[:size])
+            line = line[size:]
+        if buf and len(buf) + 1 + len(line) > size:
+            pieces.append(buf)
+            buf = ""
+        buf = f"{buf}\n{line}" if buf else line
+    if buf:
+        pieces.append(buf)
+    return pieces
+
+
+def split_minutes(text: str, size: int = CHUNK_SIZE_CHARS, overlap: int = CHUNK_OVERLAP_CHARS) -> list:
+    """
+    議事録を size 文字程度のチャンクに分割する。
+    各チャンクの先頭には、直前のチャンク末尾の単位を overlap 文字以内で重ねる。
+    """
+    units = []
+    for u in _units(text or ""):
+        units.extend(_hard_split(u, size) if len(u) > size else [u])
+
+    chunks, current, length = [], [], 0
+    for u in units:
+        if current and length + len(u) > size:
+            chunks.append("\n\n".join(current))
+            # 末尾から overlap 文字分の単位を次のチャンクへ持ち越す
+            carry, carried = [], 0
+            for prev in reversed(current):
+                if carried + len(prev) > overlap:
+                    break
+                carry.insert(0, prev)
+                carried += len(prev)
+            current, length = carry, carried
+        current.append(u)
+        length += len(u)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _dedupe_key(s: str) -> str:
+    s = unicodedata.normalize("NFKC", s or "").lower()
+    return re.sub(r'[\s\W_]+', '', s)
+
+
+def _merge_list(target: list, seen: set, items):
+    for it in items or []:
+        if not isinstance(it, str):
+            continue
+        key = _dedupe_key(it)
+        if key and key not in seen:
+            seen.add(key)
+            target.append(it)
+
+
+def merge_parsed(parts: list) -> dict:
+    """チャンクごとの解析結果を統合する（先に出たものを優先し、重複は除去）"""
+    merged = {k: "" for k in SCALAR_KEYS}
+    for k in LIST_KEYS:
+        merged[k] = []
+    merged["sections"] = []
+    merged["bant"] = {k: "" for k in BANT_KEYS}
+
+    seen = {k: set() for k in LIST_KEYS}
+    sections_by_title = {}
+    bant_values = {k: [] for k in BANT_KEYS}
+
+    for part in parts:
+        if not isinstance(part, dict):
+            continue
+        for k in SCALAR_KEYS:
+            if not merged[k] and part.get(k):
+                merged[k] = part[k]
+        for k in LIST_KEYS:
+            _merge_list(merged[k], seen[k], part.get(k))
+
+        for s in part.get("sections") or []:
+            if not isinstance(s, dict):
+                continue
+            key = _dedupe_key(s.get("title") or "")
+            entry = sections_by_title.get(key) if key else None
+            if entry is None:
+                entry = ({"title": s.get("title") or "", "bullets": [], "notes": []}, set(), set())
+                merged["sections"].append(entry[0])
+                if key:
+                    sections_by_title[key] = entry
+            _merge_list(entry[0]["bullets"], entry[1], s.get("bullets"))
+            _merge_list(entry[0]["notes"], entry[2], s.get("notes"))
+
+        bant = part.get("bant") or {}
+        if isinstance(bant, dict):
+            for k in BANT_KEYS:
+                v = bant.get(k)
+                if isinstance(v, str) and v.strip():
+                    _merge_list(bant_values[k], set(_dedupe_key(x) for x in bant_values[k]), [v])
+
+    for k in BANT_KEYS:
+        merged["bant"][k] = " / ".join(bant_values[k])
+    # 元のスキーマと同じキー順で返す
+    order = ("company_name", "meeting_date", "title", "agenda", "sections",
+             "challenges", "needs", "next_actions", "bant", "summary")
+    return {k: merged[k] for k in order}
@@ -0,0 +1,161 @@
+"""
+解析結果の短縮スキーマ（LLM の出力トークンを減らす応答モード）
+
+LLM には2文字のキーで JSON を返させ（json_schema による構造化出力）、
+受け取った応答を validate で検査してから expand で従来の形（company_name, sections, ...）に戻す。
+スライド計画・描画は従来の形だけを扱うので、このモジュールの外は変わらない。
+
+  data = json.loads(content)
+  errors = validate(data)
+  parsed = expand(data)
+"""
+
+SCHEMA_VERSION = "1"
+
+# 短縮キー → 従来のキー
+TOP_KEYS = {
+    "co": "company_name",
+    "dt": "meeting_date",
+    "ti": "title",
+    "ag": "agenda",
+    "se": "sections",
+    "ch": "challenges",
+    "ne": "needs",
+    "na": "next_actions",
+    "ba": "bant",
+    "su": "summary",
+}
+SECTION_KEYS = {"ti": "title", "bu": "bullets", "no": "notes"}
+BANT_KEYS = {"bu": "budget", "au": "authority", "ne": "need", "tl": "timeline"}
+
+_STRING = {"type": "string"}
+_STRINGS = {"type": "array", "items": _STRING}
+
+
+def _object(keys: dict, types: dict) -> dict:
+    # 構造化出力の strict モードでは全プロパティを required にし、追加のプロパティを禁止する
+    return {"type": "object", "properties": {k: types.get(k, _STRING) for k in keys},
+            "required": list(keys), "additionalProperties": False}
+
+
+SECTION_SCHEMA = _object(SECTION_KEYS, {"bu": _STRINGS, "no": _STRINGS})
+BANT_SCHEMA = _object(BANT_KEYS, {})
+RESPONSE_SCHEMA = _object(TOP_KEYS, {
+    "ag": _STRINGS, "se": {"type": "array", "items": SECTION_SCHEMA}, "ch": _STRINGS, "ne": _STRINGS,
+    "na": _STRINGS, "ba": BANT_SCHEMA, "su": _STRINGS,
+})
+
+
+def _renamed(schema: dict, names: dict) -> dict:
+    """短縮キーのスキーマを従来のキーに読み替える"""
+    out = dict(schema)
+    if schema["type"] == "array":
+        out["items"] = _renamed(schema["items"], SECTION_KEYS)
+    elif schema["type"] == "object":
+        nested = {"se": SECTION_KEYS, "ba": BANT_KEYS}
+        out["properties"] = {names[k]: _renamed(v, nested.get(k, {})) for k, v in schema["properties"].items()}
+        out["required"] = [names[k] for k in schema["required"]]
+    return out
+
+
+# 従来の形（verbose モードの応答）のスキーマ。ベンチマークで両モードを同じ基準で検査する
+VERBOSE_SCHEMA = _renamed(RESPONSE_SCHEMA, TOP_KEYS)
+
+# chat.completions.create の response_format
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "meeting_minutes", "strict": True, "schema": RESPONSE_SCHEMA},
+}
+
+# プロンプトに載せるスキーマの説明
+SCHEMA_PROMPT = """{
+  "co": "会社名",
+  "dt": "打ち合わせ日",
+  "ti": "タイトル",
+  "ag": ["アジェンダ"],
+  "se": [{"ti": "セクション名", "bu": ["箇条書き"], "no": ["補足"]}],
+  "ch": ["課題"],
+  "ne": ["ニーズ"],
+  "na": ["ネクストアクション"],
+  "ba": {"bu": "予算", "au": "決裁者", "ne": "必要性", "tl": "導入時期"},
+  "su": ["まとめ"]
+}"""
+
+
+# ===== 検査 =====
+def validate(value, schema: dict = RESPONSE_SCHEMA, path: str = "$", partial: bool = False) -> list:
+    """
+    RESPONSE_SCHEMA（object / array / string の範囲）に合わない箇所の一覧。空なら適合
+    partial=True ならキーが欠けていてもよい（あるキーの型だけを検査する）
+    """
+    kind = schema["type"]
+    if kind == "string":
+        return [] if isinstance(value, str) else [f"{path}: string ではありません"]
+    if kind == "array":
+        if not isinstance(value, list):
+            return [f"{path}: array ではありません"]
+        errors = []
+        for i, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]", partial))
+        return errors
+    if not isinstance(value, dict):
+        return [f"{path}: object ではありません"]
+    props = schema["properties"]
+    errors = [] if partial else [f"{path}.{k}: ありません" for k in schema["required"] if k not in value]
+    for k, v in value.items():
+        if k in props:
+            errors.extend(validate(v, props[k], f"{path}.{k}", partial))
+        elif schema.get("additionalProperties") is False:
+            errors.append(f"{path}.{k}: スキーマにないキーです")
+    return errors
+
+
+# ===== 変換 =====
+def _text(v) -> str:
+    return v if isinstance(v, str) else ("" if v is None else str(v))
+
+
+def _texts(v) -> list:
+    return [_text(x) for x in v if x is not None] if isinstance(v, list) else []
+
+
+def expand_section(s) -> dict:
+    s = s if isinstance(s, dict) else {}
+    return {"title": _text(s.get("ti")), "bullets": _texts(s.get("bu")), "notes": _texts(s.get("no"))}
+
+
+def expand_field(key: str, value) -> tuple:
+    """トップレベルの短縮キーと値 → (従来のキー, 従来の形の値)。未知のキーはそのまま返す"""
+    name = TOP_KEYS.get(key)
+    if name is None:
+        return key, value
+    if name == "sections":
+        return name, [expand_section(s) for s in value] if isinstance(value, list) else []
+    if name == "bant":
+        value = value if isinstance(value, dict) else {}
+        return name, {long: _text(value.get(short)) for short, long in BANT_KEYS.items()}
+    if RESPONSE_SCHEMA["properties"][key]["type"] == "array":
+        return name, _texts(value)
+    return name, _text(value)
+
+
+def expand(data: dict) -> dict:
+    """短縮キーの応答 → 従来の形の解析結果（欠けている項目は空で補う）"""
+    data = data if isinstance(data, dict) else {}
+    return dict(expand_field(k, data.get(k)) for k in TOP_KEYS)
+
+
+def compact(parsed: dict) -> dict:
+    """従来の形 → 短縮キー（expand の逆。フィクスチャの作成などに使う）"""
+    out = {}
+    for short, name in TOP_KEYS.items():
+        value = parsed.get(name)
+        if name == "sections":
+            value = [{k: s.get(v, [] if k != "ti" else "") for k, v in SECTION_KEYS.items()}
+                     for s in value or []]
+        elif name == "bant":
+            value = {k: (value or {}).get(v, "") for k, v in BANT_KEYS.items()}
+        elif value is None:
+            value = [] if RESPONSE_SCHEMA["properties"][short]["type"] == "array" else ""
+        out[short] = value
+    return out
@@ -0,0 +1,221 @@
+"""
+スライド仕様（layout_plan）→ PPTX の描画
+
+python-pptx（と lxml）に依存する処理はこのモジュールにまとめている。
+読み込みに時間がかかるため、app は最初に描画するとき（または warm_up）に読み込む。
+"""
+from pptx.util import Inches, Pt
+from pptx.enum.text import PP_ALIGN
+from pptx.enum.shapes import MSO_SHAPE
+from pptx.dml.color import RGBColor
+
+import palette
+from layout_plan import KEY_MESSAGE_BOX, KEY_MESSAGE_SIZE, PARAGRAPH_SPACE_PT, SlidePlanner
+from metrics import BUILDER_SECONDS, span
+from styles import StyleRegistry
+
+# 配色は palette で定義する（プレビューと共通）
+BACKGROUND_RGB = RGBColor(*palette.BACKGROUND)
+PRIMARY_RGB = RGBColor(*palette.PRIMARY)
+ACCENT_RGB = RGBColor(*palette.ACCENT)
+TEXT_RGB = RGBColor(*palette.TEXT)
+SUBTEXT_RGB = RGBColor(*palette.SUBTEXT)
+
+JP_FONTS = ["Yu Gothic UI", "Yu Gothic", "Meiryo", "MS PGothic", "Segoe UI"]
+
+# 日本語フォント優先。書式は事前生成した XML を run に差し込む
+TEXT_STYLES = StyleRegistry(JP_FONTS[0])
+
+
+def set_font(run, size_pt=24, bold=False, color=TEXT_RGB, align_left=True):
+    if run is None:
+        return
+    TEXT_STYLES.stamp_run(run, size_pt, bold, color)
+
+
+def left_align(paragraph):
+    TEXT_STYLES.stamp_paragraph(paragraph, alignment=PP_ALIGN.LEFT)
+
+
+class DeckBuilder:
+    """
+    スライド仕様（layout_plan）→ PPTX のスライド組み立て
+
+    変更点（okunote の 9つのコツを反映）:
+    - ワンスライド・ワンメッセージ原則の適用
+    - 箇条は最大6件に制限、長い箇条は短縮して別スライド化
+    - 視線を意識して重要な要素を上へ配置
+    - 色の役割（背景・文字・メイン・アクセント）を厳格化
+    - 左揃えの徹底、行間・余白の調整
+
+    スライドの分割・配置の判断は layout_plan で行い、ここでは仕様どおりに図形を置く。
+    add_header → add_section（セクションごと）→ add_footer の順に呼ぶか、emit_all で計画をまとめて描画する。
+    ストリーミング解析では、各部分が届いた時点で呼び出せる。
+    """
+
+    def __init__(self, pool, pooled: bool = True):
+        with span("template_load"):
+            self.prs = pool.new_presentation() if pooled else pool.clone()
+        self.planner = SlidePlanner()
+        self.specs = []  # 描画したスライド仕様（再生成時の差分に使う）
+
+    @property
+    def title_done(self) -> bool:
+        return self.planner.title_done
+
+    @property
+    def slide_count(self) -> int:
+        return len(self.prs.slides)
+
+    def get_layout(self, index_fallback=1):
+        try:
+            return self.prs.slide_layouts[index_fallback]
+        except Exception:
+            return self.prs.slide_layouts[0]
+
+    # ===== 描画 =====
+    def emit(self, spec: dict):
+        """スライド仕様1枚分を描画する"""
+        with span(spec["source"], BUILDER_SECONDS, "builder"):
+            self._emitters[spec["kind"]](self, spec)
+        self.specs.append(spec)
+
+    def emit_all(self, plan: list):
+        for spec in plan:
+            self.emit(spec)
+
+    def emit_title(self, spec: dict):
+        prs = self.prs
+        title, subtitle = spec["title"], spec["subtitle"]
+        slide = prs.slides.add_slide(self.get_layout(0))
+        # タイトルの背景に淡いアクセント矩形を置き、タイトルを上部に寄せる（視線を上へ）
+        try:
+            # タイトル背景
+            slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, Inches(0), Inches(0), prs.slide_width, Inches(1.2)).fill.solid()
+            rect = slide.shapes[-1]
+            rect.fill.fore_color.rgb = ACCENT_RGB
+            rect.line.fill.background()
+            # 透明度はpptxで直接制御しにくいため薄い色を使う
+        except Exception:
+            pass
+
+        if slide.shapes.title:
+            slide.shapes.title.text = title
+            t = slide.shapes.title.text_frame.paragraphs[0]
+            if t.runs:
+                set_font(t.runs[0], 40, True, PRIMARY_RGB)
+            left_align(t)
+
+        # 副題
+        try:
+            if len(slide.placeholders) > 1:
+                ph = slide.placeholders[1]
+                ph.text = subtitle
+                p = ph.text_frame.paragraphs[0]
+                if p.runs:
+                    set_font(p.runs[0], 18, False, SUBTEXT_RGB)
+                left_align(p)
+        except (KeyError, IndexError):
+            if subtitle:
+                textbox = slide.shapes.add_textbox(Inches(0.6), Inches(1.1), Inches(9), Inches(0.6))
+                textbox.text = subtitle
+                p = textbox.text_frame.paragraphs[0]
+                if p.runs:
+                    set_font(p.runs[0], 18, False, SUBTEXT_RGB)
+                left_align(p)
+
+    def emit_divider(self, spec: dict):
+        prs = self.prs
+        slide = prs.slides.add_slide(self.get_layout(5 if len(prs.slide_layouts) > 5 else 1))
+        if slide.shapes.title:
+            slide.shapes.title.text = spec["title"]
+            t = slide.shapes.title.text_frame.paragraphs[0]
+            if t.runs:
+                set_font(t.runs[0], 36, True, PRIMARY_RGB)
+            left_align(t)
+
+    def emit_titled(self, spec: dict):
+        slide = self.add_titled_slide(spec["title"], spec["title_size"])
+        if spec["message"] is not None:
+            self.promote_key_message(slide, spec["message"], spec["message_size"])
+        for block in spec["blocks"]:
+            self.add_bullets_block(self.ensure_textbox(slide, *block["box"]), block["items"],
+                                   block["size"], block["bullet"])
+
+    def emit_bant(self, spec: dict):
+        slide = self.add_titled_slide(spec["title"])
+        box = self.ensure_textbox(slide, 0.6, 1.9, 9.0, 5.0)
+        tf = box.text_frame
+        tf.clear()
+        for i, (k, v) in enumerate(spec["rows"]):
+            p = tf.add_paragraph() if i > 0 else tf.paragraphs[0]
+            p.text = k
+            if p.runs: set_font(p.runs[0], 18, True, PRIMARY_RGB)
+            left_align(p)
+            p.line_spacing = 1.1
+            p2 = tf.add_paragraph()
+            p2.text = v
+            if p2.runs: set_font(p2.runs[0], 18, False, TEXT_RGB)
+            p2.space_after = Pt(8)
+
+    _emitters = {"title": emit_title, "divider": emit_divider, "titled": emit_titled, "bant": emit_bant}
+
+    # ===== 図形 =====
+    def ensure_textbox(self, slide, left, top, width, height):
+        return slide.shapes.add_textbox(Inches(left), Inches(top), Inches(width), Inches(height))
+
+    def add_bullets_block(self, shape, items, font_size=20, bullet_char="•"):
+        # font_size は計画時に箱へ収まるよう決めたもの（折り返しは PowerPoint に任せる）
+        tf = shape.text_frame
+        tf.clear()
+        tf.word_wrap = True
+        if not items:
+            return
+        # 最初の段落は見出し扱いにしない（箇条のみにする）
+        for i, it in enumerate(items):
+            if i == 0:
+                tf.text = f"{bullet_char} {it}"
+                p = tf.paragraphs[0]
+            else:
+                p = tf.add_paragraph()
+                p.text = f"{bullet_char} {it}"
+            # 左揃え・行間・段落後の余白
+            TEXT_STYLES.stamp_paragraph(p, level=0, alignment=PP_ALIGN.LEFT, line_spacing=1.2,
+                                        space_after=Pt(PARAGRAPH_SPACE_PT))
+            if p.runs:
+                set_font(p.runs[0], font_size, False, TEXT_RGB)
+
+    def promote_key_message(self, slide, message: str, size_pt: int = KEY_MESSAGE_SIZE):
+        """重要メッセージをスライド上部に大きく表示する（ワンスライド・ワンメッセージ）"""
+        box = self.ensure_textbox(slide, *KEY_MESSAGE_BOX)
+        tf = box.text_frame
+        tf.clear()
+        tf.word_wrap = True
+        tf.text = message
+        p = tf.paragraphs[0]
+        if p.runs:
+            set_font(p.runs[0], size_pt, True, PRIMARY_RGB)
+        left_align(p)
+
+    def add_titled_slide(self, title: str, size_pt: int = 30):
+        """レイアウト1のスライドを追加し、タイトルを設定して返す"""
+        slide = self.prs.slides.add_slide(self.get_layout(1))
+        if slide.shapes.title:
+            slide.shapes.title.text = title
+            t = slide.shapes.title.text_frame.paragraphs[0]
+            if t.runs:
+                set_font(t.runs[0], size_pt, True, PRIMARY_RGB)
+            left_align(t)
+        return slide
+
+    # ===== 実装：スライド生成フロー =====
+    def add_header(self, parsed: dict):
+        """タイトル・アジェンダ（まだ追加していないものだけ）"""
+        self.emit_all(self.planner.header(parsed))
+
+    def add_section(self, s: dict):
+        self.emit_all(self.planner.section(s))
+
+    def add_footer(self, parsed: dict):
+        # BANT／課題・ニーズ／ネクストアクション／まとめ
+        self.emit_all(self.planner.footer(parsed))
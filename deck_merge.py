@@ -0,0 +1,283 @@
+"""
+PPTX パッケージの結合
+
+同じテンプレートから作った複数のデッキ（シャード）を ZIP のパート単位で1つにつなげる。
+スライドの XML は解析し直さずにそのままコピーし、presentation.xml のスライド一覧・
+リレーションシップ・[Content_Types].xml だけを組み直す。
+レイアウト・マスター・テーマはテンプレート由来で全シャード共通なので先頭シャードのものを使い、
+スライドが参照する画像などのメディアは内容のハッシュで重複を除く。
+番号の振り方は python-pptx と同じなので、1プロセスで順に作った場合と同じパート構成になる。
+"""
+import hashlib
+import io
+import posixpath
+import re
+import zipfile
+
+from lxml import etree
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.oxml import CT_Relationships, CT_Types, serialize_part_xml
+from pptx.oxml.ns import qn
+
+_NS_CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+_NS_PR = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# スライドから参照されてよいパート（これ以外を含むシャードは結合しない）
+_SHARED_RELTYPES = (RT.SLIDE_LAYOUT,)
+_MEDIA_RELTYPES = (RT.IMAGE, RT.MEDIA, RT.VIDEO, RT.AUDIO)
+
+
+class MergeError(ValueError):
+    """結合できない構成のシャード（呼び出し側は1プロセスでの生成に切り替える）"""
+
+
+def _rels_name(partname: str) -> str:
+    d, base = posixpath.split(partname)
+    return posixpath.join(d, "_rels", base + ".rels")
+
+
+def _resolve(source: str, target: str) -> str:
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source), target)).lstrip("/")
+
+
+def _relative(source: str, target: str) -> str:
+    return posixpath.relpath(target, posixpath.dirname(source))
+
+
+def _read_rels(zf: zipfile.ZipFile, partname: str) -> list:
+    """[(rId, reltype, target, is_external)]（ファイル内の順）"""
+    try:
+        root = etree.fromstring(zf.read(_rels_name(partname)))
+    except KeyError:
+        return []
+    return [(r.get("Id"), r.get("Type"), r.get("Target"), r.get("TargetMode") == "External")
+            for r in root.iter(f"{{{_NS_PR}}}Relationship")]
+
+
+def _rels_xml(rels: list) -> bytes:
+    # python-pptx と同じく rId の文字列順に並べる
+    elm = CT_Relationships.new()
+    for rId, reltype, target, is_external in sorted(rels):
+        elm.add_rel(rId, reltype, target, is_external)
+    return elm.xml
+
+
+def _number(s: str, prefix: str) -> int:
+    m = re.fullmatch(re.escape(prefix) + r"(\d+)", s or "")
+    return int(m.group(1)) if m else 0
+
+
+class _Shard:
+    def __init__(self, blob):
+        self.zf = zipfile.ZipFile(blob if hasattr(blob, "read") else io.BytesIO(blob))
+        self.names = self.zf.namelist()
+        self.presentation = next(_resolve("/", t) for _, rt, t, _ in _read_rels(self.zf, "")
+                                 if rt == RT.OFFICE_DOCUMENT)
+        self.presentation_rels = _read_rels(self.zf, self.presentation)
+        self.content_types = etree.fromstring(self.zf.read("[Content_Types].xml"))
+        self._slides = None
+
+    def read(self, name: str) -> bytes:
+        return self.zf.read(name)
+
+    def slides(self) -> list:
+        """スライドのパート名（presentation.xml の並び順）"""
+        if self._slides is None:
+            targets = {rId: _resolve(self.presentation, t) for rId, rt, t, ext in self.presentation_rels
+                       if rt == RT.SLIDE and not ext}
+            root = etree.fromstring(self.read(self.presentation))
+            lst = root.find(qn("p:sldIdLst"))
+            self._slides = [] if lst is None else [targets[s.get(qn("r:id"))] for s in lst]
+        return self._slides
+
+    def content_type(self, name: str) -> str:
+        for o in self.content_types.iter(f"{{{_NS_CT}}}Override"):
+            if o.get("PartName") == "/" + name:
+                return o.get("ContentType")
+        ext = name.rsplit(".", 1)[-1].lower()
+        for d in self.content_types.iter(f"{{{_NS_CT}}}Default"):
+            if d.get("Extension").lower() == ext:
+                return d.get("ContentType")
+        raise MergeError(f"content type not found: {name}")
+
+
+class DeckMerger:
+    """
+    先頭シャードを土台に、後続シャードのスライドを末尾へ追加していく
+
+      merger = DeckMerger(shard0)
+      merger.append(shard1, skip=n)   # skip: テンプレート由来の先頭スライド数
+      merger.write(out)
+
+    同じパッケージから何度かに分けてスライドを取り出す場合は open_package で1回だけ開き、
+    append(pkg, skip, indices=[...]) で取り出すスライドを指定する。
+
+    out を渡すとストリーミング書き出しになり、追加したスライドはその場で out へ書き込まれ
+    メモリに残らない（最後に close() で presentation.xml などを書いて閉じる）。
+    out はシークできないストリームでもよい。
+    """
+
+    def __init__(self, base, out=None):
+        self.base = _Shard(base)
+        self.pres_name = self.base.presentation
+        self.pres_xml = etree.fromstring(self.base.read(self.pres_name))
+        self.sld_lst = self.pres_xml.find(qn("p:sldIdLst"))
+        if self.sld_lst is None:
+            raise MergeError("presentation has no sldIdLst")
+        self.pres_rels = list(self.base.presentation_rels)
+        self.defaults = {d.get("Extension"): d.get("ContentType")
+                         for d in self.base.content_types.iter(f"{{{_NS_CT}}}Default")}
+        self.overrides = {o.get("PartName"): o.get("ContentType")
+                          for o in self.base.content_types.iter(f"{{{_NS_CT}}}Override")}
+        self.added = []  # [(name, bytes)]（ストリーミング時は使わない）
+        self.names = set(self.base.names)
+        self.media = {}
+        for name in self.base.names:
+            if name.startswith("ppt/media/"):
+                self.media[hashlib.sha256(self.base.read(name)).hexdigest()] = name
+        self._shared_checked = {}
+        self.slide_count = len(self.sld_lst)
+        self._next_slide = 1 + max([_number(posixpath.basename(n)[:-4], "slide")
+                                    for n in self.names if n.startswith("ppt/slides/slide") and n.endswith(".xml")] or [0])
+        self._next_rid = 1 + max([_number(r[0], "rId") for r in self.pres_rels] or [0])
+        self._next_id = max([int(s.get("id")) for s in self.sld_lst] or [255]) + 1
+        self._zf = None
+        if out is not None:
+            self._zf = zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED)
+            # presentation.xml と [Content_Types].xml 以外のテンプレート由来のパートは先に書いてしまう
+            for name in self.base.names:
+                if name not in self._final_names():
+                    self._zf.writestr(name, self.base.read(name))
+
+    def _final_names(self) -> tuple:
+        return ("[Content_Types].xml", self.pres_name, _rels_name(self.pres_name))
+
+    def _emit(self, name: str, blob: bytes):
+        if self._zf is not None:
+            self._zf.writestr(name, blob)
+        else:
+            self.added.append((name, blob))
+
+    def _check_shared(self, shard: _Shard, name: str):
+        ok = self._shared_checked.get(name)
+        if ok is None:
+            ok = name in self.names and self.base.read(name) == shard.read(name)
+            self._shared_checked[name] = ok
+        if not ok:
+            raise MergeError(f"shared part differs between shards: {name}")
+
+    def _add_media(self, shard: _Shard, name: str) -> str:
+        blob = shard.read(name)
+        digest = hashlib.sha256(blob).hexdigest()
+        existing = self.media.get(digest)
+        if existing is not None:
+            return existing
+        base, ext = posixpath.splitext(posixpath.basename(name))
+        stem = re.sub(r"\d+$", "", base) or "media"
+        n = 1
+        while f"ppt/media/{stem}{n}{ext}" in self.names:
+            n += 1
+        new_name = f"ppt/media/{stem}{n}{ext}"
+        if ext[1:].lower() not in {k.lower() for k in self.defaults}:
+            self.overrides["/" + new_name] = shard.content_type(name)
+        self.names.add(new_name)
+        self._emit(new_name, blob)
+        self.media[digest] = new_name
+        return new_name
+
+    def append(self, blob, skip: int = 0, indices: list = None) -> int:
+        """
+        シャードのスライド（先頭 skip 枚を除く）を末尾に追加し、追加した枚数を返す
+        indices を渡すと、先頭 skip 枚を除いた中のその番号のスライドだけをその順に追加する。
+        """
+        shard = blob if isinstance(blob, _Shard) else _Shard(blob)
+        slides = shard.slides()[skip:]
+        if indices is not None:
+            slides = [slides[i] for i in indices]
+        for src in slides:
+            name = f"ppt/slides/slide{self._next_slide}.xml"
+            self._next_slide += 1
+            rels = []
+            changed = False
+            for rId, reltype, target, is_external in _read_rels(shard.zf, src):
+                if is_external:
+                    rels.append((rId, reltype, target, True))
+                    continue
+                target_name = _resolve(src, target)
+                if reltype in _SHARED_RELTYPES:
+                    self._check_shared(shard, target_name)
+                elif reltype in _MEDIA_RELTYPES:
+                    new_target = self._add_media(shard, target_name)
+                    if new_target != target_name:
+                        target, changed = _relative(name, new_target), True
+                else:
+                    raise MergeError(f"unsupported slide relationship: {reltype}")
+                rels.append((rId, reltype, target, False))
+
+            self._emit(name, shard.read(src))
+            if rels:
+                self._emit(_rels_name(name), _rels_xml(rels) if changed else shard.read(_rels_name(src)))
+            self.overrides["/" + name] = shard.content_type(src)
+            self.names.add(name)
+
+            rId = f"rId{self._next_rid}"
+            self._next_rid += 1
+            self.pres_rels.append((rId, RT.SLIDE, _relative(self.pres_name, name), False))
+            sld = etree.SubElement(self.sld_lst, qn("p:sldId"))
+            sld.set("id", str(self._next_id))
+            sld.set(qn("r:id"), rId)
+            self._next_id += 1
+        self.slide_count += len(slides)
+        return len(slides)
+
+    def _content_types_xml(self) -> bytes:
+        types = CT_Types.new()
+        for ext, ct in sorted(self.defaults.items()):
+            types.add_default(ext, ct)
+        for partname, ct in sorted(self.overrides.items()):
+            types.add_override(partname, ct)
+        return serialize_part_xml(types)
+
+    def _replaced(self) -> dict:
+        return {
+            self.pres_name: serialize_part_xml(self.pres_xml),
+            _rels_name(self.pres_name): _rels_xml(self.pres_rels),
+        }
+
+    def close(self):
+        """ストリーミング書き出しを終える（スライド一覧などを書いて ZIP を閉じる）"""
+        zf, self._zf = self._zf, None
+        for name, blob in self._replaced().items():
+            zf.writestr(name, blob)
+        zf.writestr("[Content_Types].xml", self._content_types_xml())
+        zf.close()
+
+    def write(self, out):
+        """結合したパッケージを out（パスまたは書き込み可能なファイル）へ書き出す"""
+        if self._zf is not None:
+            raise RuntimeError("streaming merger: use close()")
+        replaced = self._replaced()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("[Content_Types].xml", self._content_types_xml())
+            for name in self.base.names:
+                if name == "[Content_Types].xml":
+                    continue
+                zf.writestr(name, replaced.get(name) or self.base.read(name))
+            for name, blob in self.added:
+                zf.writestr(name, blob)
+
+
+def open_package(blob) -> _Shard:
+    """PPTX（バイト列またはファイル）を DeckMerger.append に繰り返し渡せる形で開く"""
+    return _Shard(blob)
+
+
+def merge_decks(shards: list, out, skip: int = 0) -> int:
+    """shards（PPTX のバイト列）を順につなげて out へ書き出し、スライド数を返す"""
+    if not shards:
+        raise MergeError("no shards")
+    merger = DeckMerger(shards[0])
+    for blob in shards[1:]:
+        merger.append(blob, skip)
+    merger.write(out)
+    return merger.slide_count
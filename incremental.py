@@ -0,0 +1,74 @@
+"""
+編集後の再生成（変わったスライドだけを描き直す）
+
+生成時に解析結果とスライドごとのキー（スライド仕様のハッシュ）をデッキの横に保存しておく。
+編集された解析結果から作った計画と比べ、仕様が同じスライドは前回の PPTX のパートをそのまま使い、
+変わったスライドだけをまとめて描画して DeckMerger でつなげる。
+スライドの XML は仕様だけで決まる（何枚目か・他のスライドには依存しない）ので、
+すべて描き直した場合と同じパッケージになる。
+"""
+import hashlib
+import json
+
+SIDECAR_VERSION = "1"
+
+# 描画結果に影響しない項目（キーに含めない）
+_UNRENDERED_KEYS = ("section", "source")
+
+
+def slide_key(spec: dict) -> str:
+    body = {k: v for k, v in spec.items() if k not in _UNRENDERED_KEYS}
+    canonical = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def plan_keys(plan: list) -> list:
+    return [slide_key(spec) for spec in plan]
+
+
+def changed_sections(old: dict, new: dict) -> list:
+    """セクションごとに比べ、変わった（追加・削除を含む）セクションの番号を返す"""
+    a = old.get("sections") or []
+    b = new.get("sections") or []
+    return [i for i in range(max(len(a), len(b))) if i >= len(a) or i >= len(b) or a[i] != b[i]]
+
+
+def reuse_slides(old_keys: list, plan: list) -> list:
+    """plan の各スライドについて、仕様が同じ前回のスライドの番号（なければ None）"""
+    first = {}
+    for i, k in enumerate(old_keys):
+        first.setdefault(k, i)
+    return [first.get(slide_key(spec)) for spec in plan]
+
+
+def assemble_deck(base, previous, previous_skip: int, plan: list, reuse: list, render_shard):
+    """
+    テンプレートだけのパッケージ base に、plan の順でスライドを追加した DeckMerger を返す
+
+    previous: 前回の PPTX（previous_skip はそのテンプレート由来の先頭スライド数）
+    reuse: reuse_slides の結果。None のスライドは render_shard(specs) -> (PPTX, テンプレート由来の枚数)
+    でまとめて1回で描画する。
+    """
+    from deck_merge import DeckMerger, open_package  # python-pptx を使うので必要になってから読み込む
+
+    merger = DeckMerger(base)
+    todo = [spec for spec, r in zip(plan, reuse) if r is None]
+    fresh = None
+    if todo:
+        blob, skip = render_shard(todo)
+        fresh = (open_package(blob), skip)
+    old = (open_package(previous), previous_skip) if len(todo) < len(plan) else None
+
+    # 同じパッケージから続けて取り出すスライドはまとめて追加する
+    runs = []
+    k = 0
+    for r in reuse:
+        source, index = (fresh, k) if r is None else (old, r)
+        k += r is None
+        if runs and runs[-1][0] is source:
+            runs[-1][1].append(index)
+        else:
+            runs.append((source, [index]))
+    for (pkg, skip), indices in runs:
+        merger.append(pkg, skip, indices)
+    return merger
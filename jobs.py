@@ -0,0 +1,156 @@
+"""
+バックグラウンドジョブ実行
+
+議事録解析〜スライド生成のような長時間処理を Web ワーカーから切り離し、
+上限付きのスレッドプールで実行する。ジョブの状態はプロセス内に保持し、
+/jobs/<id> からポーリングで参照する。
+同じ key のジョブが未完了なら新しく投入せずにそのジョブを返す（二重送信・同時送信を1件にまとめる）。
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))            # 同時実行ジョブ数
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "32"))   # 待ち行列の上限
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))  # 完了ジョブの保持時間
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+
+
+class QueueFullError(RuntimeError):
+    """待ち行列が上限に達しているときに送出する"""
+
+
+class Job:
+    def __init__(self, kind: str = "generate", key: str = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.status = STATUS_QUEUED
+        self.stage = ""
+        self.result = None
+        self.error = None
+        self.parsed = None  # 解析が終わったら解析結果（完了前のプレビューに使う）
+        self.events = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (STATUS_DONE, STATUS_ERROR)
+
+    def publish(self, stage: str, **data):
+        """進捗イベントを記録する（ポーリング側は events[since:] を読む）"""
+        with self._lock:
+            self.stage = stage
+            self.events.append({"stage": stage, "t": round(time.time() - self.created_at, 3), **data})
+
+    def to_dict(self, since: int = 0) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage,
+                "error": self.error,
+                "result": self.result if self.status == STATUS_DONE else None,
+                "previewable": self.parsed is not None,
+                "events": self.events[since:],
+                "event_count": len(self.events),
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobQueue:
+    """
+    上限付きスレッドプールでジョブを実行する。
+    fn(job, *args, **kwargs) の戻り値が job.result、ValueError のメッセージが job.error になる。
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING,
+                 ttl_seconds: int = JOB_TTL_SECONDS):
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._inflight = {}  # key -> 未完了のジョブ
+        self._lock = threading.Lock()
+        self.coalesced = 0   # 実行中のジョブにまとめた投入の数
+
+    def submit(self, fn, *args, kind: str = "generate", key: str = None, **kwargs) -> Job:
+        """key（入力とオプションのハッシュ）が同じ未完了のジョブがあれば、それを返す"""
+        self._purge()
+        with self._lock:
+            running = self._inflight.get(key) if key is not None else None
+            if running is not None and not running.finished:
+                self.coalesced += 1
+                return running
+            pending = sum(1 for j in self._jobs.values() if not j.finished)
+            if pending >= self.max_pending:
+                raise QueueFullError("現在混み合っています。しばらくしてから再度お試しください。")
+            job = Job(kind, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._inflight[key] = job
+        job.publish(STATUS_QUEUED)
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def pending_count(self) -> int:
+        """待ち・実行中のジョブ数"""
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if not j.finished)
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id: str, timeout: float = None):
+        """ジョブの完了を待つ（ベンチマーク・バッチ用）"""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.finished:
+                return job
+            if deadline is not None and time.time() > deadline:
+                return job
+            time.sleep(0.01)
+
+    def _run(self, job: Job, fn, args, kwargs):
+        job.status = STATUS_RUNNING
+        job.started_at = time.time()
+        try:
+            result = fn(job, *args, **kwargs)
+            job.result = result
+            job.status = STATUS_DONE
+            job.publish(STATUS_DONE)
+        except ValueError as e:
+            job.error = str(e)
+            job.status = STATUS_ERROR
+            job.publish(STATUS_ERROR)
+        except Exception as e:
+            print(f"[ERROR] Job {job.id} failed: {e}")
+            job.error = "処理中にエラーが発生しました。"
+            job.status = STATUS_ERROR
+            job.publish(STATUS_ERROR)
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if job.key is not None and self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [k for k, j in self._jobs.items() if j.finished and (j.finished_at or 0) < cutoff]
+            for k in expired:
+                del self._jobs[k]
@@ -0,0 +1,308 @@
+"""
+スライド構成の計画（PPTX を作らずにスライドの並びと中身を決める）
+
+解析結果（dict）を、1枚ごとのスライド仕様（JSON にできる dict）のリストに変換する。
+分割・2カラム化・個別スライド化などの判断はすべてここで行い、
+app.DeckBuilder は仕様どおりに図形を置くだけにする。
+
+スライド仕様:
+  {"kind": "title",   "title": str, "subtitle": str}
+  {"kind": "divider", "title": str}
+  {"kind": "titled",  "title": str, "title_size": int, "message": str | None, "message_size": int,
+   "message_lines": [str, ...], "blocks": [block, ...]}
+      block = {"box": [left, top, width, height]（インチ）, "items": [str, ...], "size": int, "bullet": str,
+               "lines": [[str, ...], ...]（箇条ごとの行。先頭行は行頭記号を含む）}
+  {"kind": "bant",    "title": str, "rows": [[label, value], ...]}
+いずれも "source"（どの部分から作られたか）を持ち、セクション由来のものは "section"（番号）も持つ。
+本文のフォントサイズと改行位置は fit_slides（text_fit）で箱に収まるように決める。
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from text_fit import fit_boxes, prefix_within, text_width
+
+# 設計ポリシー（okunote の 9つのコツを反映）
+MAX_BULLETS_PER_SLIDE = 6     # 1スライドあたりの箇条は極力6件以下
+MAX_CHARS_PER_BULLET = 45     # 箇条は短く（全角換算の文字数）
+ONE_MESSAGE_POLICY = True     # ワンスライド・ワンメッセージ
+
+PLAN_VERSION = "2"  # 計画ロジックを変えたら上げる（キャッシュの無効化）
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "64"))
+
+# 図形の位置（インチ）
+FULL_BOX = [0.6, 1.9, 9.0, 4.8]
+LEFT_BOX = [0.6, 1.9, 4.4, 4.8]
+RIGHT_BOX = [5.2, 1.9, 4.4, 4.8]
+KEY_MESSAGE_BOX = [0.6, 1.6, 9.0, 1.0]
+KEY_MESSAGE_SIZE = 22
+PARAGRAPH_SPACE_PT = 6  # 箇条の段落後の余白
+
+
+def normalize_text(s: str) -> str:
+    s = s or ""
+    s = s.replace('\u3000', ' ').strip()  # 全角スペース→半角
+    s = re.sub(r'[ \t]+', ' ', s)
+    return s
+
+
+def shorten_bullet(text: str, max_chars: int = MAX_CHARS_PER_BULLET) -> str:
+    # 長さは字幅で測る（半角は全角の半分程度に数える）
+    t = normalize_text(text)
+    limit = prefix_within(t, max_chars)
+    if limit == len(t):
+        return t
+    # 句点や読点、ダッシュで上手に省略
+    for token in ['。', '、', ' - ', ' – ', ' — ', ';', '：', ':']:
+        idx = t.find(token)
+        if 0 < idx <= limit:
+            return t[:idx].strip() + '…'
+    return t[:limit].rstrip() + '…'
+
+
+def _block(box, items, size=20, bullet="•") -> dict:
+    return {"box": list(box), "items": list(items), "size": size, "bullet": bullet}
+
+
+def _titled(source, title, message=None, blocks=(), title_size=30) -> dict:
+    return {"kind": "titled", "source": source, "title": title, "title_size": title_size,
+            "message": message, "message_size": KEY_MESSAGE_SIZE, "blocks": list(blocks)}
+
+
+# ===== 各部分の計画 =====
+def title_slide(title: str, subtitle: str = "") -> list:
+    return [{"kind": "title", "source": "title", "title": title, "subtitle": subtitle}]
+
+
+def section_divider(title: str) -> list:
+    return [{"kind": "divider", "source": "divider", "title": title}]
+
+
+def content_slides(title: str, bullets: list, notes: list) -> list:
+    # ワンスライド・ワンメッセージの適用:
+    # - bullets が 1 件で十分に要約されている場合はタイトル＋1行で完結
+    # - bullets が複数だが各々が短くて関連性が高い場合は 1 スライドに最大 MAX_BULLETS_PER_SLIDE
+    # - 長い箇条や1件ごとにメッセージ性が高い箇条は個別スライドへ分割
+    items = bullets or []
+    # 重要な要素をスライド上部へ
+    if len(items) == 1:
+        # 1つのメッセージを大きめに表示し、補足ノートを添える
+        blocks = []
+        if notes:
+            blocks.append(_block([0.6, 3.0, 9.0, 2.5], [shorten_bullet(n, max_chars=80) for n in notes], 16))
+        return [_titled("content", title, shorten_bullet(items[0], max_chars=80), blocks)]
+
+    # 分割対象（各箇条がそれぞれメッセージ）
+    # 判定: 箇条が短いが個別に伝える価値がある（例：箇条ごとに句点含む or 長さ>max）
+    separate_slides = []
+    remaining = []
+    for it in items:
+        clean = normalize_text(it)
+        # 個々の箇条が独立したメッセージと判断する条件
+        if text_width(clean) > MAX_CHARS_PER_BULLET * 0.9 or '\n' in clean:
+            separate_slides.append(clean)
+        else:
+            remaining.append(clean)
+
+    slides = []
+    # まず残りを1スライドにまとめる（ただし件数が多ければ分割）
+    chunks = [remaining[i:i+MAX_BULLETS_PER_SLIDE] for i in range(0, len(remaining), MAX_BULLETS_PER_SLIDE)]
+    for idx, chunk in enumerate(chunks):
+        slide_title = title if idx == 0 else f"{title}（続き）"
+        # 2カラムを検討（chunk 数が多ければ2カラム）
+        if len(chunk) >= 5:
+            half = (len(chunk) + 1) // 2
+            blocks = [_block(LEFT_BOX, [shorten_bullet(i) for i in chunk[:half]]),
+                      _block(RIGHT_BOX, [shorten_bullet(i) for i in chunk[half:]])]
+        else:
+            blocks = [_block(FULL_BOX, [shorten_bullet(i) for i in chunk])]
+        if notes and idx == 0:
+            blocks.append(_block([0.6, 6.8, 9.0, 1.0], [shorten_bullet(n, max_chars=80) for n in notes[:2]], 16))
+        slides.append(_titled("content", slide_title, None, blocks))
+
+    # separate_slides は1件ずつ強調
+    for msg in separate_slides:
+        slides.append(_titled("content", title, shorten_bullet(msg, max_chars=120)))
+    return slides
+
+
+def agenda_slide(items: list) -> list:
+    if not items:
+        return []
+    return [_titled("agenda", "アジェンダ", None, [_block(FULL_BOX, [shorten_bullet(i) for i in items], 20, "■")])]
+
+
+def bant_slide(bant: dict) -> list:
+    if not bant:
+        return []
+    if not any([bant.get(k) for k in ("budget", "authority", "need", "timeline")]):
+        return []
+    rows = [
+        ["Budget（予算）", bant.get("budget", "")],
+        ["Authority（決裁）", bant.get("authority", "")],
+        ["Need（ニーズ）", bant.get("need", "")],
+        ["Timeline（時期）", bant.get("timeline", "")],
+    ]
+    return [{"kind": "bant", "source": "bant", "title": "BANT（商談情報）",
+             "rows": [[k, f"{v or '—'}"] for k, v in rows]}]
+
+
+def challenges_needs_slide(challenges: list, needs: list) -> list:
+    if not (challenges or needs):
+        return []
+    return [_titled("challenges_needs", "課題とニーズ", None, [
+        _block(LEFT_BOX, [shorten_bullet(i) for i in challenges], 20),
+        _block(RIGHT_BOX, [shorten_bullet(i) for i in needs], 20),
+    ])]
+
+
+def next_actions_slides(items: list) -> list:
+    # ネクストアクションはワンスライド・ワンメッセージに沿って可能なら個別スライド化
+    return [_titled("next_actions", "ネクストアクション", shorten_bullet(it, max_chars=100)) for it in items or []]
+
+
+def summary_slide(items: list) -> list:
+    if not items:
+        return []
+    return [_titled("summary", "まとめ", None, [_block(FULL_BOX, [shorten_bullet(i) for i in items], 20, "●")])]
+
+
+def thanks_slide() -> list:
+    # 末尾に Thanks スライド
+    return [_titled("thanks", "ご清聴ありがとうございました", title_size=32)]
+
+
+# ===== 文字の収まり =====
+def fit_slides(slides: list) -> list:
+    """
+    titled スライドの本文（重要メッセージ・箇条）のフォントサイズと改行位置を決める
+    全スライド分をまとめて1回で計測し、仕様の size / lines を書き換える。
+    最小サイズでも収まらない場合は行を切り詰め、items / message も切り詰めた内容にする。
+    """
+    boxes, targets = [], []
+    for spec in slides:
+        if spec["kind"] != "titled":
+            continue
+        if spec["message"] is not None:
+            boxes.append({"texts": [spec["message"]], "width": KEY_MESSAGE_BOX[2], "height": KEY_MESSAGE_BOX[3],
+                          "size": spec["message_size"], "bold": True})
+            targets.append((spec, None))
+        for block in spec["blocks"]:
+            boxes.append({"texts": [f"{block['bullet']} {it}" for it in block["items"]],
+                          "width": block["box"][2], "height": block["box"][3],
+                          "size": block["size"], "space_after": PARAGRAPH_SPACE_PT})
+            targets.append((spec, block))
+    for (spec, block), (size, lines) in zip(targets, fit_boxes(boxes)):
+        if block is None:
+            spec["message_size"] = size
+            spec["message_lines"] = lines[0]
+            spec["message"] = "".join(lines[0])
+            continue
+        prefix = len(block["bullet"]) + 1
+        block["size"] = size
+        block["lines"] = lines
+        block["items"] = ["".join(para)[prefix:] for para in lines]
+    return slides
+
+
+class SlidePlanner:
+    """
+    ヘッダー（タイトル・アジェンダ）→ セクション → フッターの順に計画する
+    ストリーミング解析では、各部分が届いた時点で呼び出せる。
+    fit=False なら文字の収まりは計算しない（呼び出し側でまとめて fit_slides する）。
+    """
+
+    def __init__(self, fit: bool = True):
+        self.fit = fit
+        self.title_done = False
+        self.agenda_done = False
+        self.section_index = 0
+
+    def header(self, parsed: dict) -> list:
+        """タイトル・アジェンダ（まだ計画していないものだけ）"""
+        slides = []
+        if not self.title_done:
+            title = parsed.get("title") or "打ち合わせ要約"
+            company = parsed.get("company_name") or ""
+            date = parsed.get("meeting_date") or ""
+            subtitle = " / ".join([s for s in [company, f"{date} 実施" if date else ""] if s])
+            slides += title_slide(title, subtitle)
+            self.title_done = True
+        if not self.agenda_done and "agenda" in parsed:
+            slides += agenda_slide(parsed.get("agenda", []))
+            self.agenda_done = True
+        return self._fitted(slides)
+
+    def section(self, s: dict) -> list:
+        stitle = s.get("title") or ""
+        bullets = [shorten_bullet(b) for b in (s.get("bullets") or [])]
+        notes = s.get("notes") or []
+        slides = []
+        # セクション見出しスライド（大見出しに見える場合のみ）
+        if stitle and (len(bullets) == 0 and len(notes) == 0):
+            slides += section_divider(stitle)
+        # 通常コンテンツ
+        if bullets:
+            slides += content_slides(stitle or "セクション", bullets, notes)
+        elif notes:
+            slides += content_slides(stitle or "セクション", [], notes)
+        for spec in slides:
+            spec["section"] = self.section_index
+        self.section_index += 1
+        return self._fitted(slides)
+
+    def footer(self, parsed: dict) -> list:
+        # BANT／課題・ニーズ／ネクストアクション／まとめ
+        challenges = [shorten_bullet(x) for x in parsed.get("challenges", [])]
+        needs = [shorten_bullet(x) for x in parsed.get("needs", [])]
+        return self._fitted(bant_slide(parsed.get("bant", {}))
+                            + challenges_needs_slide(challenges, needs)
+                            + next_actions_slides(parsed.get("next_actions", []))
+                            + summary_slide(parsed.get("summary", []))
+                            + thanks_slide())
+
+    def _fitted(self, slides: list) -> list:
+        return fit_slides(slides) if self.fit else slides
+
+
+def plan_deck(parsed: dict) -> list:
+    """解析結果 → スライド仕様のリスト（文字の収まりはデッキ全体で1回だけ計算する）"""
+    planner = SlidePlanner(fit=False)
+    slides = planner.header(parsed)
+    for s in parsed.get("sections", []):
+        slides += planner.section(s)
+    return fit_slides(slides + planner.footer(parsed))
+
+
+def plan_key(parsed: dict) -> str:
+    canonical = json.dumps(parsed, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{PLAN_VERSION}\x00{canonical}".encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """解析結果ごとの計画を保持する LRU（返すリストは共有なので変更しないこと）"""
+
+    def __init__(self, max_entries: int = PLAN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_plan(self, parsed: dict) -> list:
+        if self.max_entries <= 0:
+            return plan_deck(parsed)
+        key = plan_key(parsed)
+        with self._lock:
+            plan = self._entries.get(key)
+            if plan is not None:
+                self._entries.move_to_end(key)
+                return plan
+        plan = plan_deck(parsed)
+        with self._lock:
+            self._entries[key] = plan
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return plan
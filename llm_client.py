@@ -0,0 +1,414 @@
+"""
+Azure OpenAI 呼び出しの共通レイヤー
+
+- 同期・非同期のクライアントで HTTP 接続プールの設定（httpx.Limits）を揃え、同時実行数を制限
+  （stream=True の応答は読み終わるか close するまで枠を使う）
+- 1分あたりのリクエスト数（RPM）・トークン数（TPM）をトークンバケットで制限
+- 429 / 5xx / 接続エラーはジッター付き指数バックオフで再試行（Retry-After を優先）
+- 失敗が続いたらサーキットブレーカーで一定時間すぐに失敗させる
+
+同期は LLMClient.create、非同期は LLMClient.acreate（chat.completions.create と同じ引数）。
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RPM = int(os.getenv("LLM_RPM", "0"))            # 0 は無制限
+LLM_TPM = int(os.getenv("LLM_TPM", "0"))            # 0 は無制限
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1500"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+LLM_RETRY_AFTER_MAX = float(os.getenv("LLM_RETRY_AFTER_MAX", "60"))  # Retry-After に従う上限
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "300"))
+LLM_POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", "20"))
+
+
+def retryable_errors() -> tuple:
+    """再試行する例外（openai は読み込みが重いので、最初のクライアント作成・エラー時に読み込む）"""
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+class CircuitOpenError(RuntimeError):
+    """サーキットブレーカーが開いている間の呼び出しで送出する"""
+
+
+class TokenBucket:
+    """1分あたり rate_per_minute 単位を補充するトークンバケット（rate 0 は無制限）"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount: float) -> float:
+        """amount を確保し、使えるようになるまでの待ち秒数を返す（残量は負になりうる）"""
+        if self.capacity <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, amount: float = 1.0):
+        wait = self._reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1.0):
+        wait = self._reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def adjust(self, delta: float):
+        """見積もりと実際の消費量の差を反映する"""
+        if self.capacity <= 0 or not delta:
+            return
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = LLM_CIRCUIT_FAILURES, reset_seconds: float = LLM_CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._half_open_trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._half_open_trial:
+                # 1件だけ試しに通す
+                self._half_open_trial = True
+                return
+        raise CircuitOpenError("AIサービスが一時的に利用できません。しばらくしてから再度お試しください。")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._half_open_trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._half_open_trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._half_open_trial = False
+
+    def record_retry(self):
+        """再試行する失敗。試しに通した1件なら開き直す（試しの枠を使ったままにしない）"""
+        with self._lock:
+            if self._half_open_trial:
+                self.opened_at = time.monotonic()
+                self._half_open_trial = False
+
+
+def _retry_after(e: Exception):
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def estimate_tokens(messages: list) -> int:
+    # 日本語は1文字≒1トークン、英数字は4文字≒1トークン程度として大まかに見積もる
+    total = 0
+    for m in messages or []:
+        text = m.get("content") or ""
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        total += (len(text) - ascii_chars) + ascii_chars // 4
+    return total
+
+
+class _ManagedStream:
+    """
+    stream=True の応答をラップする。読み終わるか close するまで同時実行の枠を保持し、
+    終わったら実際のトークン数（最後のチャンクの usage、なければ受け取った本文からの見積もり）で TPM を精算する
+    """
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self._usage = None
+        self._text = []
+        self._closed = False
+
+    def _observe(self, chunk):
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            self._usage = usage
+        for choice in getattr(chunk, "choices", None) or []:
+            content = getattr(getattr(choice, "delta", None), "content", None)
+            if content:
+                self._text.append(content)
+
+    def _finish(self):
+        self._closed = True
+        self._on_close(self._usage, "".join(self._text))
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                self._observe(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _ManagedAsyncStream(_ManagedStream):
+    """_ManagedStream の非同期版（async for / await close()）"""
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                self._observe(chunk)
+                yield chunk
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self._closed:
+            return
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                await close()
+        finally:
+            self._finish()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class LLMClient:
+    """
+    client（AzureOpenAI 互換）/ async_client_factory（AsyncAzureOpenAI を返す関数）をラップする。
+    同時実行数・レート制限・ブレーカーの状態はプロセス内で同期・非同期の呼び出しに共通。
+    """
+
+    def __init__(self, client, async_client_factory=None, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 rpm: int = LLM_RPM, tpm: int = LLM_TPM, max_retries: int = LLM_MAX_RETRIES,
+                 backoff_base: float = LLM_BACKOFF_BASE, backoff_max: float = LLM_BACKOFF_MAX,
+                 breaker: CircuitBreaker = None):
+        self.client = client
+        self._async_client_factory = async_client_factory
+        self._async_client = None
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_bucket = TokenBucket(rpm)
+        self.tokens_bucket = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failures": 0}
+
+    def _backoff(self, attempt: int, e: Exception) -> float:
+        # フルジッター付き指数バックオフ。Retry-After が指定されていればそれ以上待つ
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        hint = _retry_after(e)
+        if hint is not None:
+            delay = max(delay, min(hint, LLM_RETRY_AFTER_MAX))
+        return delay
+
+    def _estimate(self, kwargs: dict) -> int:
+        return estimate_tokens(kwargs.get("messages")) + int(kwargs.get("max_tokens") or LLM_EXPECTED_OUTPUT_TOKENS)
+
+    def _settle(self, resp, estimated: int):
+        usage = getattr(resp, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.tokens_bucket.adjust(usage.total_tokens - estimated)
+
+    def _settle_stream(self, kwargs: dict, estimated: int, usage, text: str):
+        if usage is not None and getattr(usage, "total_tokens", None):
+            actual = usage.total_tokens
+        else:
+            # usage が付かない API バージョンでは、入力と受け取った本文から見積もる
+            actual = estimate_tokens(kwargs.get("messages")) + estimate_tokens([{"content": text}])
+        self.tokens_bucket.adjust(actual - estimated)
+
+    def _on_error(self, e: Exception, attempt: int):
+        """再試行するなら待ち秒数、しないなら None を返す"""
+        retryable = retryable_errors()
+        if isinstance(e, retryable[0]):
+            self.stats["throttled"] += 1
+        if not isinstance(e, retryable):
+            # 400 などはリクエスト側の問題で、サービス自体は応答している
+            self.stats["failures"] += 1
+            self.breaker.record_success()
+            return None
+        if attempt >= self.max_retries:
+            self.stats["failures"] += 1
+            self.breaker.record_failure()
+            return None
+        self.stats["retries"] += 1
+        self.breaker.record_retry()
+        return self._backoff(attempt, e)
+
+    def create(self, **kwargs):
+        """
+        chat.completions.create と同じ引数で呼ぶ（stream=True の場合は接続までを再試行）
+        stream=True の応答は読み終わるか close するまで同時実行の枠を使う
+        """
+        estimated = self._estimate(kwargs)
+        attempt = 0
+        while True:
+            # 待っている間にブレーカーが開いたら再試行せずに失敗させる
+            self.breaker.allow()
+            self.requests_bucket.acquire(1)
+            self.tokens_bucket.acquire(estimated)
+            self.stats["requests"] += 1
+            self._semaphore.acquire()
+            try:
+                resp = self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                self._semaphore.release()
+                wait = self._on_error(e, attempt)
+                if wait is None:
+                    raise
+                print(f"[WARNING] LLM request failed ({type(e).__name__}), retrying in {wait:.1f}s")
+                time.sleep(wait)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            if kwargs.get("stream"):
+                def on_close(usage, text):
+                    self._semaphore.release()
+                    self._settle_stream(kwargs, estimated, usage, text)
+                return _ManagedStream(resp, on_close)
+            self._semaphore.release()
+            self._settle(resp, estimated)
+            return resp
+
+    def _get_async_client(self):
+        if self._async_client is None:
+            if self._async_client_factory is None:
+                raise RuntimeError("async client is not configured")
+            self._async_client = self._async_client_factory()
+        return self._async_client
+
+    async def _acquire_slot_async(self):
+        # 同期の呼び出しと同じ枠を使う。イベントループを止めないよう、空くまで少しずつ待つ
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(0.01)
+
+    async def acreate(self, **kwargs):
+        """create の非同期版"""
+        client = self._get_async_client()
+        semaphore = self._semaphore
+        estimated = self._estimate(kwargs)
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            await self.requests_bucket.acquire_async(1)
+            await self.tokens_bucket.acquire_async(estimated)
+            self.stats["requests"] += 1
+            await self._acquire_slot_async()
+            try:
+                resp = await client.chat.completions.create(**kwargs)
+            except Exception as e:
+                semaphore.release()
+                wait = self._on_error(e, attempt)
+                if wait is None:
+                    raise
+                await asyncio.sleep(wait)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            if kwargs.get("stream"):
+                def on_close(usage, text):
+                    semaphore.release()
+                    self._settle_stream(kwargs, estimated, usage, text)
+                return _ManagedAsyncStream(resp, on_close)
+            semaphore.release()
+            self._settle(resp, estimated)
+            return resp
+
+
+def create_azure_llm_client(api_key: str, endpoint: str, api_version: str) -> LLMClient:
+    """同期・非同期の Azure OpenAI クライアントを作る（接続プールは別々で、上限の設定だけ共通）"""
+    import httpx
+    import openai
+    from openai import AzureOpenAI, AsyncAzureOpenAI
+
+    limits = httpx.Limits(max_connections=LLM_POOL_CONNECTIONS, max_keepalive_connections=LLM_POOL_CONNECTIONS)
+    client = AzureOpenAI(
+        api_key=api_key,
+        azure_endpoint=endpoint,
+        api_version=api_version,
+        max_retries=0,  # 再試行は LLMClient 側で行う
+        timeout=LLM_TIMEOUT,
+        http_client=openai.DefaultHttpxClient(limits=limits),
+    )
+
+    def async_factory():
+        return AsyncAzureOpenAI(
+            api_key=api_key,
+            azure_endpoint=endpoint,
+            api_version=api_version,
+            max_retries=0,
+            timeout=LLM_TIMEOUT,
+            http_client=openai.DefaultAsyncHttpxClient(limits=limits),
+        )
+
+    return LLMClient(client, async_client_factory=async_factory)
@@ -0,0 +1,237 @@
+"""
+処理時間・トークン使用量の計測と Prometheus 形式での出力
+
+- Counter / Histogram: ラベル付きの最小限の実装（prometheus_client には依存しない）
+- span(stage): 処理区間の時間を計測し、ヒストグラムと実行中のトレースに記録する
+- Trace: 1ジョブ（1リクエスト）分の区間・トークン数をまとめ、構造化ログとして出力する
+
+値はプロセスごとに集計される（gunicorn の複数ワーカーではワーカーごとの値になる）。
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+REQUEST_LOG_JSON = os.getenv("REQUEST_LOG_JSON", "0") == "1"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                for i, b in enumerate(self.buckets):
+                    le = 'le="%s"' % b
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {row[i]}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {row[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {row[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name: str, doc: str, labelnames=()) -> Counter:
+        m = Counter(name, doc, labelnames)
+        self.metrics.append(m)
+        return m
+
+    def histogram(self, name: str, doc: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        m = Histogram(name, doc, labelnames, buckets)
+        self.metrics.append(m)
+        return m
+
+    def add_collector(self, fn):
+        """fn() -> [(name, type, doc, {labels}, value)] を出力時に呼ぶ（外部の統計値の取り込み用）"""
+        self.collectors.append(fn)
+
+    def render(self) -> str:
+        lines = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        for fn in self.collectors:
+            try:
+                samples = fn()
+            except Exception as e:
+                print(f"[WARNING] Metrics collector failed: {e}")
+                continue
+            declared = set()
+            for name, mtype, doc, labels, value in samples:
+                if name not in declared:
+                    lines.append(f"# HELP {name} {doc}")
+                    lines.append(f"# TYPE {name} {mtype}")
+                    declared.add(name)
+                lines.append(f"{name}{_labels(labels.keys(), labels.values())} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "slides_stage_seconds", "Time spent in each pipeline stage", ["stage"])
+BUILDER_SECONDS = REGISTRY.histogram(
+    "slides_builder_seconds", "Time spent in each slide builder", ["builder"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+LLM_TOKENS = REGISTRY.counter(
+    "slides_llm_tokens_total", "Tokens reported by the completion API", ["kind"])
+INPUT_TOKENS = REGISTRY.counter(
+    "slides_input_tokens_total", "Minutes tokens before and after pre-processing", ["stage"])
+JOBS = REGISTRY.counter(
+    "slides_jobs_total", "Finished jobs", ["kind", "status"])
+JOB_SECONDS = REGISTRY.histogram(
+    "slides_job_seconds", "End-to-end job duration", ["kind"])
+HTTP_SECONDS = REGISTRY.histogram(
+    "slides_http_request_seconds", "HTTP request duration", ["endpoint", "method", "status"])
+
+
+# ===== リクエスト単位のトレース =====
+_current_trace = contextvars.ContextVar("slides_trace", default=None)
+
+
+class Trace:
+    """1ジョブ分の区間（stage ごとの合計秒数と回数）とトークン数"""
+
+    def __init__(self, **fields):
+        self.fields = dict(fields)
+        self.stages = {}
+        self.tokens = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float):
+        with self._lock:
+            total, count = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, count + 1)
+
+    def add_tokens(self, kind: str, n: int):
+        with self._lock:
+            self.tokens[kind] = self.tokens.get(kind, 0) + n
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                **self.fields,
+                "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+                "stages_ms": {k: round(v[0] * 1000, 1) for k, v in self.stages.items()},
+                "stage_counts": {k: v[1] for k, v in self.stages.items()},
+                "tokens": dict(self.tokens),
+            }
+
+
+@contextmanager
+def trace(**fields):
+    """ブロック内の span / record_usage をまとめ、REQUEST_LOG_JSON=1 なら終了時に1行の JSON を出力する"""
+    t = Trace(**fields)
+    token = _current_trace.set(t)
+    try:
+        yield t
+    finally:
+        _current_trace.reset(token)
+        if REQUEST_LOG_JSON:
+            print(json.dumps({"event": "trace", **t.to_dict()}, ensure_ascii=False))
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str, histogram: Histogram = STAGE_SECONDS, label: str = "stage"):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        histogram.observe(elapsed, **{label: stage})
+        t = _current_trace.get()
+        if t is not None:
+            t.add_stage(stage, elapsed)
+
+
+def record_usage(usage):
+    """completion のトークン使用量を記録する"""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        n = getattr(usage, kind, None)
+        if n:
+            short = kind.replace("_tokens", "")
+            LLM_TOKENS.inc(n, kind=short)
+            t = _current_trace.get()
+            if t is not None:
+                t.add_tokens(short, n)
+
+
+def record_input_tokens(before: int, after: int):
+    """前処理前後の議事録のトークン数を記録する"""
+    for stage, n in (("raw", before), ("compact", after)):
+        INPUT_TOKENS.inc(n, stage=stage)
+        t = _current_trace.get()
+        if t is not None:
+            t.add_tokens(f"minutes_{stage}", n)
+
+
+def submit_with_context(pool, fn, *args):
+    """スレッドプールへ現在のトレースを引き継いで投入する"""
+    ctx = contextvars.copy_context()
+    return pool.submit(ctx.run, fn, *args)
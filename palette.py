@@ -0,0 +1,18 @@
+"""
+スライドの配色（deck_builder の PPTX とプレビューの SVG で共通）
+
+python-pptx に依存しないので、プレビューだけの経路でも読み込める。
+色は (R, G, B) で持ち、deck_builder は RGBColor に、preview は hex_color で "#RRGGBB" にする。
+"""
+
+# カラールール: background / text / main / accent
+BACKGROUND = (255, 255, 255)  # 背景は白を前提
+PRIMARY = (32, 89, 167)       # メインカラー（見出し・アクセント）
+ACCENT = (237, 242, 248)      # アクセント（淡い塗り）
+TEXT = (25, 25, 25)
+SUBTEXT = (90, 98, 110)
+
+
+def hex_color(rgb: tuple) -> str:
+    """(R, G, B) → "#RRGGBB" """
+    return "#%02X%02X%02X" % rgb
@@ -0,0 +1,118 @@
+"""
+LLM 解析結果の永続キャッシュ
+
+正規化済みの議事録テキスト・デプロイ名・プロンプト版数から作ったハッシュをキーに、
+構造化 JSON を SQLite に保存する。gunicorn の複数ワーカーから同じファイルを共有できる。
+接続はスレッド・プロセスごとに開くので、gunicorn --preload で読み込み後に fork されても親の接続は使わない。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "1") != "0"
+PARSE_CACHE_TTL_SECONDS = int(os.getenv("PARSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "2000"))
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def make_key(*parts: str) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update((p or "").encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ParseCache:
+    """
+    SQLite バックエンドのキャッシュ
+    - TTL 超過のエントリは読み出し時・書き込み時に削除
+    - 件数・合計サイズの上限を超えたら最終アクセスが古いものから削除
+    - ヒット/ミス数はファイル内に保持し、ワーカー間で合算される
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = PARSE_CACHE_TTL_SECONDS,
+                 max_entries: int = PARSE_CACHE_MAX_ENTRIES, max_bytes: int = PARSE_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._inherited = []  # fork 前に開かれていた接続（閉じずに参照だけ持つ）
+        # 表の作成はその場限りの接続で行い、読み込み時（fork 前）のプロセスに接続を残さない
+        with closing(sqlite3.connect(self.path, timeout=10)) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 の接続はスレッド間・プロセス間で共有しない（fork 後は同じスレッドでも開き直す）
+        local = self._local
+        pid = os.getpid()
+        if getattr(local, "pid", None) != pid:
+            if getattr(local, "conn", None) is not None:
+                # 親の接続を子で閉じると親のロックを外してしまうので、閉じずに参照だけ残す
+                self._inherited.append(local.conn)
+            local.conn = sqlite3.connect(self.path, timeout=10)
+            local.pid = pid
+        return local.conn
+
+    def _count(self, conn, name: str):
+        conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+
+    def get(self, key: str):
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count(conn, "hits")
+        return json.loads(row[0])
+
+    def put(self, key: str, data: dict):
+        value = json.dumps(data, ensure_ascii=False)
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl_seconds,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+
+    def stats(self) -> dict:
+        with self._conn() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"hits": counters.get("hits", 0), "misses": counters.get("misses", 0),
+                "entries": count, "bytes": total}
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries")
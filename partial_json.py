@@ -0,0 +1,141 @@
+"""
+ストリーミング中の JSON を逐次読み取るための寛容なパーサー
+
+LLM から届く断片を feed() で渡すと、トップレベルのキーの値が確定した時点、
+およびトップレベル配列の要素が1つ閉じた時点でイベントを返す。
+
+  ("value", key, value)        … トップレベル key の値が確定
+  ("item", key, index, value)  … トップレベル配列 key の index 番目の要素が確定
+
+先頭のコードフェンスなど '{' より前のゴミは読み飛ばす。
+"""
+import json
+
+_WS = " \t\r\n"
+
+
+class StreamingJSONParser:
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expect_key = True   # depth 1 でキー待ちかどうか
+        self.key = None
+        self.value_start = None
+        self.value_is_array = False
+        self.item_start = None
+        self.item_index = 0
+        self.values = {}
+
+    def feed(self, text: str) -> list:
+        self.buf += text or ""
+        events = []
+        buf = self.buf
+        while self.pos < len(buf):
+            i = self.pos
+            c = buf[i]
+            self.pos += 1
+
+            if not self.started:
+                if c == "{":
+                    self.started = True
+                    self.depth = 1
+                continue
+            if self.depth == 0:
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    self._string_closed(i, events)
+                continue
+
+            if c == '"':
+                self.in_string = True
+                if self.depth == 1 and not self.expect_key and self.value_start is None:
+                    self.value_start = i
+                elif self.depth == 2 and self.value_is_array and self.item_start is None:
+                    self.item_start = i
+                elif self.depth == 1 and self.expect_key:
+                    self.value_start = i  # キー文字列の開始位置として一時利用
+            elif c in "{[":
+                self.depth += 1
+                if self.depth == 2 and not self.expect_key:
+                    self.value_start = i
+                    self.value_is_array = c == "["
+                    self.item_index = 0
+                elif self.depth == 3 and self.value_is_array:
+                    self.item_start = i
+            elif c in "}]":
+                self._close_scalar(i, events)
+                self.depth -= 1
+                if self.depth == 2 and self.value_is_array and self.item_start is not None:
+                    self._emit_item(buf[self.item_start:i + 1], events)
+                elif self.depth == 1 and self.value_start is not None:
+                    self._emit_value(buf[self.value_start:i + 1], events)
+            elif c == ":" and self.depth == 1:
+                self.expect_key = False
+                self.value_start = None
+            elif c == ",":
+                self._close_scalar(i, events)
+                if self.depth == 1:
+                    self.expect_key = True
+                    self.value_start = None
+            elif c not in _WS:
+                # 数値・true/false/null の開始
+                if self.depth == 1 and not self.expect_key and self.value_start is None:
+                    self.value_start = i
+                elif self.depth == 2 and self.value_is_array and self.item_start is None:
+                    self.item_start = i
+        return events
+
+    def _string_closed(self, i: int, events: list):
+        if self.depth == 1 and self.expect_key:
+            self.key = json.loads(self.buf[self.value_start:i + 1])
+            self.value_start = None
+        elif self.depth == 1 and self.value_start is not None:
+            self._emit_value(self.buf[self.value_start:i + 1], events)
+        elif self.depth == 2 and self.value_is_array and self.item_start is not None:
+            self._emit_item(self.buf[self.item_start:i + 1], events)
+
+    def _close_scalar(self, i: int, events: list):
+        # 区切り文字の直前で数値・リテラルが終わる
+        if self.depth == 1 and self.value_start is not None and self.buf[self.value_start] not in '"{[':
+            self._emit_value(self.buf[self.value_start:i].strip(), events)
+        elif self.depth == 2 and self.value_is_array and self.item_start is not None \
+                and self.buf[self.item_start] not in '"{[':
+            self._emit_item(self.buf[self.item_start:i].strip(), events)
+
+    def _emit_value(self, raw: str, events: list):
+        self.value_start = None
+        self.value_is_array = False
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        self.values[self.key] = value
+        events.append(("value", self.key, value))
+
+    def _emit_item(self, raw: str, events: list):
+        self.item_start = None
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        events.append(("item", self.key, self.item_index, value))
+        self.item_index += 1
+
+    @property
+    def complete(self) -> bool:
+        return self.started and self.depth == 0
+
+    def result(self) -> dict:
+        """確定したトップレベルの値（途中で切れた場合も確定分のみ返す）"""
+        return dict(self.values)
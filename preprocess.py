@@ -0,0 +1,345 @@
+"""
+議事録の前処理（プロンプトに入れる前にトークン数を減らす）
+
+文字起こしに多いタイムスタンプ・言いよどみ・繰り返しの話者ラベル・メール署名などを取り除き、
+同じ行やほぼ同じ内容の行（MinHash で判定）を1つにまとめる。重複の判定は見出し（# / 【】）で
+区切った節の中だけで行う。「名前: 発話」を話者のターンとして扱うのは、文字起こしらしく複数の名前が
+何度も出てくる場合だけ（「予算：500万円」のような項目：値の行や箇条はそのまま残す）。
+ほぼ同じ内容の判定は箇条以外の行だけで行い（担当者だけが違うアクションを残すため）、連絡先の行を
+除くのは区切り線のあとの署名ブロックの中だけ。
+処理は決定的で、同じ入力からは常に同じ出力になる。
+
+  text, report = preprocess_minutes(minutes_text)
+  report = {"tokens_before": ..., "tokens_after": ..., "tokenizer": ..., "removed": {...}, ...}
+
+トークン数は tiktoken があればそれで数え、なければ llm_client.estimate_tokens で見積もる。
+"""
+import functools
+import os
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+
+from llm_client import estimate_tokens
+
+PREPROCESS_ENABLED = os.getenv("PREPROCESS_ENABLED", "1") != "0"
+PREPROCESS_VERSION = "3"  # 前処理の規則を変えたら上げる（解析キャッシュの無効化）
+NEAR_DUP_THRESHOLD = float(os.getenv("PREPROCESS_NEAR_DUP_THRESHOLD", "0.8"))  # 文字 n-gram の Jaccard 係数
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+NEAR_DUP_MIN_CHARS = 20   # これより短い行は近似重複の判定をしない
+DUP_LINE_MIN_CHARS = 8    # これより短い行は、直前の行と同じときだけ重複として除く
+SPEAKER_MIN_TURNS = 3     # 「名前: 発話」の名前がこの回数以上出てきたら話者とみなす（そういう名前が2つ以上あるとき）
+SHINGLE_SIZE = 4
+MINHASH_BINS = 32
+MINHASH_BANDS = 8
+
+# 行頭の [10:02] / (00:12:34) / 00:12:34.500、行末の「山田 太郎 0:05」のような時刻
+_LEADING_TIME_RE = re.compile(r'^\s*(?:[\[(（]\s*\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d{1,3})?\s*[\])）]'
+                              r'|\d{1,2}:\d{2}:\d{2}(?:[.,]\d{1,3})?)\s*')
+_TRAILING_TIME_RE = re.compile(r'\s+\d{1,2}:\d{2}(?::\d{2})?$')
+# WebVTT / SRT の見出し・番号・時刻行
+_CUE_TIMING_RE = re.compile(r'^\s*\d{1,2}:\d{2}(?::\d{2})?[.,]\d{1,3}\s*-->\s*\d{1,2}:\d{2}(?::\d{2})?[.,]\d{1,3}.*$')
+_CUE_NUMBER_RE = re.compile(r'^\s*\d+\s*$')
+
+# 「山田：」「Speaker 1:」のような話者ラベルの候補（見出し・箇条の行は対象外）
+_SPEAKER_RE = re.compile(r'^(?![#\-*+・●■>\d])([^\s:：]{1,20}(?: [^\s:：]{1,12})?)\s*[:：]\s*(.*)$')
+# タイムスタンプを除いた残りが名前だけの行（Teams の「名前 0:05」形式）
+_NAME_ONLY_RE = re.compile(r'^[^\s。、，,.!?！？:：]{1,12}(?: [^\s。、，,.!?！？:：]{1,12})?$')
+
+# 箇条（担当者だけが違うアクションなどがあるので、近似重複の判定はしない）
+_BULLET_RE = re.compile(r'^(?:[-*+・●■]|\d+[.)])\s*')
+# 重複を比べる範囲を区切る見出し
+_HEADING_RE = re.compile(r'^(?:#|【[^】]+】$)')
+
+_FILLER_RE = re.compile(
+    r'(?:えー+っと|えー+と|えっと|ええと|えー+|あのー+|あの、|そのー+|まあ、|まぁ、|うーん|んー+|なんか、)[、,]?\s*'
+    r'|\b(?:um+|uh+|erm|hmm+)\b,?\s*', re.IGNORECASE)
+# 相づちだけの発話
+_BACKCHANNEL_RE = re.compile(r'^(?:はい|ええ|うん|そうですね|なるほど|yes|yeah|ok|okay)[。.!！、,]*$', re.IGNORECASE)
+
+# 会議ツールの定型文・メールの定型文
+_BOILERPLATE_RE = re.compile(
+    r'(?:録画|レコーディング|文字起こし|トランスクリプション|トランスクリプト)を(?:開始|停止|終了)しました'
+    r'|^(?:recording|transcription) (?:started|stopped)'
+    r'|^WEBVTT\b'
+    r'|^(?:本|この)メールは.*(?:機密|宛先|送信専用)', re.IGNORECASE)
+_SIGNATURE_SEP_RE = re.compile(r'^(?:--|[-─━=＝_*~〜]{4,})\s*$')
+# 署名の連絡先（項目名だけでなく、区切りと電話番号・郵便番号・メールアドレス・URL の値があるもの）
+_CONTACT_RE = re.compile(
+    r'^(?:TEL|FAX|電話|携帯)\s*[:：.]\s*\+?\d[\d\-() ]{6,}\d'
+    r'|^URL\s*[:：]\s*https?://\S+'
+    r'|^〒\s*\d{3}-?\d{4}'
+    r'|[\w.+-]+@[\w-]+\.[\w.]+'
+    r'|^https?://\S+$', re.IGNORECASE)
+SIGNATURE_MAX_LINES = 10
+_NUMBER_RE = re.compile(r'\d+')
+
+
+# ===== トークン数 =====
+@functools.lru_cache(maxsize=1)
+def _tokenizer():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:  # 未インストール・エンコーディングを取得できない
+        print(f"[INFO] tiktoken unavailable ({e.__class__.__name__}); estimating token counts")
+        return None
+
+
+def count_tokens(text: str) -> tuple:
+    """(トークン数, 数え方)"""
+    enc = _tokenizer()
+    if enc is not None:
+        return len(enc.encode(text)), f"tiktoken:{TOKENIZER_ENCODING}"
+    return estimate_tokens([{"content": text}]), "estimate"
+
+
+# ===== 各段階 =====
+def _normalize(text: str) -> list:
+    # 全角英数・半角カナを揃え、空白をまとめる
+    text = unicodedata.normalize("NFKC", text.replace('\r\n', '\n').replace('\r', '\n'))
+    return [re.sub(r'[ \t]+', ' ', line).strip() for line in text.split('\n')]
+
+
+def _strip_signatures(lines: list, removed: dict) -> list:
+    """区切り線のあとに連絡先が続く署名ブロックと、会議ツール・メールの定型文を除く"""
+    out = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if _SIGNATURE_SEP_RE.match(line):
+            block = lines[i + 1:i + 1 + SIGNATURE_MAX_LINES]
+            contact = [k for k, l in enumerate(block) if _CONTACT_RE.search(l)]
+            if contact:
+                end = i + 2 + contact[-1]
+                # 連絡先の後ろの閉じ区切り線も含める
+                if end < len(lines) and _SIGNATURE_SEP_RE.match(lines[end]):
+                    end += 1
+                removed["boilerplate"] += end - i
+                i = end
+                continue
+        if _BOILERPLATE_RE.search(line):
+            removed["boilerplate"] += 1
+        else:
+            out.append(line)
+        i += 1
+    return out
+
+
+def _strip_transcript_noise(lines: list, removed: dict) -> tuple:
+    """タイムスタンプ・字幕の番号・言いよどみを除き、(行, 名前だけの行の集合) を返す"""
+    has_cues = any(_CUE_TIMING_RE.match(l) for l in lines)
+    # 行末の時刻は「名前 0:05」形式の行が何度も出てくる文字起こしの場合だけ取り除く
+    name_times = sum(1 for l in lines if (m := _TRAILING_TIME_RE.search(l)) and _NAME_ONLY_RE.match(l[:m.start()]))
+    out, names = [], set()
+    for line in lines:
+        if has_cues and (_CUE_TIMING_RE.match(line) or _CUE_NUMBER_RE.match(line)):
+            removed["timestamps"] += 1
+            continue
+        if has_cues and not line:
+            continue  # 字幕の区切りの空行
+        timed = False
+        m = _LEADING_TIME_RE.match(line)
+        if m:
+            line, timed = line[m.end():], True
+        m = _TRAILING_TIME_RE.search(line) if name_times >= 3 else None
+        if m and _NAME_ONLY_RE.match(line[:m.start()]):
+            line, timed = line[:m.start()], True
+            names.add(line)  # 名前だけの行（発話は次の行）
+        removed["timestamps"] += timed
+
+        stripped = _FILLER_RE.sub("", line).strip()
+        if stripped != line:
+            removed["fillers"] += 1
+            line = stripped
+        out.append(line)
+    return out, names
+
+
+def _speaker_labels(lines: list) -> set:
+    """
+    「名前: 発話」の名前のうち話者とみなすもの
+    SPEAKER_MIN_TURNS 回以上出てくる名前が2つ以上あるときだけ、それらを話者とする
+    （「予算：500万円」「予算：追加で200万円」のような項目：値の行は話者のターンにしない）。
+    """
+    counts = defaultdict(int)
+    for line in lines:
+        m = _SPEAKER_RE.match(line)
+        if m:
+            counts[m.group(1)] += 1
+    speakers = {name for name, n in counts.items() if n >= SPEAKER_MIN_TURNS}
+    return speakers if len(speakers) >= 2 else set()
+
+
+def _speaker_match(line: str, speakers: set):
+    m = _SPEAKER_RE.match(line) if speakers else None
+    return m if m and m.group(1) in speakers else None
+
+
+def _drop_backchannels(lines: list, speakers: set, removed: dict) -> list:
+    """相づちだけの発話を除く"""
+    out = []
+    for line in lines:
+        m = _speaker_match(line, speakers)
+        content = m.group(2) if m else line
+        if content and _BACKCHANNEL_RE.match(content):
+            removed["fillers"] += 1
+            continue
+        out.append(line)
+    return out
+
+
+def _line_key(line: str, speakers: set) -> str:
+    m = _speaker_match(line, speakers)
+    if m:
+        line = m.group(2)
+    return re.sub(r'[\s\W_]+', '', line.lower())
+
+
+def _dedupe_lines(lines: list, removed: dict, names: set, speakers: set) -> list:
+    """
+    同じ内容の行を除く（短い行は直前と同じ場合のみ）。見出しと名前だけの行は残す
+    離れた行どうしは同じ節（見出しから次の見出しまで）の中でだけ比べる。
+    """
+    out, seen = [], set()
+    prev = None
+    for line in lines:
+        heading = _HEADING_RE.match(line)
+        if heading:
+            seen = set()  # 別の節に同じ行があっても残す
+        key = _line_key(line, speakers)
+        if line in names:
+            out.append(line)
+            continue
+        if key and not heading:
+            if key == prev or (len(key) >= DUP_LINE_MIN_CHARS and key in seen):
+                removed["duplicate_lines"] += 1
+                continue
+            seen.add(key)
+        prev = key or prev
+        out.append(line)
+    return out
+
+
+def _shingles(key: str) -> set:
+    return {key[i:i + SHINGLE_SIZE] for i in range(max(1, len(key) - SHINGLE_SIZE + 1))}
+
+
+def _minhash(shingles: set) -> tuple:
+    # 1回のハッシュをビンに振り分ける MinHash（one permutation hashing）
+    sig = [0xFFFFFFFF] * MINHASH_BINS
+    for s in shingles:
+        h = zlib.crc32(s.encode("utf-8"))
+        b = h % MINHASH_BINS
+        v = h // MINHASH_BINS
+        if v < sig[b]:
+            sig[b] = v
+    return tuple(sig)
+
+
+def _drop_near_duplicates(lines: list, removed: dict, speakers: set, threshold: float = NEAR_DUP_THRESHOLD) -> list:
+    """
+    ほぼ同じ内容の行（言い直し・転記の重複など）を後に出たほうから除く
+    MinHash の LSH（バンド分割）で候補を絞り、文字 n-gram の Jaccard 係数で確かめる。
+    比べるのは同じ節（見出しから次の見出しまで）の中の箇条でない行だけ。
+    """
+    rows = MINHASH_BINS // MINHASH_BANDS
+    buckets = defaultdict(list)
+    kept_shingles = {}
+    out = []
+    for i, line in enumerate(lines):
+        if _HEADING_RE.match(line):
+            buckets = defaultdict(list)  # 別の節の行とは比べない
+            out.append(line)
+            continue
+        key = _line_key(line, speakers)
+        if len(key) < NEAR_DUP_MIN_CHARS or _BULLET_RE.match(line):
+            out.append(line)
+            continue
+        sh = _shingles(key)
+        sig = _minhash(sh)
+        # 数値（金額・日付・件数など）が違う行は内容が違うものとして残す（数値もバケットのキーに含める）
+        numbers = tuple(_NUMBER_RE.findall(key))
+        bands = [(numbers, b, sig[b * rows:(b + 1) * rows]) for b in range(MINHASH_BANDS)]
+        candidates = {j for band in bands for j in buckets.get(band, ())}
+        if any(len(sh & kept_shingles[j]) / len(sh | kept_shingles[j]) >= threshold for j in sorted(candidates)):
+            removed["near_duplicates"] += 1
+            continue
+        kept_shingles[i] = sh
+        for band in bands:
+            buckets[band].append(i)
+        out.append(line)
+    return out
+
+
+def _compact_turns(lines: list, names: set, speakers: set, removed: dict) -> list:
+    """
+    話者ごとの発話（ターン）にまとめ、同じ話者が続くターンは1つにし、発話が残っていないターンは除く
+    names は「名前だけの行」（Teams 形式）。名前が speakers に含まれる「名前: 発話」形式の行も
+    ターンの始まりとして扱う。
+    """
+    turns = []  # [名前, 名前だけの行か, 発話の行]
+    for line in lines:
+        m = None if line in names else _speaker_match(line, speakers)
+        if line in names or m:
+            name, contents = (line, []) if m is None else (m.group(1), [m.group(2)] if m.group(2) else [])
+            if turns and turns[-1][0] == name:
+                removed["speaker_labels"] += 1
+                turns[-1][2].extend(contents)
+            else:
+                turns.append([name, m is None, contents])
+        elif turns:
+            turns[-1][2].append(line)
+        else:
+            turns.append([None, False, [line]])
+    out = []
+    last = None
+    for name, name_only, contents in turns:
+        if name is not None and not any(contents):
+            removed["speaker_labels"] += 1
+            continue
+        if name is not None and name == last:
+            # 間のターンが消えて同じ話者が続いた
+            removed["speaker_labels"] += 1
+            out.extend(contents)
+            continue
+        last = name
+        if name is None:
+            out.extend(contents)
+        elif name_only:
+            out.append(name)
+            out.extend(contents)
+        else:
+            out.append(f"{name}: {contents[0]}")
+            out.extend(contents[1:])
+    return out
+
+
+def preprocess_minutes(text: str) -> tuple:
+    """議事録テキスト → (前処理後のテキスト, 集計)"""
+    text = text or ""
+    removed = {k: 0 for k in ("timestamps", "fillers", "speaker_labels", "boilerplate",
+                              "duplicate_lines", "near_duplicates")}
+    lines = _normalize(text)
+    lines = _strip_signatures(lines, removed)
+    lines, names = _strip_transcript_noise(lines, removed)
+    speakers = _speaker_labels(lines)
+    lines = _drop_backchannels(lines, speakers, removed)
+    lines = _dedupe_lines(lines, removed, names, speakers)
+    lines = _drop_near_duplicates(lines, removed, speakers)
+    lines = _compact_turns(lines, names, speakers, removed)
+    compact = re.sub(r'\n{3,}', '\n\n', "\n".join(lines)).strip()
+    if not compact:
+        compact = text.strip()  # 全部消えてしまう入力はそのまま渡す
+    tokens_before, tokenizer = count_tokens(text)
+    tokens_after, _ = count_tokens(compact)
+    return compact, {
+        "chars_before": len(text),
+        "chars_after": len(compact),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokenizer": tokenizer,
+        "removed": removed,
+    }
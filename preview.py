@@ -0,0 +1,199 @@
+"""
+スライドのプレビュー（PPTX を作らずにスライドごとの SVG を描く）
+
+スライド仕様（layout_plan）をそのまま SVG にする。本文の改行位置とフォントサイズは
+計画で決めたもの（block["lines"] / message_lines）を使い、計画で改行を決めていない
+タイトル・副題・BANT は text_fit で同じように折り返す（縮小・切り詰めはしない）。
+図形の位置は deck_builder と既定テンプレート（10 x 7.5 インチ）のプレースホルダーに合わせた近似で、
+文字の見た目は閲覧側のフォントによって多少変わる。
+
+  cache = PreviewCache()
+  key, slides = cache.get(parsed, plan_for)   # slides = [{"kind", "source", "svg"}, ...]
+"""
+import os
+import threading
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+import palette
+from layout_plan import KEY_MESSAGE_BOX, PARAGRAPH_SPACE_PT, plan_key
+from text_fit import INSET_X_PT, INSET_Y_PT, LINE_SPACING, fit_boxes
+
+PREVIEW_VERSION = "1"  # 描き方を変えたら上げる（キャッシュ・ETag の無効化）
+PREVIEW_CACHE_SIZE = int(os.getenv("PREVIEW_CACHE_SIZE", "64"))
+
+# スライドの大きさ（インチ）。SVG の座標はポイント（1インチ = 72）
+SLIDE_W, SLIDE_H = 10.0, 7.5
+
+# 既定テンプレートのプレースホルダーの位置（インチ）
+COVER_TITLE_BOX = [0.75, 2.33, 8.5, 1.61]
+COVER_SUBTITLE_BOX = [1.5, 4.25, 7.0, 1.92]
+COVER_BAND_HEIGHT = 1.2
+TITLE_BOX = [0.5, 0.3, 9.0, 1.25]
+BANT_BOX = [0.6, 1.9, 9.0, 5.0]
+BANT_SIZE = 18
+BANT_SPACE_PT = 8
+
+# deck_builder と同じ色（palette で定義）
+BACKGROUND = palette.hex_color(palette.BACKGROUND)
+PRIMARY = palette.hex_color(palette.PRIMARY)
+ACCENT = palette.hex_color(palette.ACCENT)
+TEXT = palette.hex_color(palette.TEXT)
+SUBTEXT = palette.hex_color(palette.SUBTEXT)
+FONT_FAMILY = "'Yu Gothic UI','Yu Gothic',Meiryo,'Hiragino Sans',sans-serif"
+
+BASELINE = 0.88  # 行の上端からベースラインまで（フォントサイズに対する倍率）
+
+
+def _pt(inches: float) -> float:
+    return round(inches * 72, 1)
+
+
+class _Canvas:
+    """1枚分の SVG 要素を溜める"""
+
+    def __init__(self):
+        self.parts = []
+
+    def rect(self, box, fill):
+        x, y, w, h = box
+        self.parts.append(f'<rect x="{_pt(x)}" y="{_pt(y)}" width="{_pt(w)}" height="{_pt(h)}" fill="{fill}"/>')
+
+    def lines(self, x: float, y: float, lines: list, size: float, color: str, bold: bool = False) -> float:
+        """(x, y)（ポイント）を上端として行を並べ、次の行の上端を返す"""
+        weight = ' font-weight="bold"' if bold else ''
+        for line in lines:
+            self.parts.append(f'<text x="{round(x, 1)}" y="{round(y + size * BASELINE, 1)}" font-size="{size}" '
+                              f'fill="{color}"{weight}>{escape(line)}</text>')
+            y += size * LINE_SPACING
+        return y
+
+    def text(self, box, paragraphs, size, color, bold=False, space_after=0, middle=False):
+        """paragraphs（段落ごとの行のリスト）を box の左上（middle なら上下中央）から並べる"""
+        x = _pt(box[0]) + INSET_X_PT
+        y = _pt(box[1]) + INSET_Y_PT
+        if middle:
+            height = sum(len(p) for p in paragraphs) * size * LINE_SPACING
+            y = _pt(box[1]) + (_pt(box[3]) - height) / 2
+        for i, para in enumerate(paragraphs):
+            y = self.lines(x, y + (space_after if i else 0), para, size, color, bold)
+
+    def svg(self) -> str:
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_pt(SLIDE_W)} {_pt(SLIDE_H)}" '
+                f'font-family="{FONT_FAMILY}"><rect width="100%" height="100%" fill="{BACKGROUND}"/>'
+                + "".join(self.parts) + "</svg>")
+
+
+# ===== 折り返し =====
+def _free_boxes(plan: list) -> list:
+    """計画で改行を決めていない文字の (スライド番号, 名前, box)"""
+    out = []
+
+    def add(i, name, texts, box, size, bold=False):
+        # 高さはスライド全体にして切り詰めない（PowerPoint でもはみ出して表示される）
+        out.append((i, name, {"texts": texts, "width": box[2], "height": SLIDE_H, "size": size, "bold": bold}))
+
+    for i, spec in enumerate(plan):
+        kind = spec["kind"]
+        if kind == "title":
+            add(i, "title", [spec["title"]], COVER_TITLE_BOX, 40, True)
+            if spec["subtitle"]:
+                add(i, "subtitle", [spec["subtitle"]], COVER_SUBTITLE_BOX, 18)
+        elif kind == "divider":
+            add(i, "title", [spec["title"]], TITLE_BOX, 36, True)
+        else:
+            add(i, "title", [spec["title"]], TITLE_BOX, spec.get("title_size", 30), True)
+        if kind == "bant":
+            add(i, "labels", [k for k, _ in spec["rows"]], BANT_BOX, BANT_SIZE, True)
+            add(i, "values", [v for _, v in spec["rows"]], BANT_BOX, BANT_SIZE)
+    return out
+
+
+def wrap_free_text(plan: list) -> list:
+    """スライドごとの {名前: 段落ごとの行}。全スライド分をまとめて1回で計測する"""
+    boxes = _free_boxes(plan)
+    wrapped = [{} for _ in plan]
+    # min_size を大きくして、指定サイズのまま折り返させる
+    for (i, name, box), (_, lines) in zip(boxes, fit_boxes([b for _, _, b in boxes], min_size=1000)):
+        wrapped[i][name] = lines
+    return wrapped
+
+
+# ===== 描画 =====
+def draw_title(spec: dict, text: dict) -> _Canvas:
+    c = _Canvas()
+    c.rect([0, 0, SLIDE_W, COVER_BAND_HEIGHT], ACCENT)
+    c.text(COVER_TITLE_BOX, text["title"], 40, PRIMARY, bold=True, middle=True)
+    if "subtitle" in text:
+        c.text(COVER_SUBTITLE_BOX, text["subtitle"], 18, SUBTEXT)
+    return c
+
+
+def draw_divider(spec: dict, text: dict) -> _Canvas:
+    c = _Canvas()
+    c.text(TITLE_BOX, text["title"], 36, PRIMARY, bold=True, middle=True)
+    return c
+
+
+def draw_titled(spec: dict, text: dict) -> _Canvas:
+    c = _Canvas()
+    c.text(TITLE_BOX, text["title"], spec["title_size"], PRIMARY, bold=True, middle=True)
+    if spec["message"] is not None:
+        lines = spec.get("message_lines") or [spec["message"]]
+        c.text(KEY_MESSAGE_BOX, [lines], spec["message_size"], PRIMARY, bold=True)
+    for block in spec["blocks"]:
+        lines = block.get("lines") or [[f"{block['bullet']} {it}"] for it in block["items"]]
+        c.text(block["box"], lines, block["size"], TEXT, space_after=PARAGRAPH_SPACE_PT)
+    return c
+
+
+def draw_bant(spec: dict, text: dict) -> _Canvas:
+    c = _Canvas()
+    c.text(TITLE_BOX, text["title"], 30, PRIMARY, bold=True, middle=True)
+    # 見出し（太字）と値を交互に並べる。値の段落のあとに余白が入る
+    x = _pt(BANT_BOX[0]) + INSET_X_PT
+    y = _pt(BANT_BOX[1]) + INSET_Y_PT
+    for label, value in zip(text["labels"], text["values"]):
+        y = c.lines(x, y, label, BANT_SIZE, PRIMARY, bold=True)
+        y = c.lines(x, y, value, BANT_SIZE, TEXT) + BANT_SPACE_PT
+    return c
+
+
+_drawers = {"title": draw_title, "divider": draw_divider, "titled": draw_titled, "bant": draw_bant}
+
+
+def render_previews(plan: list) -> list:
+    """スライド仕様のリスト → スライドごとの {"kind", "source", "svg"}（セクション由来なら "section" も）"""
+    slides = []
+    for spec, text in zip(plan, wrap_free_text(plan)):
+        item = {"kind": spec["kind"], "source": spec["source"], "svg": _drawers[spec["kind"]](spec, text).svg()}
+        if "section" in spec:
+            item["section"] = spec["section"]
+        slides.append(item)
+    return slides
+
+
+class PreviewCache:
+    """解析結果ごとのプレビューを保持する LRU（キーは ETag にも使う）"""
+
+    def __init__(self, max_entries: int = PREVIEW_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, parsed: dict, plan_for) -> tuple:
+        """(キー, プレビューのリスト)。plan_for は解析結果 → スライド仕様のリスト"""
+        key = f"{PREVIEW_VERSION}-{plan_key(parsed)[:32]}"
+        with self._lock:
+            slides = self._entries.get(key)
+            if slides is not None:
+                self._entries.move_to_end(key)
+                return key, slides
+        slides = render_previews(plan_for(parsed))
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = slides
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return key, slides
@@ -0,0 +1,92 @@
+"""
+同じ処理のワーカー間での重複実行の抑止（single-flight）
+
+gunicorn の別ワーカーが同じ議事録を同時に解析しないよう、キーごとのロックファイルに flock をかけてから処理する。
+後から来た側はロックが外れるまで待ち、先行側が書いた結果（ワーカー間で共有する解析キャッシュ）を使う。
+同じプロセス内のスレッド同士でも、ファイルを別々に開くので同じように排他される。
+fcntl がない環境（Windows）では何もしない（プロセス内の合流は JobQueue の key で行う）。
+
+  with flights.hold(key) as waited:
+      if waited: ...先行側の結果を探す...
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") != "0"
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "600"))  # 超えたら待たずに処理する
+POLL_SECONDS = 0.05
+
+
+class SingleFlight:
+    def __init__(self, root: str, wait_seconds: float = SINGLE_FLIGHT_WAIT_SECONDS,
+                 enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.root = root
+        self.wait_seconds = wait_seconds
+        self.enabled = enabled and fcntl is not None
+        self.stats = {"leader": 0, "waited": 0, "timeout": 0}
+        self._stats_lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(root, exist_ok=True)
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @contextmanager
+    def hold(self, key: str):
+        """key のロックを持って処理する。as で受け取る値は、他の処理の終了を待ったかどうか"""
+        if not self.enabled:
+            yield False
+            return
+        path = os.path.join(self.root, f"{key}.lock")
+        f, waited = self._lock(path, time.monotonic() + self.wait_seconds)
+        if f is None:
+            self._count("timeout")
+            print(f"[WARNING] Single-flight wait timed out after {self.wait_seconds:.0f}s; proceeding")
+        else:
+            self._count("waited" if waited else "leader")
+        try:
+            yield waited
+        finally:
+            if f is not None:
+                # 削除してから解放する（待っていた側は開き直して新しいファイルのロックを取る）
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                f.close()
+
+    def _lock(self, path: str, deadline: float) -> tuple:
+        """(ロックしたファイル, 待ったか)。期限を過ぎたら (None, True)"""
+        waited = False
+        while True:
+            f = open(path, "ab")
+            try:
+                while True:
+                    try:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        waited = True
+                        if time.monotonic() >= deadline:
+                            f.close()
+                            return None, True
+                        time.sleep(POLL_SECONDS)
+                # 先行側が削除したファイルのロックを取った場合は開き直す
+                try:
+                    current = os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+                except FileNotFoundError:
+                    current = False
+                if current:
+                    return f, waited
+            except BaseException:
+                f.close()
+                raise
+            f.close()
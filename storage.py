@@ -0,0 +1,231 @@
+"""
+生成物（PPTX など）の保存先
+
+- LocalStorage: ローカルディスク（既定）
+- S3Storage: S3 互換ストレージ（MinIO などは S3_ENDPOINT_URL で指定）。boto3 が必要（requirements-s3.txt）
+- ArtifactEvictor: TTL とサイズ上限で古い生成物をバックグラウンドで削除
+
+保存は save(name, write_fn) で行い、write_fn(fileobj) が内容を書き込む。
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+
+ARTIFACT_STORAGE = os.getenv("ARTIFACT_STORAGE", "local")  # local / s3
+ARTIFACT_TTL_SECONDS = int(os.getenv("ARTIFACT_TTL_SECONDS", str(24 * 3600)))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(1024 * 1024 * 1024)))
+ARTIFACT_SWEEP_SECONDS = int(os.getenv("ARTIFACT_SWEEP_SECONDS", "300"))
+
+READ_CHUNK_SIZE = 64 * 1024
+
+_NAME_RE = re.compile(r'^[^/\\\x00]+$')
+
+
+def check_name(name: str) -> str:
+    if not name or not _NAME_RE.match(name) or name in (".", "..") or name.endswith(".part"):
+        raise ValueError("不正なファイル名です。")
+    return name
+
+
+class ArtifactInfo:
+    def __init__(self, name: str, size: int, mtime: float, etag: str):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag  # 引用符なし
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime, usegmt=True)
+
+
+class LocalStorage:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, check_name(name))
+
+    def save(self, name: str, write_fn):
+        path = self._path(name)
+        tmp = path + ".part"
+        try:
+            with open(tmp, "wb") as f:
+                write_fn(f)
+            # 書き込み途中のファイルが読まれないよう最後に改名
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return self.stat(name)
+
+    def stat(self, name: str):
+        try:
+            st = os.stat(self._path(name))
+        except (OSError, ValueError):
+            return None
+        return ArtifactInfo(name, st.st_size, st.st_mtime, f"{st.st_size:x}-{st.st_mtime_ns:x}")
+
+    def iter_bytes(self, name: str, start: int = 0, end: int = None):
+        """[start, end) の範囲を少しずつ返す"""
+        with open(self._path(name), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                chunk = f.read(READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def read(self, name: str) -> bytes:
+        with open(self._path(name), "rb") as f:
+            return f.read()
+
+    def local_path(self, name: str):
+        return self._path(name)
+
+    def delete(self, name: str):
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
+
+    def list(self) -> list:
+        items = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and not entry.name.endswith(".part"):
+                info = self.stat(entry.name)
+                if info is not None:
+                    items.append(info)
+        return items
+
+
+class S3Storage:
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = None, region: str = None, client=None):
+        """client は boto3 の S3 クライアント互換のもの（省略時は boto3 で作る）"""
+        self.bucket = bucket
+        self.prefix = prefix
+        if client is None:
+            import boto3
+            client = boto3.client("s3", endpoint_url=endpoint_url or None, region_name=region or None)
+        self.client = client
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}{check_name(name)}"
+
+    def save(self, name: str, write_fn):
+        # python-pptx は seek 可能なファイルへ書き込むため、一旦スプール（大きければディスク）に書く
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as f:
+            write_fn(f)
+            f.seek(0)
+            self.client.upload_fileobj(f, self.bucket, self._key(name))
+        return self.stat(name)
+
+    def stat(self, name: str):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except Exception:
+            return None
+        return ArtifactInfo(name, head["ContentLength"], head["LastModified"].timestamp(), head["ETag"].strip('"'))
+
+    def iter_bytes(self, name: str, start: int = 0, end: int = None):
+        """[start, end) の範囲を少しずつ返す（範囲を指定したときだけ Range ヘッダーを送る）"""
+        if end is not None and end <= start:
+            return  # 空の範囲（"bytes=0--1" のような不正な Range を送らない）
+        kwargs = {}
+        if start or end is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(name), **kwargs)["Body"]
+        try:
+            for chunk in body.iter_chunks(READ_CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    def read(self, name: str) -> bytes:
+        return b"".join(self.iter_bytes(name))
+
+    def local_path(self, name: str):
+        return None
+
+    def delete(self, name: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def list(self) -> list:
+        items = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                name = obj["Key"][len(self.prefix):]
+                if name and "/" not in name:
+                    items.append(ArtifactInfo(name, obj["Size"], obj["LastModified"].timestamp(), obj["ETag"].strip('"')))
+        return items
+
+
+class ArtifactEvictor:
+    """TTL 超過の生成物を削除し、合計サイズが上限を超えたら古いものから削除する"""
+
+    def __init__(self, storage, ttl_seconds: int = ARTIFACT_TTL_SECONDS, max_bytes: int = ARTIFACT_MAX_BYTES,
+                 interval: int = ARTIFACT_SWEEP_SECONDS):
+        self.storage = storage
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def sweep(self) -> int:
+        now = time.time()
+        removed = 0
+        items = sorted(self.storage.list(), key=lambda i: i.mtime)
+        keep = []
+        for info in items:
+            if now - info.mtime > self.ttl_seconds:
+                self.storage.delete(info.name)
+                removed += 1
+            else:
+                keep.append(info)
+        total = sum(i.size for i in keep)
+        for info in keep:
+            if total <= self.max_bytes:
+                break
+            self.storage.delete(info.name)
+            total -= info.size
+            removed += 1
+        return removed
+
+    def ensure_running(self):
+        """掃除スレッドを起動する（fork 後のワーカーでも呼べるよう、起動済みなら何もしない）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name="artifact-evictor", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"[INFO] Evicted {removed} artifacts")
+            except Exception as e:
+                print(f"[WARNING] Artifact eviction failed: {e}")
+            time.sleep(self.interval)
+
+
+def create_storage(local_root: str):
+    """環境変数 ARTIFACT_STORAGE に応じた保存先を返す"""
+    if ARTIFACT_STORAGE == "s3":
+        return S3Storage(
+            bucket=os.environ["S3_BUCKET"],
+            prefix=os.getenv("S3_PREFIX", "artifacts/"),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+            region=os.getenv("S3_REGION"),
+        )
+    return LocalStorage(local_root)
@@ -0,0 +1,83 @@
+"""
+テキスト書式（rPr / pPr）の事前生成
+
+python-pptx のプロパティ経由で run ごとにサイズ・太字・色・フォントを1つずつ設定すると、
+スライド数の多いデッキでは lxml の要素操作が CPU の大半を占める。
+書式ごとに要素を1回だけ組み立てておき、run / 段落にはそのコピーを差し込む。
+要素の組み立て自体は python-pptx で行うので、出力される XML は従来と同じになる。
+"""
+import copy
+import threading
+
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+from pptx.text.text import _Paragraph, _Run
+from pptx.util import Pt
+
+
+def apply_font(run, size_pt, bold, color, font_name):
+    """run の書式を python-pptx のプロパティで1つずつ設定する（事前生成できない場合の経路）"""
+    run.font.size = Pt(size_pt)
+    run.font.bold = bold
+    run.font.color.rgb = color
+    run.font.name = font_name
+
+
+def apply_paragraph(paragraph, level=None, alignment=None, line_spacing=None, space_after=None):
+    """段落書式を python-pptx のプロパティで1つずつ設定する（None の項目は変更しない）"""
+    if level is not None:
+        paragraph.level = level
+    if alignment is not None:
+        paragraph.alignment = alignment
+    if line_spacing is not None:
+        paragraph.line_spacing = line_spacing
+    if space_after is not None:
+        paragraph.space_after = space_after
+
+
+class StyleRegistry:
+    """書式ごとの a:rPr / a:pPr 要素を保持し、コピーを差し込む"""
+
+    def __init__(self, font_name: str):
+        self.font_name = font_name
+        self._run_props = {}
+        self._para_props = {}
+        self._lock = threading.Lock()
+
+    def run_properties(self, size_pt, bold, color):
+        key = (size_pt, bool(bold), str(color))
+        rPr = self._run_props.get(key)
+        if rPr is None:
+            r = parse_xml(f"<a:r {nsdecls('a')}><a:t/></a:r>")
+            apply_font(_Run(r, None), size_pt, bold, color, self.font_name)
+            rPr = r.find(qn("a:rPr"))
+            with self._lock:
+                rPr = self._run_props.setdefault(key, rPr)
+        return rPr
+
+    def paragraph_properties(self, level=None, alignment=None, line_spacing=None, space_after=None):
+        key = (level, alignment, line_spacing, space_after)
+        pPr = self._para_props.get(key)
+        if pPr is None:
+            p = _Paragraph(parse_xml(f"<a:p {nsdecls('a')}/>"), None)
+            apply_paragraph(p, level, alignment, line_spacing, space_after)
+            pPr = p._p.get_or_add_pPr()
+            with self._lock:
+                pPr = self._para_props.setdefault(key, pPr)
+        return pPr
+
+    def stamp_run(self, run, size_pt, bold, color):
+        """書式未設定の run に事前生成した rPr を差し込む"""
+        r = run._r
+        if r.find(qn("a:rPr")) is not None:
+            apply_font(run, size_pt, bold, color, self.font_name)
+            return
+        r.insert(0, copy.deepcopy(self.run_properties(size_pt, bold, color)))
+
+    def stamp_paragraph(self, paragraph, level=None, alignment=None, line_spacing=None, space_after=None):
+        """段落書式が未設定なら事前生成した pPr を差し込み、設定済みなら1つずつ設定する"""
+        p = paragraph._p
+        if p.find(qn("a:pPr")) is not None:
+            apply_paragraph(paragraph, level, alignment, line_spacing, space_after)
+            return
+        p.insert(0, copy.deepcopy(self.paragraph_properties(level, alignment, line_spacing, space_after)))
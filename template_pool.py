@@ -0,0 +1,117 @@
+"""
+PPTX テンプレートの事前読み込み
+
+テンプレートはプロセスごとに1回だけ読み込んで解析済みのプロトタイプとして保持し、
+デッキごとにそのコピー（deepcopy）を渡す。画像などのバイナリは不変なのでコピー間で共有される。
+すぐ渡せるコピーをバックグラウンドで数個用意しておき、テンプレートの更新（mtime の変化）を検知したら読み直す。
+"""
+import copy
+import io
+import os
+import threading
+
+TEMPLATE_POOL_SIZE = int(os.getenv("TEMPLATE_POOL_SIZE", "2"))  # 事前に用意しておくコピー数
+
+
+class TemplatePool:
+    def __init__(self, path: str, size: int = TEMPLATE_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.mtime = None
+        self.blob = None        # テンプレートの生バイト列（存在しない場合は既定テンプレート）
+        self._prototype = None
+        self._ready = []
+        self._lock = threading.Lock()
+        self._refill = threading.Event()
+        self._worker = None
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self, mtime):
+        from pptx import Presentation  # 読み込みが重いので、最初にテンプレートを使うときに読み込む
+
+        try:
+            if mtime is not None:
+                with open(self.path, "rb") as f:
+                    blob = f.read()
+                prototype = Presentation(io.BytesIO(blob))
+                print("[INFO] Using template:", self.path)
+            else:
+                prototype = Presentation()
+                blob = None
+                print("[WARNING] Template not found, using default presentation")
+        except Exception as e:
+            print(f"[ERROR] Failed to load template: {e}")
+            prototype = Presentation()
+            blob = None
+            print("[INFO] Using default presentation as fallback")
+        self.blob = blob
+        self._prototype = prototype
+        self._ready = []
+        self.mtime = mtime
+
+    def _ensure_loaded(self):
+        mtime = self._current_mtime()
+        if self._prototype is not None and mtime == self.mtime:
+            return
+        with self._lock:
+            if self._prototype is None or mtime != self.mtime:
+                self._load(mtime)
+
+    def prototype(self):
+        """解析済みテンプレート（読み取り専用として扱うこと）"""
+        self._ensure_loaded()
+        return self._prototype
+
+    def new_presentation(self):
+        """テンプレートから新しい Presentation を返す（呼び出し側で自由に変更してよい）"""
+        self._ensure_loaded()
+        with self._lock:
+            prototype = self._prototype
+            prs = self._ready.pop() if self._ready else None
+        if prs is None:
+            prs = copy.deepcopy(prototype)
+        self._schedule_refill()
+        return prs
+
+    def clone(self):
+        """事前用意分を使わず、呼び出したスレッドでコピーを作る（同じスレッドで作っては捨てる用途向け）"""
+        return copy.deepcopy(self.prototype())
+
+    def warmup(self):
+        """テンプレートを読み込み、コピーを事前に用意する（gunicorn --preload 時など）"""
+        self._ensure_loaded()
+        self._fill()
+
+    def _fill(self):
+        while True:
+            with self._lock:
+                if len(self._ready) >= self.size:
+                    return
+                prototype = self._prototype
+            clone = copy.deepcopy(prototype)
+            with self._lock:
+                # 作成中にテンプレートが読み直された場合は捨てる
+                if prototype is self._prototype and len(self._ready) < self.size:
+                    self._ready.append(clone)
+
+    def _schedule_refill(self):
+        if self.size <= 0:
+            return
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._refill_loop, name="template-pool", daemon=True)
+            self._worker.start()
+        self._refill.set()
+
+    def _refill_loop(self):
+        while True:
+            self._refill.wait()
+            self._refill.clear()
+            try:
+                self._fill()
+            except Exception as e:
+                print(f"[WARNING] Template pool refill failed: {e}")
@@ -0,0 +1,330 @@
+"""
+テキストの収まり計算（フォントサイズと改行位置の決定）
+
+文字数ではなく字幅で測る。フォントごとに BMP 全体の送り幅テーブル（em 単位）を
+East Asian Width に基づいて1回だけ作っておき、デッキ内の全テキストを連結して
+1回のパスで字幅・累積幅を求める。改行位置は累積幅の二分探索で決めるので、
+numpy があれば全テキストの1行目、2行目…をまとめて計算する（なければ純 Python で同じ計算をする）。
+
+  boxes = [{"texts": ["• 箇条1", "• 箇条2"], "width": 9.0, "height": 4.8, "size": 20}]
+  for size, lines in fit_boxes(boxes): ...
+
+改行は和文なら任意の文字間、欧文は単語の区切りで行い、行頭禁則文字は前の行にぶら下げる。
+字幅は実フォントの計測値ではなく近似値なので、描画側（PowerPoint）の折り返しとは多少ずれる。
+"""
+import bisect
+import functools
+import itertools
+import os
+import unicodedata
+
+np = None  # numpy は最初に一括計測するときに読み込む（use_numpy）
+
+DEFAULT_FONT = "Yu Gothic UI"
+TEXT_FIT_MIN_PT = int(os.getenv("TEXT_FIT_MIN_PT", "12"))
+TEXT_FIT_NUMPY = os.getenv("TEXT_FIT_NUMPY", "1").lower() not in ("0", "false", "no")
+
+LINE_SPACING = 1.2      # 行送り（フォントサイズに対する倍率）
+INSET_X_PT = 7.2        # テキストボックスの左右の余白（python-pptx の既定 0.1 インチ）
+INSET_Y_PT = 3.6        # 上下の余白（0.05 インチ）
+ELLIPSIS = "…"
+
+_TABLE_SIZE = 0x10000  # BMP 外の文字（絵文字など）は末尾の要素（全角）で代表する
+
+# 欧文の送り幅（em、Segoe UI 系の近似値）。ここにない半角文字は 0.55
+_LATIN_WIDTHS = {
+    0.27: " !'.,:;|il",
+    0.32: "()[]{}`fjrtI\"-/\\",
+    0.50: "abcdeghknopqsuvxyzJ",
+    0.55: "0123456789$#_+<>=~^?*",
+    0.62: "ABCDEFGHKLNOPQRSTUVXYZ&",
+    0.85: "mwMW%@",
+}
+
+# フォントごとの欧文の幅の倍率と、East Asian Width が曖昧（A）な文字の幅
+_FONT_PROFILES = {
+    "Yu Gothic UI": (1.0, 1.0),
+    "Yu Gothic": (1.03, 1.0),
+    "Meiryo": (1.12, 1.0),
+    "MS PGothic": (1.0, 1.0),
+    "Segoe UI": (1.0, 0.6),
+}
+
+BOLD_LATIN_SCALE = 1.05
+
+# 行頭に置かない文字（前の行へぶら下げる）
+_NO_LINE_START = set("、。，．,.）)］]｝}〕〉》」』】〙〗ゝゞーぁぃぅぇぉっゃゅょゎァィゥェォッャュョヮヵヶ・：；:;！？!?…‥％% ")
+
+
+@functools.lru_cache(maxsize=None)
+def advance_table(font: str = DEFAULT_FONT, bold: bool = False) -> tuple:
+    """コードポイント → 送り幅（em）のテーブル（長さ 0x10001）"""
+    latin_scale, ambiguous = _FONT_PROFILES.get(font, _FONT_PROFILES[DEFAULT_FONT])
+    if bold:
+        latin_scale *= BOLD_LATIN_SCALE
+    latin = {c: w for w, chars in _LATIN_WIDTHS.items() for c in chars}
+    table = []
+    for cp in range(_TABLE_SIZE):
+        c = chr(cp)
+        cat = unicodedata.category(c)
+        if cat in ("Cc", "Cf", "Mn", "Me", "Cs"):
+            table.append(0.0)
+            continue
+        eaw = unicodedata.east_asian_width(c)
+        if eaw in ("W", "F"):
+            table.append(1.0)
+        elif eaw == "A":
+            table.append(ambiguous)
+        elif eaw == "H":
+            table.append(0.5)
+        else:
+            table.append(latin.get(c, 0.55) * latin_scale)
+    table.append(1.0)
+    return tuple(table)
+
+
+@functools.lru_cache(maxsize=None)
+def _class_tables() -> tuple:
+    """(単語を構成する文字か, 行頭禁則文字か) のテーブル"""
+    word = bytearray(_TABLE_SIZE + 1)
+    no_start = bytearray(_TABLE_SIZE + 1)
+    for cp in range(_TABLE_SIZE):
+        c = chr(cp)
+        if c.isalnum() and unicodedata.east_asian_width(c) in ("Na", "N"):
+            word[cp] = 1
+        if c in _NO_LINE_START:
+            no_start[cp] = 1
+    return bytes(word), bytes(no_start)
+
+
+def _advances(text: str, table: tuple):
+    try:
+        return list(map(table.__getitem__, map(ord, text)))
+    except IndexError:  # BMP 外の文字を含む
+        return [table[min(ord(c), _TABLE_SIZE)] for c in text]
+
+
+def text_width(text: str, font: str = DEFAULT_FONT, bold: bool = False) -> float:
+    """文字列の幅（em）。全角1文字が 1.0"""
+    return sum(_advances(text, advance_table(font, bold)))
+
+
+def prefix_within(text: str, max_em: float, font: str = DEFAULT_FONT) -> int:
+    """幅が max_em 以下に収まる先頭部分の文字数"""
+    if len(text) <= max_em:  # 1文字の幅は最大でも 1em なので測るまでもない
+        return len(text)
+    for i, total in enumerate(itertools.accumulate(_advances(text, advance_table(font)))):
+        if total > max_em:
+            return i
+    return len(text)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_numpy() -> bool:
+    global np
+    try:
+        import numpy
+    except ImportError:  # numpy がなければ純 Python で計算する
+        return False
+    np = numpy
+    return True
+
+
+def use_numpy() -> bool:
+    return TEXT_FIT_NUMPY and _load_numpy()
+
+
+# ===== 一括計測 =====
+class _Batch:
+    """
+    全テキストを連結した字幅・累積幅など
+    texts[i] は連結文字列の [starts[i], ends[i]) にある。
+    """
+
+    def __init__(self, texts: list, bold: list, font: str, vectorized: bool):
+        self.text = "".join(texts)
+        lengths = [len(t) for t in texts]
+        self.ends = list(itertools.accumulate(lengths))
+        self.starts = [e - n for e, n in zip(self.ends, lengths)]
+        self.vectorized = vectorized
+        n = len(self.text)
+        regular = advance_table(font, False)
+        word_table, no_start_table = _class_tables()
+        if vectorized:
+            codes = np.minimum(np.frombuffer(self.text.encode("utf-32-le"), dtype=np.uint32), _TABLE_SIZE)
+            widths = _np_table(font, False)[codes]
+            if any(bold):
+                mask = np.repeat(np.array(bold, dtype=bool), lengths)
+                widths[mask] = _np_table(font, True)[codes[mask]]
+            self.cum = np.concatenate(([0.0], np.cumsum(widths)))
+            self.word = np.frombuffer(word_table, dtype=np.uint8)[codes].astype(bool)
+            self.no_start = np.frombuffer(no_start_table, dtype=np.uint8)[codes].astype(bool)
+            # 各位置以前で最後に単語外の文字があった位置（なければ -1）
+            self.last_gap = np.maximum.accumulate(np.where(self.word, -1, np.arange(n)))
+        else:
+            codes = [min(ord(c), _TABLE_SIZE) for c in self.text]
+            bold_table = advance_table(font, True) if any(bold) else regular
+            widths = []
+            for code_slice, is_bold in zip(_split(codes, lengths), bold):
+                table = bold_table if is_bold else regular
+                widths.extend(table[c] for c in code_slice)
+            self.cum = [0.0] + list(itertools.accumulate(widths))
+            self.word = [word_table[c] == 1 for c in codes]
+            self.no_start = [no_start_table[c] == 1 for c in codes]
+            self.last_gap = []
+            last = -1
+            for i, w in enumerate(self.word):
+                if not w:
+                    last = i
+                self.last_gap.append(last)
+
+    def wrap(self, indices: list, width_em: list) -> list:
+        """texts[indices[k]] を幅 width_em[k] で折り返し、各行の終端位置のリストを返す"""
+        if self.vectorized:
+            return self._wrap_numpy(indices, width_em)
+        return [self._wrap_one(self.starts[i], self.ends[i], w) for i, w in zip(indices, width_em)]
+
+    def _wrap_one(self, pos: int, end: int, width: float) -> list:
+        cum, word, no_start, last_gap = self.cum, self.word, self.no_start, self.last_gap
+        breaks = []
+        while pos < end:
+            brk = bisect.bisect_right(cum, cum[pos] + width) - 1
+            brk = min(max(brk, pos + 1), end)
+            # 単語の途中なら直前の区切りで折り返す
+            if brk < end and word[brk - 1] and word[brk] and last_gap[brk - 1] >= pos:
+                brk = last_gap[brk - 1] + 1
+            # 行頭禁則文字は前の行にぶら下げる
+            if brk < end and no_start[brk]:
+                brk += 1
+            breaks.append(brk)
+            pos = brk
+        return breaks or [end]
+
+    def _wrap_numpy(self, indices: list, width_em: list) -> list:
+        idx = np.asarray(indices, dtype=np.int64)
+        pos = np.asarray(self.starts, dtype=np.int64)[idx]
+        end = np.asarray(self.ends, dtype=np.int64)[idx]
+        width = np.asarray(width_em, dtype=np.float64)
+        breaks = [[] for _ in indices]
+        last = max(len(self.text) - 1, 0)
+        active = np.nonzero(pos < end)[0]
+        while active.size:
+            p, e = pos[active], end[active]
+            brk = np.searchsorted(self.cum, self.cum[p] + width[active], side="right") - 1
+            brk = np.minimum(np.maximum(brk, p + 1), e)
+            inside = brk < e
+            at = np.minimum(brk, last)
+            gap = self.last_gap[brk - 1]
+            back = inside & self.word[brk - 1] & self.word[at] & (gap >= p)
+            brk = np.where(back, gap + 1, brk)
+            at = np.minimum(brk, last)
+            brk = np.where((brk < e) & self.no_start[at], brk + 1, brk)
+            for k, b in zip(active.tolist(), brk.tolist()):
+                breaks[k].append(b)
+            pos[active] = brk
+            active = active[brk < e]
+        return [b or [self.ends[i]] for b, i in zip(breaks, indices)]
+
+    def lines(self, i: int, breaks: list) -> list:
+        starts = [self.starts[i]] + breaks[:-1]
+        return [self.text[s:b] for s, b in zip(starts, breaks)]
+
+
+@functools.lru_cache(maxsize=None)
+def _np_table(font: str, bold: bool):
+    return np.array(advance_table(font, bold), dtype=np.float64)
+
+
+def _split(seq: list, lengths: list):
+    pos = 0
+    for n in lengths:
+        yield seq[pos:pos + n]
+        pos += n
+
+
+# ===== 収まり計算 =====
+def _height(line_counts: list, size: float, space_after: float) -> float:
+    return sum(line_counts) * size * LINE_SPACING + space_after * (len(line_counts) - 1)
+
+
+def _ellipsize(line: str, width_em: float, font: str, bold: bool) -> str:
+    line = line.rstrip()
+    while line and text_width(line + ELLIPSIS, font, bold) > width_em:
+        line = line[:-1]
+    return line + ELLIPSIS
+
+
+def _truncate(lines: list, size: float, box: dict, font: str) -> list:
+    """最小サイズでも収まらない場合、収まる行数まで切り詰めて末尾を「…」にする"""
+    avail = box["height"] * 72 - 2 * INSET_Y_PT
+    width_em = (box["width"] * 72 - 2 * INSET_X_PT) / size
+    line_h = size * LINE_SPACING
+    kept, used = [], 0.0
+    for para in lines:
+        gap = box.get("space_after", 0) if kept else 0
+        n = min(len(para), int((avail - used - gap) // line_h))
+        if n <= 0:
+            break
+        kept.append(para[:n])
+        used += gap + n * line_h
+        if n < len(para):
+            break
+    if not kept:
+        kept = [lines[0][:1]]
+    kept[-1][-1] = _ellipsize(kept[-1][-1], width_em, font, box.get("bold", False))
+    return kept
+
+
+def fit_boxes(boxes: list, font: str = DEFAULT_FONT, min_size: int = None) -> list:
+    """
+    各ボックスに収まるフォントサイズと改行位置を決める
+
+    box = {"texts": [段落の文字列, ...], "width": インチ, "height": インチ, "size": 最大サイズ(pt),
+           "bold": bool（省略可）, "space_after": 段落後の余白 pt（省略可）}
+    戻り値は box ごとの (size, lines)。lines は段落ごとの行のリスト。
+    size から1ptずつ下げて最初に収まるサイズを選ぶ。min_size でも収まらなければ行を切り詰める。
+    """
+    if min_size is None:
+        min_size = TEXT_FIT_MIN_PT
+    texts, bold, owner = [], [], []
+    for b, box in enumerate(boxes):
+        for t in box["texts"]:
+            texts.append(t)
+            bold.append(bool(box.get("bold")))
+            owner.append(b)
+    batch = _Batch(texts, bold, font, use_numpy())
+    first = [0] * len(boxes)
+    for i in range(len(texts) - 1, -1, -1):
+        first[owner[i]] = i
+
+    results = [None] * len(boxes)
+    pending = [b for b, box in enumerate(boxes) if box["texts"]]
+    for b, box in enumerate(boxes):
+        if not box["texts"]:
+            results[b] = (box["size"], [])
+    size = max([boxes[b]["size"] for b in pending] or [0])
+    while pending:
+        trying = [b for b in pending if boxes[b]["size"] >= size]
+        indices, widths = [], []
+        for b in trying:
+            box = boxes[b]
+            w = (box["width"] * 72 - 2 * INSET_X_PT) / size
+            for k in range(len(box["texts"])):
+                indices.append(first[b] + k)
+                widths.append(w)
+        wrapped = iter(batch.wrap(indices, widths))
+        done = set()
+        for b in trying:
+            box = boxes[b]
+            breaks = [next(wrapped) for _ in box["texts"]]
+            avail = box["height"] * 72 - 2 * INSET_Y_PT
+            fits = _height([len(x) for x in breaks], size, box.get("space_after", 0)) <= avail
+            if fits or size <= min(min_size, box["size"]):
+                lines = [batch.lines(first[b] + k, x) for k, x in enumerate(breaks)]
+                if not fits:
+                    lines = _truncate(lines, size, box, font)
+                results[b] = (size, lines)
+                done.add(b)
+        pending = [b for b in pending if b not in done]
+        size -= 1
+    return results